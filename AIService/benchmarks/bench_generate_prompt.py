@@ -0,0 +1,119 @@
+"""bench_generate_prompt.py
+Compare the answer prompt with the instructions and documents in one system message, rebuilt
+for every request (before), against the static instructions message followed by a separate
+documents message (after, rag_graph.build_generate_prompt).
+
+    cd AIService && python benchmarks/bench_generate_prompt.py [--requests 2000]
+    cd AIService && python benchmarks/bench_generate_prompt.py --live 10
+
+Offline it times building the prompt and estimates its input tokens. With --live, each layout
+answers the same questions with the chat model (needs GOOGLE_API_KEY) and the input tokens,
+the input tokens read from the provider cache and the latency reported by the API are printed.
+gemini-2.0-flash has no implicit caching, so the cached column is expected to stay at 0.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.documents import Document
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from context_builder import estimate_tokens
+from rag_graph import GENERATE_INSTRUCTIONS, build_generate_prompt, chat_model
+
+QUESTIONS = [
+    "How much vacation time am I entitled to?",
+    "What are the steps to apply for parental leave?",
+    "Is my employer allowed to deduct uniforms from my pay?",
+    "How much notice do I get before termination?",
+    "When is overtime pay owed?",
+    "What are my options if I am not paid for a public holiday?",
+]
+TOPICS = ["vacation pay", "parental leave", "wage deductions", "termination notice", "overtime", "public holidays"]
+
+
+def documents(question_number, count=12):
+    rng = random.Random(question_number)
+    topic = TOPICS[question_number % len(TOPICS)]
+    docs = []
+    for i in range(count):
+        company = {"company": "Acme"} if i >= 8 else {}
+        text = " ".join(
+            f"Section {rng.randint(1, 90)}: an employee is entitled to {topic} of {rng.randint(1, 12)} weeks when {rng.choice(['employed', 'on leave', 'laid off'])}."
+            for _ in range(12)
+        )
+        docs.append(Document(page_content=text, metadata={"source": f"https://example.ca/{topic.replace(' ', '-')}/{i}", "title": topic.title(), **company}))
+    return docs
+
+
+def state(question_number):
+    question = QUESTIONS[question_number % len(QUESTIONS)]
+    tool_call = {"name": "retrieve", "args": {"query": question}, "id": f"call_{question_number}", "type": "tool_call"}
+    return {"messages": [
+        HumanMessage(question),
+        AIMessage("", tool_calls=[tool_call]),
+        ToolMessage("", artifact=documents(question_number), tool_call_id=tool_call["id"]),
+    ]}
+
+
+def single_message_prompt(state):
+    """The layout before: instructions and documents formatted into one system message."""
+    instructions, documents, *conversation = build_generate_prompt(state)
+    return [SystemMessage(f"{instructions.content}{documents.content}")] + conversation
+
+
+def offline(requests):
+    states = [state(i) for i in range(50)]
+    print(f"{'layout':>8} {'us/prompt':>10} {'est. tokens':>12} {'static prefix':>14}")
+    for name, build in (("before", single_message_prompt), ("after", build_generate_prompt)):
+        # Best of 3 rounds, after a warm-up round
+        times = []
+        for _ in range(4):
+            start = time.perf_counter()
+            for i in range(requests):
+                messages = build(states[i % len(states)])
+            times.append((time.perf_counter() - start) / requests)
+        elapsed = min(times[1:])
+        tokens = sum(estimate_tokens(message.content) for message in messages)
+        static = estimate_tokens(GENERATE_INSTRUCTIONS.content) if name == "after" else 0
+        print(f"{name:>8} {elapsed * 1e6:>10.1f} {tokens:>12} {static:>14}")
+
+
+def live(count):
+    model = chat_model()
+    print(f"{'layout':>8} {'input tokens':>13} {'cached':>8} {'median s':>9} {'p90 s':>7}")
+    for name, build in (("before", single_message_prompt), ("after", build_generate_prompt)):
+        input_tokens, cached, latencies = [], [], []
+        for i in range(count):
+            start = time.perf_counter()
+            response = model.invoke(build(state(i)))
+            latencies.append(time.perf_counter() - start)
+            usage = response.usage_metadata or {}
+            input_tokens.append(usage.get("input_tokens", 0))
+            cached.append(usage.get("input_token_details", {}).get("cache_read", 0))
+        latencies.sort()
+        print(
+            f"{name:>8} {statistics.mean(input_tokens):>13.0f} {statistics.mean(cached):>8.0f} "
+            f"{statistics.median(latencies):>9.2f} {latencies[int(len(latencies) * 0.9)]:>7.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--live", type=int, default=0, help="questions answered by the chat model with each layout")
+    args = parser.parse_args()
+
+    offline(args.requests)
+    if args.live:
+        live(args.live)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""bench_pdf_extract.py
+Compare PDF extraction with PyPDFLoader against pdf_extract (PyMuPDF, process pool) on the
+statute PDFs listed in providedDoc.json.
+
+    cd AIService && python benchmarks/bench_pdf_extract.py [--runs 3]
+
+PDFs are downloaded once into benchmarks/.pdf_cache so that only parsing is timed.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from langchain_community.document_loaders import PyPDFLoader
+
+from pdf_extract import PDF_WORKERS, USER_AGENT, extract_pdf
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pdf_cache")
+
+
+def pdf_urls(path):
+    with open(path) as f:
+        data = json.load(f)
+    urls = [item.get("url") for item in data.get("General", [])]
+    urls += [doc.get("url") for province in data.get("provinces", []) for doc in province.get("docs", [])]
+    return [url for url in urls if url and url.lower().endswith(".pdf")]
+
+
+def download(url):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, hashlib.sha256(url.encode("utf-8")).hexdigest()[:16] + ".pdf")
+    if not os.path.exists(path):
+        res = requests.get(url, headers={"User-Agent": USER_AGENT}, timeout=60)
+        res.raise_for_status()
+        with open(path, "wb") as f:
+            f.write(res.content)
+    return path
+
+
+def best_of(runs, func, warmup=False):
+    if warmup:
+        func()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seeds", default="providedDoc.json")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"pdf_extract workers: {PDF_WORKERS}")
+    print(f"{'pages':>6} {'pypdf s':>8} {'pymupdf s':>10} {'speedup':>8} {'same pages':>10}  url")
+    totals = [0.0, 0.0]
+    for url in pdf_urls(args.seeds):
+        try:
+            path = download(url)
+        except Exception as e:
+            print(f"Skipping {url}: {e}")
+            continue
+        with open(path, "rb") as f:
+            data = f.read()
+
+        pypdf_time, pypdf_docs = best_of(args.runs, lambda: PyPDFLoader(path, mode="page").load())
+        # Warm up so starting the process pool is not counted
+        pymupdf_time, (pymupdf_docs, _) = best_of(args.runs, lambda: extract_pdf(data, url), warmup=True)
+        totals[0] += pypdf_time
+        totals[1] += pymupdf_time
+        same_pages = [d.metadata["page"] for d in pypdf_docs] == [d.metadata["page"] for d in pymupdf_docs]
+        print(f"{len(pymupdf_docs):>6} {pypdf_time:>8.2f} {pymupdf_time:>10.2f} {pypdf_time / pymupdf_time:>7.1f}x {str(same_pages):>10}  {url}")
+
+    if totals[1]:
+        print(f"Total: PyPDFLoader {totals[0]:.2f}s, pdf_extract {totals[1]:.2f}s ({totals[0] / totals[1]:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
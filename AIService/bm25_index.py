@@ -0,0 +1,350 @@
+"""bm25_index.py
+Keyword (BM25) index of the chunks in each namespace, searched alongside the vector store.
+
+Dense embeddings blur exact terms such as section numbers ("s. 54") or defined terms
+("averaging agreement"); BM25 matches them literally. Each namespace is a set of immutable
+segments written by the ingestion scripts:
+
+    <directory>/<quoted namespace>/
+        manifest.json        segments and the chunk IDs deleted from each
+        <segment>/terms.json term -> [offset, document frequency] into the postings
+        <segment>/postings.npy   uint32 segment-local document numbers, grouped by term
+        <segment>/freqs.npy      uint16 term frequency of each posting
+        <segment>/lengths.npy    uint32 token count of each document
+        <segment>/docs.json      chunk ID and source of each document
+
+Postings are memory-mapped, so a query only reads the lists of its own terms. Deleting
+or re-adding a chunk records its ID as deleted from the segments holding it; segments are
+merged, dropping deleted chunks, when there are more than MAX_SEGMENTS of them or
+deletions exceed a fifth of the documents.
+
+The index is local to each host. The ingestion scripts add each batch of chunks as soon as
+it is upserted to the vector store, on the host where they run. A host without the index
+(or one that missed uploads made through another replica) is brought up to date offline
+with `python bm25_index.py --rebuild`, which streams the chunk texts from the vector index:
+
+    cd AIService && python bm25_index.py --rebuild [--namespace Ontario ...]
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import shutil
+import threading
+import uuid
+from collections import Counter, defaultdict
+from itertools import islice
+from urllib.parse import quote, unquote
+
+import numpy as np
+
+from config import bm25_index_path
+
+K1 = 1.2
+B = 0.75
+MAX_SEGMENTS = 8
+# Documents per segment written by replace, which bounds the memory of a rebuild
+SEGMENT_DOCUMENTS = 20000
+# Section numbers such as 54 or 21.1 are kept whole
+TOKEN = re.compile(r"[a-z0-9]+(?:\.[0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how i if in is it my of on or "
+    "that the their there they this to was what when where which who why will with you your".split()
+)
+
+
+def tokenize(text):
+    tokens = []
+    for token in TOKEN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        # Light plural folding so "agreements" matches "agreement"
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss") and not token[-2].isdigit():
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+class Segment:
+    def __init__(self, directory, deleted=()):
+        self.directory = directory
+        self.name = os.path.basename(directory)
+        self.deleted = set(deleted)
+        with open(os.path.join(directory, "terms.json")) as f:
+            self.terms = json.load(f)
+        with open(os.path.join(directory, "docs.json")) as f:
+            docs = json.load(f)
+        self.ids = docs["ids"]
+        self.sources = docs["sources"]
+        self.positions = {id: number for number, id in enumerate(self.ids)}
+        self.postings = np.load(os.path.join(directory, "postings.npy"), mmap_mode="r")
+        self.freqs = np.load(os.path.join(directory, "freqs.npy"), mmap_mode="r")
+        self.lengths = np.load(os.path.join(directory, "lengths.npy"))
+
+    @staticmethod
+    def write(directory, docs):
+        """Write a segment for `docs`, a list of (chunk id, source, tokens)."""
+        os.makedirs(directory)
+        postings = defaultdict(list)
+        for number, (_, _, tokens) in enumerate(docs):
+            for term, count in Counter(tokens).items():
+                postings[term].append((number, min(count, 65535)))
+        terms = {}
+        numbers, freqs = [], []
+        for term in sorted(postings):
+            terms[term] = [len(numbers), len(postings[term])]
+            for number, count in postings[term]:
+                numbers.append(number)
+                freqs.append(count)
+        np.save(os.path.join(directory, "postings.npy"), np.asarray(numbers, dtype=np.uint32))
+        np.save(os.path.join(directory, "freqs.npy"), np.asarray(freqs, dtype=np.uint16))
+        np.save(os.path.join(directory, "lengths.npy"), np.asarray([len(tokens) for _, _, tokens in docs], dtype=np.uint32))
+        with open(os.path.join(directory, "terms.json"), "w") as f:
+            json.dump(terms, f, separators=(",", ":"))
+        with open(os.path.join(directory, "docs.json"), "w") as f:
+            json.dump({"ids": [id for id, _, _ in docs], "sources": [source for _, source, _ in docs]}, f)
+
+    def documents(self):
+        """(chunk id, source, tokens) of the live documents, rebuilt from the postings."""
+        tokens = [[] for _ in self.ids]
+        for term, (offset, count) in self.terms.items():
+            for number, freq in zip(self.postings[offset:offset + count], self.freqs[offset:offset + count]):
+                tokens[number].extend([term] * int(freq))
+        return [(id, source, doc_tokens) for id, source, doc_tokens in zip(self.ids, self.sources, tokens) if id not in self.deleted]
+
+
+class Namespace:
+    def __init__(self, directory):
+        self.directory = directory
+        self.loaded_at = None
+        self.segments = []
+
+    def manifest_path(self):
+        return os.path.join(self.directory, "manifest.json")
+
+    def refresh(self):
+        """Reload the manifest if another process changed it."""
+        try:
+            stat = os.stat(self.manifest_path())
+        except FileNotFoundError:
+            self.segments, self.loaded_at = [], None
+            return
+        # The manifest is replaced, not rewritten, so a new version has a new inode
+        version = (stat.st_ino, stat.st_mtime_ns)
+        if version == self.loaded_at:
+            return
+        with open(self.manifest_path()) as f:
+            manifest = json.load(f)
+        self.segments = [
+            Segment(os.path.join(self.directory, name), manifest["deleted"].get(name, ()))
+            for name in manifest["segments"]
+        ]
+        self.loaded_at = version
+
+    def save(self, segments):
+        """Make `segments`, a dict of segment name -> deleted chunk IDs, the content of the namespace."""
+        os.makedirs(self.directory, exist_ok=True)
+        temporary = self.manifest_path() + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump({"segments": list(segments), "deleted": {name: sorted(ids) for name, ids in segments.items() if ids}}, f)
+        os.replace(temporary, self.manifest_path())
+        # Segments no longer listed are removed
+        for name in os.listdir(self.directory):
+            if name not in segments and os.path.isdir(os.path.join(self.directory, name)):
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        self.refresh()
+
+    def write_segment(self, docs):
+        name = uuid.uuid4().hex
+        Segment.write(os.path.join(self.directory, name), docs)
+        return name
+
+    def current(self):
+        return {segment.name: set(segment.deleted) for segment in self.segments}
+
+    def count(self):
+        """Number of live chunks."""
+        return sum(len(segment.ids) - len(segment.deleted) for segment in self.segments)
+
+
+class BM25Index:
+    """Per-namespace BM25 index of chunks, identified by the same IDs as in the vector store."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.namespaces = {}
+        self.lock = threading.RLock()
+
+    def namespace(self, name):
+        with self.lock:
+            if name not in self.namespaces:
+                self.namespaces[name] = Namespace(os.path.join(self.directory, quote(name, safe="") or "__default__"))
+            namespace = self.namespaces[name]
+            namespace.refresh()
+            return namespace
+
+    def replace(self, name, docs):
+        """
+        Make `docs`, an iterable of (chunk id, text, source), the whole content of a namespace.
+        They are consumed `SEGMENT_DOCUMENTS` at a time, searches see the old content until the end.
+        """
+        docs = iter(docs)
+        with self.lock:
+            namespace = self.namespace(name)
+        segments = {}
+        while True:
+            batch = [(id, source, tokenize(text)) for id, text, source in islice(docs, SEGMENT_DOCUMENTS)]
+            if not batch:
+                break
+            segments[namespace.write_segment(batch)] = set()
+        with self.lock:
+            namespace.save(segments)
+
+    def add(self, name, docs):
+        """Add `docs`, an iterable of (chunk id, text, source), to a namespace."""
+        docs = [(id, source, tokenize(text)) for id, text, source in docs]
+        if not docs:
+            return
+        with self.lock:
+            namespace = self.namespace(name)
+            segments = namespace.current()
+            # Re-added chunks replace their previous version
+            for segment in namespace.segments:
+                segments[segment.name] |= {id for id, _, _ in docs if id in segment.positions}
+            segments[namespace.write_segment(docs)] = set()
+            namespace.save(segments)
+            self.merge_if_needed(namespace)
+
+    def adder(self, name):
+        """IngestionPipeline `on_upsert` callback adding each upserted batch of (id, document) to a namespace."""
+        def add(batch):
+            self.add(name, ((id, doc.page_content, doc.metadata.get("source")) for id, doc in batch))
+        return add
+
+    def delete(self, name, ids=None, source=None):
+        """Delete chunks by ID or by source URL."""
+        with self.lock:
+            namespace = self.namespace(name)
+            segments = namespace.current()
+            changed = False
+            for segment in namespace.segments:
+                doomed = {id for id in ids or () if id in segment.positions}
+                if source is not None:
+                    doomed |= {id for id, doc_source in zip(segment.ids, segment.sources) if doc_source == source}
+                doomed -= segments[segment.name]
+                if doomed:
+                    segments[segment.name] |= doomed
+                    changed = True
+            if changed:
+                namespace.save(segments)
+                self.merge_if_needed(namespace)
+
+    def drop(self, name):
+        with self.lock:
+            namespace = self.namespace(name)
+            shutil.rmtree(namespace.directory, ignore_errors=True)
+            namespace.refresh()
+
+    def count(self, name):
+        return self.namespace(name).count()
+
+    def stats(self):
+        """Live chunks and segments of every namespace on disk."""
+        if not os.path.isdir(self.directory):
+            return {}
+        stats = {}
+        for directory in sorted(os.listdir(self.directory)):
+            if os.path.exists(os.path.join(self.directory, directory, "manifest.json")):
+                name = "" if directory == "__default__" else unquote(directory)
+                namespace = self.namespace(name)
+                stats[name] = {"chunks": namespace.count(), "segments": len(namespace.segments)}
+        return stats
+
+    def merge_if_needed(self, namespace):
+        total = sum(len(segment.ids) for segment in namespace.segments)
+        deleted = sum(len(segment.deleted) for segment in namespace.segments)
+        if len(namespace.segments) > MAX_SEGMENTS or deleted > total / 5:
+            docs = [doc for segment in namespace.segments for doc in segment.documents()]
+            namespace.save({namespace.write_segment(docs): set()} if docs else {})
+
+    def search(self, name, query, k=8):
+        """Return up to `k` (chunk id, score) pairs, best first."""
+        terms = set(tokenize(query))
+        with self.lock:
+            segments = list(self.namespace(name).segments)
+        if not terms or not segments:
+            return []
+        # Deleted documents still count in the statistics until the next merge
+        documents = sum(len(segment.ids) for segment in segments)
+        average_length = sum(float(segment.lengths.sum()) for segment in segments) / documents or 1.0
+        frequencies = {term: sum(segment.terms[term][1] for segment in segments if term in segment.terms) for term in terms}
+
+        hits = []
+        for segment in segments:
+            scores = np.zeros(len(segment.ids), dtype=np.float32)
+            norms = K1 * (1 - B + B * segment.lengths / average_length)
+            for term in terms:
+                if term not in segment.terms:
+                    continue
+                offset, count = segment.terms[term]
+                numbers = segment.postings[offset:offset + count]
+                tf = segment.freqs[offset:offset + count].astype(np.float32)
+                df = frequencies[term]
+                idf = math.log(1 + (documents - df + 0.5) / (df + 0.5))
+                scores[numbers] += idf * tf * (K1 + 1) / (tf + norms[numbers])
+            candidates = np.flatnonzero(scores)
+            if len(candidates) > k * 2:
+                candidates = candidates[np.argpartition(-scores[candidates], k * 2)[:k * 2]]
+            hits.extend((segment.ids[i], float(scores[i])) for i in candidates if segment.ids[i] not in segment.deleted)
+        hits.sort(key=lambda hit: -hit[1])
+        return hits[:k]
+
+
+def reciprocal_rank_fusion(rankings, k, constant=60):
+    """Fuse ranked lists of IDs: each ID scores the sum of 1 / (constant + rank) over the lists."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, id in enumerate(ranking):
+            scores[id] += 1 / (constant + rank + 1)
+    return sorted(scores, key=lambda id: -scores[id])[:k]
+
+
+def rebuild_from_vector_index(keyword_index, vector_index, name, text_key="text", page_size=100):
+    """
+    Replace the keyword index of a namespace with the chunk texts stored in the vector index
+    metadata. IDs are listed a page at a time and each page is fetched and indexed before the
+    next, so only one page and one segment are held in memory. Returns the chunks indexed.
+    """
+    indexed = 0
+
+    def chunks():
+        nonlocal indexed
+        for ids in vector_index.list(namespace=name, limit=page_size):
+            for vector in vector_index.fetch(ids=ids, namespace=name).vectors.values():
+                metadata = vector.metadata or {}
+                if text_key in metadata:
+                    indexed += 1
+                    yield vector.id, metadata[text_key], metadata.get("source")
+
+    keyword_index.replace(name, chunks())
+    return indexed
+
+
+keyword_index = BM25Index(bm25_index_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the keyword (BM25) index on this host from the vector index.")
+    parser.add_argument("--rebuild", action="store_true", help="replace the keyword index of the namespaces")
+    parser.add_argument("--namespace", action="append", help="only this namespace (repeatable), default all")
+    args = parser.parse_args()
+    if not args.rebuild:
+        parser.error("nothing to do, pass --rebuild")
+
+    from config import index
+
+    namespaces = args.namespace or sorted(index.describe_index_stats().get("namespaces", {}))
+    for name in namespaces:
+        print(f"{name}: {rebuild_from_vector_index(keyword_index, index, name)} chunks indexed")
@@ -0,0 +1,384 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from typing import Any, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.serde.types import TASKS
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpointer that keeps only the latest checkpoint of each thread in SQLite.
+
+    - The conversation is truncated to the last `max_messages` messages, cut at a user
+      message so tool calls are never separated from their results.
+    - Threads that have not been written to for `idle_ttl_seconds` are evicted.
+    - The database can be shared by several worker processes on the same host
+      (WAL journal, busy timeout). Use ":memory:" for a throwaway store.
+    """
+
+    def __init__(self, path="checkpoints.sqlite", max_messages=40, idle_ttl_seconds=7 * 24 * 60 * 60, evict_every=100):
+        super().__init__()
+        self.path = path
+        self.max_messages = max_messages
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.evict_every = evict_every
+        self.lock = threading.Lock()
+        self.puts = 0
+        self.counters = {"truncated_threads": 0, "evicted_threads": 0}
+
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                parent_checkpoint_id TEXT,
+                checkpoint_type TEXT NOT NULL,
+                checkpoint BLOB NOT NULL,
+                metadata_type TEXT NOT NULL,
+                metadata BLOB NOT NULL,
+                values_type TEXT NOT NULL,
+                channel_values BLOB NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (thread_id, checkpoint_ns)
+            );
+            CREATE INDEX IF NOT EXISTS checkpoints_updated_at ON checkpoints (updated_at);
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT NOT NULL,
+                checkpoint_ns TEXT NOT NULL,
+                checkpoint_id TEXT NOT NULL,
+                task_id TEXT NOT NULL,
+                idx INTEGER NOT NULL,
+                channel TEXT NOT NULL,
+                value_type TEXT NOT NULL,
+                value BLOB NOT NULL,
+                task_path TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+            """
+        )
+        self.conn.commit()
+
+    # Sync API
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata, "
+                "values_type, channel_values FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+                (thread_id, checkpoint_ns),
+            ).fetchone()
+            if row is None:
+                return None
+            checkpoint_id, parent_checkpoint_id = row[0], row[1]
+            # Only the latest checkpoint is kept, older ids are gone
+            requested_id = get_checkpoint_id(config)
+            if requested_id and requested_id != checkpoint_id:
+                return None
+            writes = self.conn.execute(
+                "SELECT task_id, channel, value_type, value FROM writes "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchall()
+            sends = []
+            if parent_checkpoint_id:
+                sends = self.conn.execute(
+                    "SELECT value_type, value FROM writes "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND channel = ? "
+                    "ORDER BY task_path, task_id, idx",
+                    (thread_id, checkpoint_ns, parent_checkpoint_id, TASKS),
+                ).fetchall()
+
+        checkpoint = self.serde.loads_typed((row[2], row[3]))
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint,
+                "channel_values": self.serde.loads_typed((row[6], row[7])),
+                "pending_sends": [self.serde.loads_typed(send) for send in sends],
+            },
+            metadata=self.serde.loads_typed((row[4], row[5])),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        if config:
+            keys = [(config["configurable"]["thread_id"], config["configurable"].get("checkpoint_ns"))]
+        else:
+            with self.lock:
+                keys = self.conn.execute("SELECT thread_id, checkpoint_ns FROM checkpoints").fetchall()
+
+        count = 0
+        for thread_id, checkpoint_ns in keys:
+            if limit is not None and count >= limit:
+                break
+            namespaces = [checkpoint_ns] if checkpoint_ns is not None else self.thread_namespaces(thread_id)
+            for namespace in namespaces:
+                saved = self.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": namespace}})
+                if saved is None:
+                    continue
+                if before and saved.config["configurable"]["checkpoint_id"] >= get_checkpoint_id(before):
+                    continue
+                if filter and not all(saved.metadata.get(k) == v for k, v in filter.items()):
+                    continue
+                count += 1
+                yield saved
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        parent_checkpoint_id = config["configurable"].get("checkpoint_id")
+
+        c = checkpoint.copy()
+        c.pop("pending_sends", None)
+        new_values = c.pop("channel_values")
+
+        with self.lock:
+            # Other worker processes write the same threads. BEGIN IMMEDIATE takes the write lock
+            # before the read, so no update is lost between reading and replacing the values
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT values_type, channel_values FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?",
+                    (thread_id, checkpoint_ns),
+                ).fetchone()
+                values = self.serde.loads_typed((row[0], row[1])) if row else {}
+                # Channels that did not change keep their stored value
+                for channel in new_versions:
+                    if channel in new_values:
+                        values[channel] = new_values[channel]
+                    else:
+                        values.pop(channel, None)
+                messages = values.get("messages")
+                if isinstance(messages, list) and len(messages) > self.max_messages:
+                    values["messages"] = truncate_messages(messages, self.max_messages)
+                    self.counters["truncated_threads"] += 1
+                message_count = len(values["messages"]) if isinstance(values.get("messages"), list) else 0
+
+                checkpoint_type, checkpoint_blob = self.serde.dumps_typed(c)
+                metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+                values_type, values_blob = self.serde.dumps_typed(values)
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        thread_id,
+                        checkpoint_ns,
+                        checkpoint["id"],
+                        parent_checkpoint_id,
+                        checkpoint_type,
+                        checkpoint_blob,
+                        metadata_type,
+                        metadata_blob,
+                        values_type,
+                        values_blob,
+                        message_count,
+                        time.time(),
+                    ),
+                )
+                # Writes are only read back for the current checkpoint and its parent
+                self.conn.execute(
+                    "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id NOT IN (?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], parent_checkpoint_id or ""),
+                )
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()
+                raise
+            self.puts += 1
+
+        if self.evict_every and self.puts % self.evict_every == 0:
+            self.evict_idle()
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            value_type, value_blob = self.serde.dumps_typed(value)
+            rows.append((
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                value_type,
+                value_blob,
+                task_path,
+            ))
+        # Special channels (negative idx) are overwritten, regular writes are only stored once
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] < 0],
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [row for row in rows if row[4] >= 0],
+            )
+            self.conn.commit()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self.lock:
+            self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+            self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self.conn.commit()
+
+    # Async API. SQLite calls run in a worker thread so a busy database never blocks the event loop.
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ):
+        saved = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in saved:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    # Maintenance
+
+    def thread_namespaces(self, thread_id):
+        with self.lock:
+            rows = self.conn.execute("SELECT checkpoint_ns FROM checkpoints WHERE thread_id = ?", (thread_id,)).fetchall()
+        return [row[0] for row in rows]
+
+    def evict_idle(self):
+        """Delete threads that have not been updated for idle_ttl_seconds. Returns the number of threads evicted."""
+        cutoff = time.time() - self.idle_ttl_seconds
+        with self.lock:
+            idle = [row[0] for row in self.conn.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints WHERE updated_at < ?", (cutoff,)
+            ).fetchall()]
+            for thread_id in idle:
+                self.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                self.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+            self.conn.commit()
+            self.counters["evicted_threads"] += len(idle)
+        return len(idle)
+
+    def stats(self):
+        with self.lock:
+            threads, messages = self.conn.execute(
+                "SELECT COUNT(DISTINCT thread_id), COALESCE(SUM(message_count), 0) FROM checkpoints"
+            ).fetchone()
+            checkpoint_rows = self.conn.execute("SELECT COUNT(*) FROM checkpoints").fetchone()[0]
+            write_rows = self.conn.execute("SELECT COUNT(*) FROM writes").fetchone()[0]
+            page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+            page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return {
+            **self.counters,
+            "threads": threads,
+            "messages": messages,
+            "checkpoint_rows": checkpoint_rows,
+            "write_rows": write_rows,
+            "db_bytes": page_count * page_size,
+        }
+
+
+def truncate_messages(messages, max_messages):
+    """Keep at most max_messages of the most recent messages, starting at a user message if there is one."""
+    tail = messages[-max_messages:]
+    for i, message in enumerate(tail):
+        if getattr(message, "type", None) == "human":
+            return tail[i:]
+    # No user message in the window: drop tool results whose call was cut off, the model
+    # rejects a function response without its call
+    start = 0
+    while start < len(tail) and getattr(tail[start], "type", None) == "tool":
+        start += 1
+    return tail[start:]
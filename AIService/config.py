@@ -1,9 +1,7 @@
 from dotenv import load_dotenv
 import os
-from langchain.chat_models import init_chat_model
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from pinecone import Pinecone
-from langchain_pinecone import PineconeVectorStore
+from embedding_cache import CachedEmbeddings
+from startup import lazy
 
 # Load environment variables
 load_dotenv()
@@ -16,16 +14,125 @@ if not os.environ.get("PINECONE_API_KEY"):
     print("Please set the GOOGLE_API_KEY environment variable.")
 pc_api_key = os.environ.get("PINECONE_API_KEY")
 
-if not os.environ.get("PINECONE_INDEX_NAME"):
+# "pinecone" for the hosted index, or "local" for the in-process index in local_vector_store.py
+vector_store_backend = os.environ.get("VECTOR_STORE_BACKEND", "pinecone")
+local_vector_store_path = os.environ.get("LOCAL_VECTOR_STORE_PATH", "vector_store")
+
+if vector_store_backend == "pinecone" and not os.environ.get("PINECONE_INDEX_NAME"):
     print("Please set the PINECONE_INDEX_NAME environment variable.")
 index_name = os.environ.get("PINECONE_INDEX_NAME")
 
-# Initialize llm models and vector store
-llm = init_chat_model("gemini-2.0-flash", model_provider="google_genai")
-embeddings = GoogleGenerativeAIEmbeddings(model="models/embedding-001")
+# Conversation checkpoints shared by all workers on this host
+checkpoint_db_path = os.environ.get("CHECKPOINT_DB_PATH", "checkpoints.sqlite")
+checkpoint_max_messages = int(os.environ.get("CHECKPOINT_MAX_MESSAGES", "40"))
+checkpoint_idle_ttl = int(os.environ.get("CHECKPOINT_IDLE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+
+# Semantic answer cache in front of the RAG graph (max entries 0 disables it). Entries are kept
+# per worker, invalidations are shared through SQLite (the checkpoint database by default)
+semantic_cache_threshold = float(os.environ.get("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+semantic_cache_ttl = int(os.environ.get("SEMANTIC_CACHE_TTL_SECONDS", "3600"))
+semantic_cache_max_entries = int(os.environ.get("SEMANTIC_CACHE_MAX_ENTRIES", "2000"))
+semantic_cache_db_path = os.environ.get("SEMANTIC_CACHE_DB_PATH", checkpoint_db_path)
+
+# Questions classified below this confidence go through the routing LLM call
+intent_confidence_threshold = float(os.environ.get("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+
+# Local embedding cache shared by ingestion and queries
+embedding_cache_path = os.environ.get("EMBEDDING_CACHE_PATH", "embedding_cache.sqlite")
+
+# Ingestion pipeline: initial embedding requests per second (adapted on 429s) and worker pool sizes
+embed_rate_per_second = float(os.environ.get("EMBED_RATE_PER_SECOND", "5"))
+embed_workers = int(os.environ.get("EMBED_WORKERS", "2"))
+upsert_workers = int(os.environ.get("UPSERT_WORKERS", "2"))
+
+# Keyword (BM25) index searched alongside the vector store; retrieval fuses the best
+# `hybrid_candidates` results of each with reciprocal rank fusion. The index is kept on local
+# disk, written by ingestion and rebuilt offline with `python bm25_index.py --rebuild`.
+bm25_index_path = os.environ.get("BM25_INDEX_PATH", "bm25_index")
+hybrid_retrieval = os.environ.get("HYBRID_RETRIEVAL", "1") == "1"
+hybrid_candidates = int(os.environ.get("HYBRID_CANDIDATES", "10"))
+
+# Estimated tokens (about 4 characters each) of retrieved documents sent with each answer prompt
+context_token_budget = int(os.environ.get("CONTEXT_TOKEN_BUDGET", "2500"))
+
+# Background company document ingestion. Jobs are stored in SQLite shared by the worker
+# processes (the checkpoint database by default); an active job whose worker has not saved it
+# for INGEST_JOB_STALE_SECONDS is marked failed
+ingest_job_workers = int(os.environ.get("INGEST_JOB_WORKERS", "2"))
+ingest_job_history = int(os.environ.get("INGEST_JOB_HISTORY", "500"))
+ingest_job_db_path = os.environ.get("INGEST_JOB_DB_PATH", checkpoint_db_path)
+ingest_job_stale_seconds = int(os.environ.get("INGEST_JOB_STALE_SECONDS", "900"))
+
+# Popular questions are recomputed in the background and served from memory
+popular_questions_refresh = int(os.environ.get("POPULAR_QUESTIONS_REFRESH_SECONDS", "900"))
+popular_questions_ttl = int(os.environ.get("POPULAR_QUESTIONS_TTL_SECONDS", "3600"))
+popular_questions_sample_size = int(os.environ.get("POPULAR_QUESTIONS_SAMPLE_SIZE", "2000"))
+# Days user questions are kept before a popular questions refresh deletes them; 0 keeps them all
+user_question_retention_days = int(os.environ.get("USER_QUESTION_RETENTION_DAYS", "0"))
+
+# User questions are rewritten and stored for analytics in background batches
+question_queue_batch_size = int(os.environ.get("QUESTION_QUEUE_BATCH_SIZE", "20"))
+question_queue_flush_seconds = float(os.environ.get("QUESTION_QUEUE_FLUSH_SECONDS", "10"))
+question_queue_max_pending = int(os.environ.get("QUESTION_QUEUE_MAX_PENDING", "1000"))
+# Seconds the service waits at shutdown for queued questions to be stored
+question_queue_drain_seconds = float(os.environ.get("QUESTION_QUEUE_DRAIN_SECONDS", "10"))
+
+# Speech-to-text: model replicas (one per worker thread), CPU threads per replica and how
+# many requests may wait for a free replica before /transcribe answers 503
+whisper_model_size = os.environ.get("WHISPER_MODEL_SIZE", "small")
+whisper_device = os.environ.get("WHISPER_DEVICE", "cpu")
+whisper_compute_type = os.environ.get("WHISPER_COMPUTE_TYPE", "int8")
+whisper_cpu_threads = int(os.environ.get("WHISPER_CPU_THREADS", "4"))
+whisper_replicas = int(os.environ.get("WHISPER_REPLICAS", "1"))
+whisper_max_queue = int(os.environ.get("WHISPER_MAX_QUEUE", "4"))
+# Speed/accuracy profile of POST /transcribe: fast, balanced, accurate, or auto (fast for short prompts)
+whisper_profile = os.environ.get("WHISPER_PROFILE", "auto")
+# /transcribe/stream: seconds of audio between partial transcripts and silence that ends an utterance
+whisper_stream_partial_seconds = float(os.environ.get("WHISPER_STREAM_PARTIAL_SECONDS", "1.0"))
+whisper_stream_silence_ms = int(os.environ.get("WHISPER_STREAM_SILENCE_MS", "500"))
+
+# Create the clients and models below in a background thread as soon as the app starts
+warm_up_on_startup = os.environ.get("WARM_UP_ON_STARTUP", "1") == "1"
+
+# Initialize llm models and vector store on first use (or in the background warm-up after startup)
+# so that importing config neither opens network connections nor fails without them.
+# The client libraries are imported there too, they take about a second to import.
+def create_llm():
+    from langchain.chat_models import init_chat_model
+
+    return init_chat_model("gemini-2.0-flash", model_provider="google_genai")
+
+def create_embeddings():
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+    return CachedEmbeddings(GoogleGenerativeAIEmbeddings(model="models/embedding-001"), path=embedding_cache_path)
+
+def create_pinecone():
+    from pinecone import Pinecone
+
+    return Pinecone(api_key=pc_api_key)
+
+def create_index():
+    if vector_store_backend == "local":
+        from local_vector_store import LocalIndex
+
+        return LocalIndex(local_vector_store_path)
+    return pc.Index(index_name)
+
+def create_vector_store():
+    if vector_store_backend == "local":
+        from local_vector_store import LocalVectorStore
+
+        return LocalVectorStore(embedding=embeddings.resolve(), index=index.resolve())
+    from langchain_pinecone import PineconeVectorStore
+
+    return PineconeVectorStore(embedding=embeddings.resolve(), index=index.resolve())
+
+llm = lazy("llm", create_llm)
+embeddings = lazy("embeddings", create_embeddings)
 
-# Initialize Pinecone vector store
-pc = Pinecone(api_key=pc_api_key)
-index = pc.Index(index_name)
-vector_store = PineconeVectorStore(embedding=embeddings, index=index)
-vector_store_dimension = 768
\ No newline at end of file
+# Initialize the vector store: Pinecone, or the local index
+pc = lazy("pinecone", create_pinecone) if vector_store_backend == "pinecone" else None
+index = lazy("index", create_index)
+vector_store = lazy("vector_store", create_vector_store)
+vector_store_dimension = 768
@@ -0,0 +1,128 @@
+"""context_builder.py
+Turns the retrieved chunks into the document sections of the answer prompt.
+
+Retrieval returns up to 12 chunks of 1000 characters split with a 200-character overlap,
+often with the same text found in several namespaces. Before they are sent to the model:
+
+- exact and near-duplicate chunks are dropped, keeping the best ranked one,
+- overlapping or adjacent chunks of the same source are merged into one passage,
+- metadata is reduced to the fields the answer uses (METADATA_FIELDS),
+- passages are added best first until the token budget is spent.
+"""
+
+import re
+from collections import defaultdict
+
+from config import context_token_budget
+
+METADATA_FIELDS = ("company", "title", "source", "page")
+# Chunks sharing this fraction of their word shingles are near-duplicates
+DUPLICATE_SIMILARITY = 0.8
+SHINGLE_WORDS = 5
+# Shortest overlap, in characters, for which two chunks without a start index are merged
+MIN_OVERLAP = 40
+# A passage is cut to fit the remaining budget only if at least this many tokens are left
+MIN_PASSAGE_TOKENS = 60
+WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token), without calling the model."""
+    return (len(text) + 3) // 4
+
+
+class Passage:
+    """Text of one or more merged chunks of a source, ranked by its best chunk."""
+
+    def __init__(self, doc, rank):
+        self.rank = rank
+        self.text = doc.page_content
+        self.metadata = {field: doc.metadata[field] for field in METADATA_FIELDS if doc.metadata.get(field) not in (None, "")}
+        self.start = doc.metadata.get("start_index")
+        self.key = (doc.metadata.get("source"), doc.metadata.get("page"), doc.metadata.get("company"))
+
+    @property
+    def end(self):
+        return None if self.start is None else self.start + len(self.text)
+
+    def merge(self, other):
+        """Append `other` if it overlaps or directly follows this passage; returns whether it did."""
+        if self.start is not None and other.start is not None:
+            if not self.start <= other.start <= self.end:
+                return False
+            self.text += other.text[self.end - other.start:]
+        else:
+            overlap = text_overlap(self.text, other.text)
+            if overlap < MIN_OVERLAP:
+                return False
+            self.text += other.text[overlap:]
+        self.rank = min(self.rank, other.rank)
+        return True
+
+    def format(self):
+        return f"DocMetadata: {self.metadata}\nDocContent: {self.text}"
+
+
+def text_overlap(first, second):
+    """Length of the longest suffix of `first` that is a prefix of `second`."""
+    for size in range(min(len(first), len(second)), MIN_OVERLAP - 1, -1):
+        if first.endswith(second[:size]):
+            return size
+    return 0
+
+
+def shingles(text):
+    words = WORD.findall(text.lower())
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+
+
+def deduplicate(docs):
+    """Drop chunks whose text is the same as, or nearly the same as, a better ranked chunk."""
+    kept, seen = [], []
+    for doc in docs:
+        words = shingles(doc.page_content)
+        if any(len(words & other) >= DUPLICATE_SIMILARITY * min(len(words), len(other)) for other in seen):
+            continue
+        kept.append(doc)
+        seen.append(words)
+    return kept
+
+
+def merge_passages(docs):
+    """Merge the chunks of each source into passages, ordered by rank."""
+    by_source = defaultdict(list)
+    for rank, doc in enumerate(docs):
+        passage = Passage(doc, rank)
+        by_source[passage.key].append(passage)
+    passages = []
+    for group in by_source.values():
+        # Chunks with a start index are merged in document order, the others in the order retrieved
+        group.sort(key=lambda passage: (passage.start is None, passage.start or 0))
+        merged = [group[0]]
+        for passage in group[1:]:
+            if not merged[-1].merge(passage):
+                merged.append(passage)
+        passages.extend(merged)
+    passages.sort(key=lambda passage: passage.rank)
+    return passages
+
+
+def build_context(docs, budget=None):
+    """
+    Return the (public, company) document sections for `docs`, best ranked first, within a
+    budget of `budget` estimated tokens shared by both sections.
+    """
+    budget = context_token_budget if budget is None else budget
+    passages = merge_passages(deduplicate(docs))
+    sections = {False: [], True: []}
+    for passage in sorted(passages, key=lambda passage: passage.rank):
+        text = passage.format()
+        tokens = estimate_tokens(text) + 1
+        if tokens > budget:
+            if budget < MIN_PASSAGE_TOKENS:
+                break
+            text = text[:budget * 4 - 4].rsplit(" ", 1)[0] + " ..."
+            tokens = budget
+        sections["company" in passage.metadata].append(text)
+        budget -= tokens
+    return "\n\n".join(sections[False]), "\n\n".join(sections[True])
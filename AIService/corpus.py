@@ -0,0 +1,175 @@
+"""corpus.py
+Append-only on-disk corpus of crawled documents, replacing the extracted_docs.pkl pickle.
+
+Documents are stored per namespace in JSONL shards (`<namespace>/<n>.jsonl`, one
+{"page_content", "metadata"} object per line). Each shard has an offset index
+(`<n>.idx`, little-endian uint64 byte offsets of its lines) that is memory-mapped for
+random access. `manifest.json` records the committed size of every shard and the seeds
+that were fully crawled: a crashed crawl is resumed by truncating the shards back to the
+last commit and skipping the seeds that are already done.
+
+Import an existing pickle with:
+    python corpus.py extracted_docs.pkl [corpus_directory]
+"""
+
+import json
+import os
+import re
+import sys
+
+import numpy as np
+from langchain_core.documents import Document
+
+MANIFEST = "manifest.json"
+
+
+def namespace_directory(namespace):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", namespace) or "_default"
+
+
+def load_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"namespaces": {}, "done_seeds": []}
+
+
+class CorpusWriter:
+    """
+    Appends documents to a corpus, rolling over to a new shard every `shard_size` documents.
+    Nothing is visible to readers, or survives a crash, until commit is called.
+    """
+
+    def __init__(self, directory="corpus", shard_size=5000):
+        self.directory = directory
+        self.shard_size = shard_size
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = load_manifest(directory)
+        self.done_seeds = set(self.manifest["done_seeds"])
+        self.open_shards = {}
+        self.recover()
+
+    def recover(self):
+        """Drop anything written after the last commit."""
+        for shards in self.manifest["namespaces"].values():
+            for shard in shards:
+                for path, size in ((shard["file"], shard["bytes"]), (shard["index"], shard["documents"] * 8)):
+                    path = os.path.join(self.directory, path)
+                    if os.path.getsize(path) != size:
+                        with open(path, "r+b") as f:
+                            f.truncate(size)
+
+    def add(self, doc, namespace=None):
+        namespace = namespace or doc.metadata.get("namespace", "General")
+        shard, data, index = self.shard(namespace)
+        line = json.dumps({"page_content": doc.page_content, "metadata": doc.metadata}, ensure_ascii=False).encode("utf-8") + b"\n"
+        index.write(np.uint64(shard["bytes"]).tobytes())
+        data.write(line)
+        shard["bytes"] += len(line)
+        shard["documents"] += 1
+
+    def shard(self, namespace):
+        shards = self.manifest["namespaces"].setdefault(namespace, [])
+        if namespace in self.open_shards and shards[-1]["documents"] < self.shard_size:
+            return shards[-1], *self.open_shards[namespace]
+        if namespace in self.open_shards:
+            for f in self.open_shards.pop(namespace):
+                f.close()
+        if not shards or shards[-1]["documents"] >= self.shard_size:
+            folder = namespace_directory(namespace)
+            os.makedirs(os.path.join(self.directory, folder), exist_ok=True)
+            number = len(shards)
+            shards.append({
+                "file": f"{folder}/{number:05d}.jsonl",
+                "index": f"{folder}/{number:05d}.idx",
+                "documents": 0,
+                "bytes": 0,
+            })
+            # Clear leftovers of a shard that was started but never committed
+            for path in (shards[-1]["file"], shards[-1]["index"]):
+                open(os.path.join(self.directory, path), "wb").close()
+        shard = shards[-1]
+        self.open_shards[namespace] = (
+            open(os.path.join(self.directory, shard["file"]), "ab"),
+            open(os.path.join(self.directory, shard["index"]), "ab"),
+        )
+        return shard, *self.open_shards[namespace]
+
+    def commit(self, done_seeds=()):
+        """Flush everything written so far and record `done_seeds` as fully crawled."""
+        for files in self.open_shards.values():
+            for f in files:
+                f.flush()
+                os.fsync(f.fileno())
+        self.done_seeds.update(done_seeds)
+        self.manifest["done_seeds"] = sorted(self.done_seeds)
+        path = os.path.join(self.directory, MANIFEST)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(f"{path}.tmp", path)
+
+    def close(self):
+        for files in self.open_shards.values():
+            for f in files:
+                f.close()
+        self.open_shards = {}
+
+
+class Corpus:
+    """Read-only view of the committed documents in a corpus."""
+
+    def __init__(self, directory="corpus"):
+        self.directory = directory
+        self.manifest = load_manifest(directory)
+
+    def namespaces(self):
+        return sorted(self.manifest["namespaces"])
+
+    def count(self, namespace):
+        return sum(shard["documents"] for shard in self.manifest["namespaces"].get(namespace, []))
+
+    def documents(self, namespace):
+        """Stream the documents of `namespace` shard by shard."""
+        for shard in self.manifest["namespaces"].get(namespace, []):
+            with open(os.path.join(self.directory, shard["file"]), "rb") as f:
+                for _ in range(shard["documents"]):
+                    yield to_document(f.readline())
+
+    def document(self, namespace, position):
+        """Random access to the document at `position` within `namespace`."""
+        for shard in self.manifest["namespaces"].get(namespace, []):
+            if position < shard["documents"]:
+                offsets = np.memmap(os.path.join(self.directory, shard["index"]), dtype="<u8", mode="r", shape=(shard["documents"],))
+                with open(os.path.join(self.directory, shard["file"]), "rb") as f:
+                    f.seek(int(offsets[position]))
+                    return to_document(f.readline())
+            position -= shard["documents"]
+        raise IndexError(f"{namespace} has no document at that position")
+
+
+def to_document(line):
+    data = json.loads(line)
+    return Document(page_content=data["page_content"], metadata=data["metadata"])
+
+
+def import_pickle(path, directory="corpus"):
+    """Convert an extracted_docs.pkl file ({namespace: [Document]}) into a corpus."""
+    import pickle
+
+    with open(path, "rb") as f:
+        data = pickle.load(f)
+    writer = CorpusWriter(directory)
+    for namespace, docs in data.items():
+        if not isinstance(docs, list):
+            print(f"Skipping non-list entry for namespace {namespace}: {docs}")
+            continue
+        for doc in docs:
+            writer.add(doc, namespace)
+        print(f"Imported {len(docs)} documents into {namespace}")
+    writer.commit()
+    writer.close()
+
+
+if __name__ == "__main__":
+    import_pickle(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "corpus")
@@ -0,0 +1,343 @@
+"""crawler.py
+Shared asynchronous crawler used by scrapeAllProvinceData.py and processCompanyDocs.py.
+
+Seeds are expanded breadth-first from a frontier queue by a pool of workers sharing one
+pooled HTTP session. Requests are limited per domain (concurrency and minimum delay,
+raised to the robots.txt Crawl-delay when there is one), robots.txt is honoured, and
+429/503 responses are retried after their Retry-After delay. The link rules are the same
+as the original recursive crawlers: links are only followed up to `max_depth`, inside the
+seed's domain, and HTML links containing "/fr/" are skipped.
+
+Every URL is downloaded once: PDF text and links are both extracted from the same
+in-memory buffer, in a process pool for long PDFs (see pdf_extract.py). Documents can be
+consumed as they are parsed (stream, iter_pages), so a large site never has to be held in
+memory at once. Responses are kept in an on-disk HTTP cache and revalidated with
+conditional GETs, so unchanged pages are not downloaded again on the next crawl. With
+`skip_unchanged`, they are not yielded again either.
+"""
+
+import asyncio
+import queue
+import threading
+import time
+import urllib.robotparser
+from urllib.parse import urljoin, urlparse, urldefrag
+
+import aiohttp
+from bs4 import BeautifulSoup
+from langchain.schema import Document
+
+from http_cache import HTTPCache
+from pdf_extract import extract_pdf
+from visited_set import VisitedSet
+
+MAX_DEPTH = 2
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+RETRY_STATUSES = {429, 503}
+
+
+def remove_fragment(url):
+    """
+    Remove URL fragment (the part after #) if it exists.
+    """
+    return urldefrag(url)[0]
+
+def get_domain(url):
+    return urlparse(url).netloc
+
+def clean_text(soup):
+    # Remove scripts/styles
+    for tag in soup(["script", "style", "nav", "footer", "aside"]):
+        tag.decompose()
+    return soup.get_text(separator=" ", strip=True)
+
+def always_relevant(text):
+    return True
+
+
+class Crawler:
+    """
+    Crawl seed URLs and return one LangChain Document per HTML page or PDF page.
+
+    Each crawl tracks the URLs it has seen in its own VisitedSet, so crawls never affect each
+    other; pass `visited` (e.g. a Bloom-filter VisitedSet for very large crawls) to use a
+    specific one instead.
+    `is_relevant` filters HTML pages by their text, irrelevant pages are neither kept nor expanded.
+    With `skip_unchanged`, pages the server answers with 304 Not Modified are still parsed for
+    their links but yield no documents. Only use it when the consumer keeps what earlier
+    crawls with the same HTTP cache yielded, e.g. documents that are already indexed.
+    """
+
+    def __init__(
+        self,
+        max_depth=MAX_DEPTH,
+        visited=None,
+        is_relevant=always_relevant,
+        concurrency=16,
+        per_domain_concurrency=4,
+        min_delay=0.25,
+        timeout=10,
+        max_retries=3,
+        respect_robots=True,
+        http_cache=None,
+        buffer=32,
+        skip_unchanged=False,
+    ):
+        self.max_depth = max_depth
+        self.visited = visited
+        self.is_relevant = is_relevant
+        self.concurrency = concurrency
+        self.per_domain_concurrency = per_domain_concurrency
+        self.min_delay = min_delay
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.respect_robots = respect_robots
+        self.http_cache = http_cache if http_cache is not None else HTTPCache()
+        self.buffer = buffer
+        self.skip_unchanged = skip_unchanged
+
+    async def crawl(self, seeds):
+        """
+        Crawl `seeds`, a list of (url, domain, metadata) tuples. Links are only followed when
+        they are on `domain`; `metadata` is added to every document found from that seed.
+        Returns the documents of all seeds in breadth-first discovery order.
+        """
+        results = [item async for item in self.stream(seeds)]
+        results.sort(key=lambda item: item[0])
+        return [doc for _, docs in results for doc in docs]
+
+    def run(self, seeds):
+        """Blocking version of crawl for callers without an event loop."""
+        return asyncio.run(self.crawl(seeds))
+
+    async def stream(self, seeds):
+        """
+        Crawl `seeds` like crawl, yielding (sequence, documents) for each URL as soon as it is
+        parsed. Workers pause once `buffer` URLs are waiting to be consumed.
+        """
+        self.output = asyncio.Queue(maxsize=self.buffer)
+        task = asyncio.create_task(self.fetch_all(seeds))
+        try:
+            while True:
+                item = await self.output.get()
+                if item is None:
+                    break
+                yield item
+            await task
+        finally:
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+
+    def iter_pages(self, seeds):
+        """
+        Blocking generator over the crawled documents in completion order. The crawl runs on
+        an event loop in a background thread and pauses while the consumer is `buffer` URLs
+        behind, so memory is bounded by the buffer rather than the size of the site.
+        """
+        pages = queue.Queue(maxsize=self.buffer)
+        stop = threading.Event()
+        done = object()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    pass
+
+        async def pump():
+            async for _, docs in self.stream(seeds):
+                if stop.is_set():
+                    return
+                if docs:
+                    await asyncio.to_thread(put, docs)
+
+        def produce():
+            try:
+                asyncio.run(pump())
+                put(done)
+            except BaseException as e:
+                put(e)
+
+        thread = threading.Thread(target=produce, name="crawler", daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = pages.get()
+                if item is done:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield from item
+        finally:
+            stop.set()
+            thread.join()
+
+    async def fetch_all(self, seeds):
+        self.queue = asyncio.Queue()
+        self.seen = self.visited if self.visited is not None else VisitedSet()
+        self.sequence = 0
+        self.domain_locks = {}
+        self.domain_slots = {}
+        self.next_request_at = {}
+        self.robots = {}
+        self.counters = {"downloaded": 0, "not_modified": 0}
+        for url, domain, metadata in seeds:
+            self.enqueue(url, 0, domain, metadata)
+
+        try:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_domain_concurrency)
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers={"User-Agent": USER_AGENT}) as session:
+                self.session = session
+                workers = [asyncio.create_task(self.worker()) for _ in range(self.concurrency)]
+                try:
+                    await self.queue.join()
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Unblock the consumer, which then re-raises the error from the task
+            await self.output.put(None)
+            raise
+        print(f"Fetched {self.counters['downloaded'] + self.counters['not_modified']} URLs, {self.counters['not_modified']} unchanged since the last crawl")
+        await self.output.put(None)
+
+    def enqueue(self, url, depth, domain, metadata, attempt=0):
+        if depth > self.max_depth:
+            return
+        if attempt == 0 and not self.seen.add(url):
+            return
+        self.sequence += 1
+        self.queue.put_nowait((self.sequence, url, depth, domain, metadata, attempt))
+
+    async def worker(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                await self.process(*item)
+            except Exception as e:
+                print(f"Failed on {item[1]}: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def process(self, sequence, url, depth, domain, metadata, attempt):
+        url_domain = get_domain(url)
+        if self.respect_robots and not await self.allowed(url):
+            print(f"Skipping {url}: disallowed by robots.txt")
+            return
+
+        async with self.slot(url_domain):
+            await self.wait_turn(url_domain)
+            if attempt == 0:
+                print(f"Crawling: {url}")
+            cached = self.http_cache.load(url)
+            headers = self.http_cache.conditional_headers(cached) if cached else {}
+            unchanged = False
+            async with self.session.get(url, headers=headers) as res:
+                if res.status == 304 and cached:
+                    unchanged = True
+                    self.counters["not_modified"] += 1
+                    content_type = cached["content_type"]
+                    body = self.http_cache.body(url)
+                elif res.status in RETRY_STATUSES and attempt < self.max_retries:
+                    delay = retry_after(res.headers.get("Retry-After"), default=2 ** (attempt + 1))
+                    self.next_request_at[url_domain] = max(self.next_request_at.get(url_domain, 0), time.monotonic() + delay)
+                    print(f"[Retry {attempt + 1}] {res.status} on {url}, waiting {delay}s")
+                    self.enqueue(url, depth, domain, metadata, attempt + 1)
+                    return
+                else:
+                    res.raise_for_status()
+                    content_type = res.headers.get("Content-Type", "")
+                    body = await res.read()
+                    self.counters["downloaded"] += 1
+                    self.http_cache.store(url, res.headers, body)
+
+        if "application/pdf" in content_type.lower():
+            docs, links = await asyncio.to_thread(self.parse_pdf, url, body, metadata)
+            follow_french = True
+        else:
+            if url.endswith(".xml"):
+                return
+            docs, links = await asyncio.to_thread(self.parse_html, url, body, metadata)
+            follow_french = False
+
+        if unchanged and self.skip_unchanged:
+            docs = []
+        await self.output.put((sequence, docs))
+        for link in links:
+            full_url = remove_fragment(urljoin(url, link))
+            if domain == get_domain(full_url) and (follow_french or "/fr/" not in full_url):
+                self.enqueue(full_url, depth + 1, domain, metadata)
+
+    def parse_html(self, url, body, metadata):
+        soup = BeautifulSoup(body, "html.parser")
+        links = [link["href"] for link in soup.find_all("a", href=True)]
+        page_text = clean_text(soup)
+        page_title = soup.title.string.strip() if soup.title and soup.title.string else ""
+        if not self.is_relevant(page_text):
+            return [], []
+        # Build LangChain Document
+        doc = Document(
+            page_content=page_text,
+            metadata={"type": "html", "source": url, "title": page_title, **metadata},
+        )
+        return [doc], links
+
+    def parse_pdf(self, url, body, metadata):
+        return extract_pdf(body, url, metadata)
+
+    def slot(self, domain):
+        if domain not in self.domain_slots:
+            self.domain_slots[domain] = asyncio.Semaphore(self.per_domain_concurrency)
+        return self.domain_slots[domain]
+
+    async def wait_turn(self, domain):
+        """Space out requests to the same domain by at least min_delay (or the robots Crawl-delay)."""
+        lock = self.domain_locks.setdefault(domain, asyncio.Lock())
+        async with lock:
+            delay = self.min_delay
+            robots = self.robots.get(domain)
+            if robots is not None and robots.crawl_delay(USER_AGENT):
+                delay = max(delay, float(robots.crawl_delay(USER_AGENT)))
+            now = time.monotonic()
+            start = max(now, self.next_request_at.get(domain, 0))
+            self.next_request_at[domain] = start + delay
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def allowed(self, url):
+        parsed = urlparse(url)
+        domain = parsed.netloc
+        if domain not in self.robots:
+            lock = self.domain_locks.setdefault(("robots", domain), asyncio.Lock())
+            async with lock:
+                if domain not in self.robots:
+                    self.robots[domain] = await self.fetch_robots(f"{parsed.scheme}://{domain}/robots.txt")
+        robots = self.robots[domain]
+        return robots is None or robots.can_fetch(USER_AGENT, url)
+
+    async def fetch_robots(self, robots_url):
+        try:
+            async with self.session.get(robots_url) as res:
+                if res.status != 200:
+                    return None
+                text = await res.text(errors="ignore")
+        except Exception:
+            return None
+        robots = urllib.robotparser.RobotFileParser(robots_url)
+        robots.modified()
+        robots.parse(text.splitlines())
+        return robots
+
+
+def retry_after(value, default):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,111 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper backed by a content-addressed SQLite cache.
+
+    Vectors are keyed by (model, task, normalized text), where the task tells document
+    embeddings apart from query embeddings since Gemini embeds them differently. Only texts
+    missing from the cache are sent to the wrapped model, so duplicate chunks, re-ingested
+    documents and repeated questions are embedded once.
+    """
+
+    def __init__(self, embeddings, path="embedding_cache.sqlite", model_name=None):
+        self.embeddings = embeddings
+        self.model_name = model_name or getattr(embeddings, "model", type(embeddings).__name__)
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0}
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+        self.conn.commit()
+
+    def key(self, task, text):
+        return hashlib.sha256(f"{self.model_name}\x1f{task}\x1f{text}".encode("utf-8")).digest()
+
+    def lookup(self, task, texts):
+        """Return the cached vectors (None for misses) and the distinct texts that missed."""
+        keys = [self.key(task, text) for text in texts]
+        found = {}
+        with self.lock:
+            # Stay well below SQLite's bound-parameter limit
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                for key, vector in self.conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ):
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+            vectors = [found.get(key) for key in keys]
+            hits = sum(vector is not None for vector in vectors)
+            self.counters["hits"] += hits
+            self.counters["misses"] += len(vectors) - hits
+        missing = list(dict.fromkeys(text for text, vector in zip(texts, vectors) if vector is None))
+        return vectors, missing
+
+    def store(self, task, texts, vectors):
+        rows = [
+            (self.key(task, text), np.asarray(vector, dtype=np.float32).tobytes())
+            for text, vector in zip(texts, vectors)
+        ]
+        with self.lock:
+            self.conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?)", rows)
+            self.conn.commit()
+
+    def fill(self, task, texts, vectors, missing, embedded):
+        self.store(task, missing, embedded)
+        by_text = dict(zip(missing, embedded))
+        return [vector if vector is not None else list(by_text[text]) for text, vector in zip(texts, vectors)]
+
+    def embed_documents(self, texts):
+        texts = [normalize_text(text) for text in texts]
+        vectors, missing = self.lookup("document", texts)
+        if not missing:
+            return vectors
+        return self.fill("document", texts, vectors, missing, self.embeddings.embed_documents(missing))
+
+    def embed_query(self, text):
+        text = normalize_text(text)
+        vectors, missing = self.lookup("query", [text])
+        if not missing:
+            return vectors[0]
+        return self.fill("query", [text], vectors, missing, [self.embeddings.embed_query(text)])[0]
+
+    async def aembed_documents(self, texts):
+        texts = [normalize_text(text) for text in texts]
+        vectors, missing = self.lookup("document", texts)
+        if not missing:
+            return vectors
+        return self.fill("document", texts, vectors, missing, await self.embeddings.aembed_documents(missing))
+
+    async def aembed_query(self, text):
+        text = normalize_text(text)
+        vectors, missing = self.lookup("query", [text])
+        if not missing:
+            return vectors[0]
+        return self.fill("query", [text], vectors, missing, [await self.embeddings.aembed_query(text)])[0]
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": entries,
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
+
+
+def normalize_text(text):
+    """Unicode-normalize and collapse whitespace so trivially different copies share an entry."""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
@@ -0,0 +1,132 @@
+import glob
+import hashlib
+import json
+import os
+import shutil
+
+# Read here rather than in config.py so the crawl scripts don't import config and its dependencies
+MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_MB", "1024")) * 1024 * 1024
+
+
+class HTTPCache:
+    """
+    On-disk cache of crawled responses, revalidated with conditional GET requests.
+
+    Only responses carrying an ETag or Last-Modified header are stored, since those are the
+    only ones a server can answer with 304 Not Modified. Once the bodies exceed `max_bytes`,
+    the least recently used entries (by modification time, refreshed on every hit) are
+    evicted down to 90% of it. The size is tracked per process, so crawls running at the same
+    time can overshoot the cap until their next eviction.
+    """
+
+    def __init__(self, directory=".http_cache", max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = None  # bytes of the cached bodies, counted on the first store
+
+    def paths(self, url):
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        folder = os.path.join(self.directory, key[:2])
+        return os.path.join(folder, f"{key}.json"), os.path.join(folder, f"{key}.body")
+
+    def load(self, url):
+        """Return the cached entry for `url`, or None."""
+        meta_path, body_path = self.paths(url)
+        try:
+            with open(meta_path) as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if os.path.exists(body_path) else None
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def body(self, url):
+        meta_path, body_path = self.paths(url)
+        with open(body_path, "rb") as f:
+            body = f.read()
+        # Mark the entry as recently used for eviction
+        try:
+            os.utime(meta_path)
+        except OSError:
+            pass
+        return body
+
+    def store(self, url, headers, body):
+        etag = headers.get("ETag")
+        last_modified = headers.get("Last-Modified")
+        if not etag and not last_modified:
+            return
+        meta_path, body_path = self.paths(url)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        if self.size is None:
+            self.size = sum(size for _, size, _ in self.entries())
+        self.size += len(body) - file_size(body_path)
+        # Write the body first so a metadata file always points at a complete body
+        write_atomic(body_path, body)
+        entry = {
+            "url": url,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_type": headers.get("Content-Type", ""),
+        }
+        write_atomic(meta_path, json.dumps(entry).encode("utf-8"))
+        if self.size > self.max_bytes:
+            self.evict(int(self.max_bytes * 0.9))
+
+    def entries(self):
+        """(metadata path, body size, last used) of every cached entry."""
+        for meta_path in glob.glob(os.path.join(glob.escape(self.directory), "??", "*.json")):
+            try:
+                used = os.path.getmtime(meta_path)
+            except OSError:
+                continue
+            yield meta_path, file_size(meta_path[:-len(".json")] + ".body"), used
+
+    def evict(self, target_bytes):
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        self.size = sum(size for _, size, _ in entries)
+        for meta_path, size, _ in entries:
+            if self.size <= target_bytes:
+                break
+            remove_entry(meta_path)
+            self.size -= size
+
+    def delete(self, url):
+        meta_path, _ = self.paths(url)
+        if self.size is not None:
+            self.size -= file_size(meta_path[:-len(".json")] + ".body")
+        remove_entry(meta_path)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self.size = 0
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def remove_entry(meta_path):
+    # The metadata goes first, a body without metadata is never read
+    for path in (meta_path, meta_path[:-len(".json")] + ".body"):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def write_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
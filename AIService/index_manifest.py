@@ -0,0 +1,46 @@
+import hashlib
+import json
+import os
+import re
+
+
+def chunk_id(doc):
+    """
+    Deterministic vector ID for a chunk, derived from its source, page, start index and content.
+    The same chunk always gets the same ID, and any change to its text gives it a new one.
+    """
+    content_hash = hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()
+    key = "\x1f".join([
+        str(doc.metadata.get("source", "")),
+        str(doc.metadata.get("page", "")),
+        str(doc.metadata.get("start_index", "")),
+        content_hash,
+    ])
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+
+
+class IndexManifest:
+    """Local record of the chunk IDs currently stored in each vector store namespace."""
+
+    def __init__(self, directory="index_manifests"):
+        self.directory = directory
+
+    def path(self, namespace):
+        safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", namespace) or "_default"
+        return os.path.join(self.directory, f"{safe_name}.json")
+
+    def load(self, namespace):
+        """Return the set of IDs recorded for `namespace`, or None if it was never recorded."""
+        try:
+            with open(self.path(namespace)) as f:
+                return set(json.load(f)["ids"])
+        except FileNotFoundError:
+            return None
+
+    def save(self, namespace, ids):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(namespace)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"namespace": namespace, "ids": sorted(ids)}, f)
+        os.replace(tmp_path, path)
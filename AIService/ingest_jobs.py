@@ -0,0 +1,234 @@
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+STAGES = ("crawl", "split", "embed", "upsert")
+ACTIVE_STATUSES = ("queued", "running")
+
+
+class IngestJob:
+    """Status and per-stage progress of one company document ingestion."""
+
+    def __init__(self, url, company, store=None):
+        self.id = uuid.uuid4().hex
+        self.url = url
+        self.company = company
+        self.status = "queued"
+        self.error = None
+        self.result = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stages = {stage: {"status": "pending", "count": 0, "total": None} for stage in STAGES}
+        self.lock = threading.Lock()
+        self.store = store
+        self.saved_at = 0.0
+
+    def start(self, stage, total=None):
+        with self.lock:
+            self.stages[stage].update(status="running", total=total)
+        self.save()
+
+    def update(self, stage, count):
+        with self.lock:
+            self.stages[stage]["count"] = count
+        # Counts change for every page and chunk, the shared store only gets them about once a second
+        self.save(force=False)
+
+    def finish(self, stage, count=None):
+        with self.lock:
+            if count is not None:
+                self.stages[stage]["count"] = count
+            self.stages[stage]["status"] = "done"
+        self.save()
+
+    def save(self, force=True):
+        if self.store is None or (not force and time.time() - self.saved_at < self.store.save_interval):
+            return
+        self.saved_at = time.time()
+        self.store.save(self)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "job_id": self.id,
+                "url": self.url,
+                "company": self.company,
+                "status": self.status,
+                "error": self.error,
+                "result": self.result,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "stages": {stage: dict(progress) for stage, progress in self.stages.items()},
+            }
+
+
+class JobStore:
+    """
+    Ingestion jobs in SQLite, so every worker process on the host sees the same jobs.
+
+    Active jobs are saved at least every `save_interval` seconds while they make progress.
+    One that has not been saved for `stale_seconds` belonged to a process that stopped and
+    is marked failed. Only the most recent `history` finished jobs are retained.
+    """
+
+    def __init__(self, path=":memory:", history=500, stale_seconds=900, save_interval=1.0):
+        self.history = history
+        self.stale_seconds = stale_seconds
+        self.save_interval = save_interval
+        self.lock = threading.Lock()
+        # Transactions are opened explicitly, see submit()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        if path != ":memory:":
+            self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS ingest_jobs (
+                job_id TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                company TEXT NOT NULL,
+                status TEXT NOT NULL,
+                job TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS ingest_jobs_active ON ingest_jobs (url, company, status);
+            """
+        )
+
+    def submit(self, job):
+        """Insert `job` unless its URL/company pair already has an active job. Returns the active job's snapshot or None."""
+        with self.lock:
+            # BEGIN IMMEDIATE takes the write lock, two processes cannot both insert the same pair
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                self.fail_stale()
+                row = self.conn.execute(
+                    "SELECT job FROM ingest_jobs WHERE url = ? AND company = ? AND status IN (?, ?)",
+                    (job.url, job.company, *ACTIVE_STATUSES),
+                ).fetchone()
+                if row is None:
+                    self.write(job.snapshot())
+                    self.prune()
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+        return json.loads(row[0]) if row else None
+
+    def save(self, job):
+        # Snapshot under the lock, a heartbeat save can never overwrite a newer state
+        with self.lock:
+            self.write(job.snapshot())
+
+    def write(self, snapshot):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ingest_jobs VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                snapshot["job_id"],
+                snapshot["url"],
+                snapshot["company"],
+                snapshot["status"],
+                json.dumps(snapshot),
+                snapshot["created_at"],
+                time.time(),
+            ),
+        )
+
+    def get(self, job_id):
+        with self.lock:
+            row = self.conn.execute("SELECT job FROM ingest_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def fail_stale(self):
+        cutoff = time.time() - self.stale_seconds
+        for (job,) in self.conn.execute(
+            "SELECT job FROM ingest_jobs WHERE status IN (?, ?) AND updated_at < ?", (*ACTIVE_STATUSES, cutoff)
+        ).fetchall():
+            job = json.loads(job)
+            job.update(status="failed", error="The worker running this job stopped", finished_at=time.time())
+            self.write(job)
+
+    def prune(self):
+        self.conn.execute(
+            "DELETE FROM ingest_jobs WHERE job_id IN (SELECT job_id FROM ingest_jobs WHERE status NOT IN (?, ?) "
+            "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (*ACTIVE_STATUSES, self.history),
+        )
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.conn.execute("SELECT status, COUNT(*) FROM ingest_jobs GROUP BY status").fetchall())
+        return {status: counts.get(status, 0) for status in ("queued", "running", "success", "failed")}
+
+
+class IngestJobManager:
+    """
+    Runs ingestion jobs on a worker pool so uploads return immediately.
+
+    `runner(job)` does the work, reports progress on the job and returns a result dict.
+    Submitting a URL/company pair that already has a queued or running job returns that
+    job instead of starting another one. Jobs are kept in a JobStore at `path`; point it at
+    a file shared by the worker processes so any of them can report on any job. `active`
+    holds the jobs running in this process; they are saved every `stale_seconds / 3` even
+    when a stage makes no progress, so other processes do not take them for abandoned.
+    """
+
+    def __init__(self, runner, workers=2, history=500, path=":memory:", stale_seconds=900):
+        self.runner = runner
+        self.store = JobStore(path, history=history, stale_seconds=stale_seconds)
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="ingest")
+        self.active = {}
+        self.lock = threading.Lock()
+        self.heartbeat_seconds = max(stale_seconds / 3, 1)
+        threading.Thread(target=self.heartbeat, daemon=True, name="ingest-heartbeat").start()
+
+    def heartbeat(self):
+        while True:
+            time.sleep(self.heartbeat_seconds)
+            with self.lock:
+                jobs = list(self.active.values())
+            for job in jobs:
+                job.save()
+
+    def submit(self, url, company):
+        """Return (job snapshot, created) for the ingestion of `url` into `company`."""
+        job = IngestJob(url, company, store=self.store)
+        existing = self.store.submit(job)
+        if existing is not None:
+            return existing, False
+        with self.lock:
+            self.active[job.id] = job
+        self.pool.submit(self.run, job)
+        return job.snapshot(), True
+
+    def get(self, job_id):
+        return self.store.get(job_id)
+
+    def run(self, job):
+        with job.lock:
+            job.status = "running"
+            job.started_at = time.time()
+        job.save()
+        try:
+            result = self.runner(job)
+            status, error = "success", None
+        except Exception as e:
+            print(f"Ingestion job {job.id} failed for {job.url} ({job.company}): {e}")
+            result, status, error = None, "failed", str(e)
+        with job.lock:
+            job.result = result
+            job.status = status
+            job.error = error
+            job.finished_at = time.time()
+        job.save()
+        with self.lock:
+            self.active.pop(job.id, None)
+
+    def stats(self):
+        return self.store.stats()
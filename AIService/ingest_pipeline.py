@@ -0,0 +1,249 @@
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import embed_rate_per_second, embed_workers, upsert_workers
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket for embedding requests. The refill rate is halved whenever the provider
+    answers 429 and raised by a small step after every success (AIMD), so the pipeline
+    settles just below the quota instead of sleeping a fixed amount.
+    """
+
+    def __init__(self, rate=5.0, min_rate=0.2, max_rate=50.0, increase=0.1, burst=5):
+        self.rate = rate
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if now >= self.paused_until and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = max(self.paused_until - now, (1 - self.tokens) / self.rate)
+            time.sleep(wait)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+
+    def on_rate_limited(self, pause=1.0):
+        with self.lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+
+# Shared by every pipeline in the process so concurrent ingestions share the embedding quota
+embedding_rate_limiter = AdaptiveRateLimiter(rate=embed_rate_per_second)
+
+
+def is_rate_limited(error):
+    message = str(error).lower()
+    return "429" in message or "rate limit" in message or "resource exhausted" in message or "quota" in message
+
+
+class IngestionPipeline:
+    """
+    Embed and upsert documents into one namespace in pipelined batches.
+
+    Batch N+1 is embedded while batch N is upserted, on bounded worker pools, with at most
+    `max_in_flight` batches held in memory. Failed batches go to a retry queue and are tried
+    again after a backoff without blocking the other batches; a batch whose embeddings
+    succeeded only retries the upsert. Batches still failing after `max_retries` are reported.
+    `on_upsert` is called with the (id, document) pairs of each batch once it is upserted.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        index,
+        namespace,
+        batch_size=50,
+        max_retries=5,
+        base_delay=2,
+        max_in_flight=None,
+        limiter=embedding_rate_limiter,
+        text_key="text",
+        on_progress=None,
+        on_upsert=None,
+    ):
+        self.embeddings = embeddings
+        self.index = index
+        self.namespace = namespace
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_in_flight = max_in_flight or (embed_workers + upsert_workers) * 2
+        self.limiter = limiter
+        self.text_key = text_key
+        self.on_progress = on_progress
+        self.on_upsert = on_upsert
+
+    def batches(self, documents, ids):
+        batch = []
+        if ids is None:
+            id_for = lambda doc: str(uuid.uuid4())
+        elif callable(ids):
+            id_for = ids
+        else:
+            ids = iter(ids)
+            id_for = lambda doc: next(ids)
+        for doc in documents:
+            batch.append((id_for(doc), doc))
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def run(self, documents, ids=None):
+        """
+        Ingest `documents` (any iterable) and return the run's statistics. `ids` is an iterable
+        of IDs in the same order as the documents, or a function returning a document's ID.
+        """
+        self.stats = {
+            "namespace": self.namespace,
+            "documents": 0,
+            "batches": 0,
+            "embedded": 0,
+            "upserted": 0,
+            "retries": 0,
+            "failed_batches": 0,
+            "failed_documents": 0,
+            "uploaded_ids": [],
+        }
+        self.lock = threading.Lock()
+        self.retry_queue = queue.Queue()
+        self.in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self.outstanding = 0
+        started_at = time.monotonic()
+
+        source = self.batches(documents, ids)
+        exhausted = False
+        with ThreadPoolExecutor(embed_workers, thread_name_prefix="embed") as self.embed_pool, \
+                ThreadPoolExecutor(upsert_workers, thread_name_prefix="upsert") as self.upsert_pool:
+            while True:
+                job = self.next_retry()
+                if job is None and not exhausted:
+                    batch = next(source, None)
+                    if batch is None:
+                        exhausted = True
+                    else:
+                        with self.lock:
+                            self.stats["batches"] += 1
+                            self.stats["documents"] += len(batch)
+                        job = {"number": self.stats["batches"], "batch": batch, "vectors": None, "attempt": 0, "not_before": 0}
+                if job is None:
+                    with self.lock:
+                        done = exhausted and self.outstanding == 0 and self.retry_queue.empty()
+                    if done:
+                        break
+                    time.sleep(0.05)
+                    continue
+                self.in_flight.acquire()
+                with self.lock:
+                    self.outstanding += 1
+                if job["vectors"] is None:
+                    self.embed_pool.submit(self.embed, job)
+                else:
+                    self.upsert_pool.submit(self.upsert, job)
+
+        seconds = time.monotonic() - started_at
+        self.stats["seconds"] = round(seconds, 2)
+        self.stats["documents_per_second"] = round(self.stats["upserted"] / seconds, 1) if seconds else 0.0
+        print(
+            f"[{self.namespace}] Upserted {self.stats['upserted']}/{self.stats['documents']} documents "
+            f"in {self.stats['batches']} batches, {self.stats['seconds']}s "
+            f"({self.stats['documents_per_second']} docs/s), {self.stats['retries']} retries, "
+            f"{self.stats['failed_batches']} failed batches"
+        )
+        return self.stats
+
+    def next_retry(self):
+        """Pop a retry job whose backoff has elapsed, if any."""
+        try:
+            job = self.retry_queue.get_nowait()
+        except queue.Empty:
+            return None
+        if job["not_before"] > time.monotonic():
+            self.retry_queue.put(job)
+            return None
+        return job
+
+    def embed(self, job):
+        try:
+            self.limiter.acquire()
+            texts = [doc.page_content for _, doc in job["batch"]]
+            job["vectors"] = self.embeddings.embed_documents(texts)
+            self.limiter.on_success()
+            with self.lock:
+                self.stats["embedded"] += len(texts)
+            self.progress("embed", self.stats["embedded"])
+        except Exception as e:
+            self.failed(job, e)
+            return
+        self.upsert_pool.submit(self.upsert, job)
+
+    def upsert(self, job):
+        try:
+            vectors = [
+                (id, vector, {**doc.metadata, self.text_key: doc.page_content})
+                for (id, doc), vector in zip(job["batch"], job["vectors"])
+            ]
+            self.index.upsert(vectors=vectors, namespace=self.namespace)
+            with self.lock:
+                self.stats["upserted"] += len(vectors)
+                self.stats["uploaded_ids"].extend(id for id, _ in job["batch"])
+            self.progress("upsert", self.stats["upserted"])
+        except Exception as e:
+            self.failed(job, e)
+            return
+        if self.on_upsert:
+            try:
+                self.on_upsert(job["batch"])
+            except Exception as e:
+                print(f"[ERROR] on_upsert failed for batch {job['number']}: {e}")
+        self.finish()
+
+    def failed(self, job, error):
+        rate_limited = is_rate_limited(error)
+        if rate_limited and job["vectors"] is None:
+            self.limiter.on_rate_limited(pause=self.base_delay)
+        if job["attempt"] < self.max_retries:
+            delay = self.base_delay * (2 ** job["attempt"])
+            print(f"[Retry {job['attempt'] + 1}] Batch {job['number']} failed ({'rate limited' if rate_limited else error}), retrying in {delay}s")
+            job["attempt"] += 1
+            job["not_before"] = time.monotonic() + delay
+            with self.lock:
+                self.stats["retries"] += 1
+            self.retry_queue.put(job)
+        else:
+            print(f"[ERROR] Giving up on batch {job['number']} after {self.max_retries} retries: {error}")
+            with self.lock:
+                self.stats["failed_batches"] += 1
+                self.stats["failed_documents"] += len(job["batch"])
+        self.finish()
+
+    def finish(self):
+        with self.lock:
+            self.outstanding -= 1
+        self.in_flight.release()
+
+    def progress(self, stage, count):
+        if self.on_progress:
+            self.on_progress(stage, count)
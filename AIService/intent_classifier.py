@@ -0,0 +1,207 @@
+import re
+import threading
+
+from startup import lazy
+
+PROVINCES = [
+    "Alberta", "British Columbia", "Manitoba", "New Brunswick", "Newfoundland and Labrador",
+    "Nova Scotia", "Northwest Territories", "Nunavut", "Ontario", "Prince Edward Island",
+    "Quebec", "Saskatchewan", "Yukon",
+]
+
+PROVINCE_ALIASES = {
+    "bc": "British Columbia", "b.c.": "British Columbia", "pei": "Prince Edward Island",
+    "p.e.i.": "Prince Edward Island", "nwt": "Northwest Territories", "québec": "Quebec",
+    "newfoundland": "Newfoundland and Labrador",
+}
+
+# Labeled exemplars the classifier is trained on.
+EXEMPLARS = {
+    "employment": [
+        "What are the vacation entitlements in Ontario?",
+        "How many vacation days do I get per year?",
+        "What is the minimum wage in Alberta?",
+        "Am I entitled to overtime pay?",
+        "How is overtime calculated for hours over 44 a week?",
+        "What are the steps to apply for parental leave?",
+        "How long is maternity leave?",
+        "Can my employer fire me without notice?",
+        "How much notice do I need to give before quitting?",
+        "What is the termination pay I should receive?",
+        "Do I get paid for statutory holidays?",
+        "Is Remembrance Day a public holiday in my province?",
+        "How many sick days am I allowed?",
+        "Does my employer have to give me breaks?",
+        "How long is a meal break?",
+        "What are my rights if I am laid off?",
+        "What is a temporary layoff?",
+        "Can my boss cut my hours?",
+        "What is the maximum number of hours I can work in a day?",
+        "What is an averaging agreement?",
+        "What does section 54 of the employment standards act say?",
+        "Can I refuse unsafe work?",
+        "What should I do if I was not paid my wages?",
+        "How do I file an employment standards complaint?",
+        "When must my employer pay my final paycheque?",
+        "Is my employer allowed to deduct money from my pay?",
+        "What benefits does the company offer?",
+        "What is the company's vacation policy?",
+        "Does the company offer dental coverage?",
+        "What is the dress code at work?",
+        "How many people work at the company?",
+        "What is the remote work policy?",
+        "How do I request time off?",
+        "What is the bereavement leave policy?",
+        "Can I take unpaid leave to care for a family member?",
+        "Am I an employee or an independent contractor?",
+        "What is the probation period for new employees?",
+        "Do part-time workers get holiday pay?",
+        "What are the rules for tips and gratuities?",
+        "Can my employer make me work on Sunday?",
+        "what's the vacation policy",
+        "do they offer sick leave",
+        "how much is severance pay",
+        "rules for working from home",
+        "pay equity rules",
+        "What are the harassment policies at work?",
+        "What is the expense reimbursement process?",
+        "How are performance reviews done?",
+    ],
+    "greeting": [
+        "hi",
+        "hello",
+        "hey",
+        "hey there",
+        "hi there!",
+        "good morning",
+        "good afternoon",
+        "good evening",
+        "hello, how are you?",
+        "how are you doing today?",
+        "what's up",
+        "yo",
+        "greetings",
+        "nice to meet you",
+        "who are you?",
+        "what can you do?",
+    ],
+    "closing": [
+        "thanks",
+        "thank you",
+        "thank you so much!",
+        "thanks for the help",
+        "ok thanks",
+        "great, thanks",
+        "thanks a lot",
+        "that helps, thank you",
+        "perfect, that's all I needed",
+        "got it, thanks",
+        "awesome thanks",
+        "cheers",
+        "bye",
+        "goodbye",
+        "bye for now",
+        "see you later",
+        "have a nice day",
+        "that's all, thanks",
+    ],
+    "other": [
+        "What is the weather like today?",
+        "Tell me a joke",
+        "Write me a poem about the ocean",
+        "What is the capital of France?",
+        "Who won the hockey game last night?",
+        "Can you help me with my math homework?",
+        "What is 12 times 14?",
+        "Recommend a good movie",
+        "How do I cook pasta?",
+        "Translate this sentence into Spanish",
+        "What is the meaning of life?",
+        "Explain quantum physics",
+        "What about that?",
+        "And for part-time?",
+        "Can you explain more?",
+        "What do you mean?",
+        "Tell me more",
+        "Why?",
+        "Summarize your last answer",
+        "Is that true?",
+    ],
+}
+
+GREETING_REPLY = (
+    "Hello! I can help with questions about employment standards in your province "
+    "and your company's workplace policies. What would you like to know?"
+)
+
+CLOSING_REPLY = "You're welcome! Feel free to come back if you have more questions about your workplace."
+
+# Labels answered with a canned reply, without retrieval or an LLM call
+CANNED_REPLIES = {"greeting": GREETING_REPLY, "closing": CLOSING_REPLY}
+
+
+class IntentClassifier:
+    """
+    CPU-only text classifier (word and character TF-IDF + logistic regression) that decides
+    whether a question obviously needs retrieval, is a greeting or closing, or should be left to the LLM.
+    It is trained by `train`, or by the first classification.
+    """
+
+    def __init__(self, exemplars=EXEMPLARS):
+        self.exemplars = exemplars
+        self.model = None
+        self.train_lock = threading.Lock()
+        self.lock = threading.Lock()
+        self.counters = {"tools": 0, "greeting": 0, "closing": 0, "llm": 0}
+
+    def train(self):
+        """Train the classifier if it is not trained yet."""
+        with self.train_lock:
+            if self.model is None:
+                # scikit-learn takes about a second to import, only pay for it here
+                from sklearn.feature_extraction.text import TfidfVectorizer
+                from sklearn.linear_model import LogisticRegression
+                from sklearn.pipeline import FeatureUnion, make_pipeline
+
+                texts = [text for label in self.exemplars for text in self.exemplars[label]]
+                labels = [label for label in self.exemplars for _ in self.exemplars[label]]
+                features = FeatureUnion([
+                    ("words", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)),
+                    ("chars", TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True)),
+                ])
+                model = make_pipeline(features, LogisticRegression(C=10, max_iter=1000))
+                model.fit(texts, labels)
+                self.model = model
+        return self
+
+    def classify(self, text):
+        """Return the most likely label and its probability."""
+        model = self.model or self.train().model
+        probabilities = model.predict_proba([text])[0]
+        best = probabilities.argmax()
+        return model.classes_[best], float(probabilities[best])
+
+    def count(self, route):
+        with self.lock:
+            self.counters[route] += 1
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "trained": self.model is not None}
+
+
+def find_province(text, default):
+    """Return the province named in the question, or `default` if none is mentioned."""
+    lower_text = text.lower()
+    for province in PROVINCES:
+        if province.lower() in lower_text:
+            return province
+    for alias, province in PROVINCE_ALIASES.items():
+        if re.search(rf"(?<!\w){re.escape(alias)}(?!\w)", lower_text):
+            return province
+    return default
+
+
+intent_classifier = IntentClassifier()
+# Trained by the warm-up after startup, or by the first question
+lazy("intent_classifier", intent_classifier.train, required=False)
@@ -0,0 +1,518 @@
+"""local_vector_store.py
+In-process vector store, an alternative to Pinecone for small deployments and offline tests.
+
+`LocalIndex` answers the Pinecone index calls the service makes (upsert, query, list, fetch,
+delete, describe_index_stats) and `LocalVectorStore` is the LangChain vector store on top of
+it, used in place of PineconeVectorStore. Scores are cosine similarities, like the hosted index.
+
+Each namespace lives in its own directory:
+
+    <directory>/<quoted namespace>/
+        partition.json   namespace and dimension
+        vectors.f32      float32 rows, append-only, memory-mapped for queries
+        log.jsonl        upserts (id, row, metadata) and deletes, replayed on load
+        centroids.npy    IVF centroids, once the namespace is large enough
+
+Updates and deletes only append to the log; rows that are no longer live are dropped by
+compaction when they outnumber the live ones. Compaction writes the live rows to a
+`<directory>#compact` copy and swaps it in with renames, so a crash part way leaves either
+the old or the new files. Namespaces with fewer than `ivf_threshold`
+rows are searched exhaustively; larger ones are partitioned into about sqrt(n) clusters
+(IVF) and a query only scores the rows of the `nprobe` clusters closest to it.
+"""
+
+import json
+import os
+import shutil
+import threading
+import uuid
+from types import SimpleNamespace
+from urllib.parse import quote
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+
+# Metadata fields kept as columns so filters on them are evaluated with numpy
+COLUMNS = ("source", "company", "created_at")
+# Below this many candidate rows a filtered query is exact rather than going through IVF
+EXACT_SEARCH_ROWS = 4096
+# Suffixes of the directories used while compacting, quote() never produces a "#"
+COMPACT_SUFFIX = "#compact"
+REPLACED_SUFFIX = "#replaced"
+
+
+def recover(directory):
+    """Finish or undo a compaction of `directory` interrupted by a crash."""
+    compacted, replaced = directory + COMPACT_SUFFIX, directory + REPLACED_SUFFIX
+    if not os.path.exists(directory):
+        # Crashed between the two renames, the compacted copy was complete
+        if os.path.exists(compacted):
+            os.replace(compacted, directory)
+        elif os.path.exists(replaced):
+            os.replace(replaced, directory)
+    shutil.rmtree(compacted, ignore_errors=True)
+    shutil.rmtree(replaced, ignore_errors=True)
+
+
+class Partition:
+    """The vectors of one namespace."""
+
+    def __init__(self, directory, namespace):
+        self.directory = directory
+        self.namespace = namespace
+        self.lock = threading.RLock()
+        recover(directory)
+        self.reset()
+        self.load()
+
+    def reset(self):
+        self.dimension = None
+        self.ids = []
+        self.metadata = []
+        self.positions = {}
+        self.alive = np.zeros(0, dtype=bool)
+        self.norms = np.zeros(0, dtype=np.float32)
+        self.columns = {field: np.zeros(0, dtype=object) for field in COLUMNS}
+        self.centroids = None
+        self.lists = np.zeros(0, dtype=np.int32)
+        self.trained_rows = 0
+        self.mapped = None
+
+    @property
+    def rows(self):
+        return len(self.ids)
+
+    @property
+    def live(self):
+        return len(self.positions)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def load(self):
+        if not os.path.exists(self.path("partition.json")):
+            return
+        with open(self.path("partition.json")) as f:
+            self.dimension = json.load(f)["dimension"]
+        records = []
+        with open(self.path("log.jsonl"), "r+b") as f:
+            offset = 0
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A write interrupted by a crash, everything before it is intact
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+        rows = []
+        for record in records:
+            if "delete" in record:
+                for id in record["delete"]:
+                    self.positions.pop(id, None)
+            else:
+                rows.append((record["id"], record["metadata"]))
+                self.positions[record["id"]] = record["row"]
+        # Vectors written without their log record are dropped
+        with open(self.path("vectors.f32"), "r+b") as f:
+            f.truncate(len(rows) * self.dimension * 4)
+        self.ids = [id for id, _ in rows]
+        self.metadata = [metadata for _, metadata in rows]
+        self.alive = np.zeros(len(rows), dtype=bool)
+        self.alive[list(self.positions.values())] = True
+        vectors = self.vectors()
+        self.norms = np.linalg.norm(vectors, axis=1).astype(np.float32) if len(rows) else self.norms
+        self.columns = {field: column([metadata.get(field) for metadata in self.metadata]) for field in COLUMNS}
+        if os.path.exists(self.path("centroids.npy")):
+            self.centroids = np.load(self.path("centroids.npy"))
+            self.lists = assign(vectors, self.centroids)
+            self.trained_rows = self.live
+
+    def vectors(self):
+        """Memory map of all rows, live or not."""
+        if self.mapped is None or len(self.mapped) != self.rows:
+            if self.rows == 0:
+                return np.zeros((0, self.dimension or 0), dtype=np.float32)
+            self.mapped = np.memmap(self.path("vectors.f32"), dtype=np.float32, mode="r", shape=(self.rows, self.dimension))
+        return self.mapped
+
+    def upsert(self, records):
+        ids = [id for id, _, _ in records]
+        values = np.asarray([values for _, values, _ in records], dtype=np.float32)
+        with self.lock:
+            if self.dimension is None:
+                os.makedirs(self.directory, exist_ok=True)
+                self.dimension = values.shape[1]
+                with open(self.path("partition.json"), "w") as f:
+                    json.dump({"dimension": self.dimension, "namespace": self.namespace}, f)
+                open(self.path("vectors.f32"), "wb").close()
+                open(self.path("log.jsonl"), "wb").close()
+            if values.shape[1] != self.dimension:
+                raise ValueError(f"Vector dimension {values.shape[1]} does not match the namespace dimension {self.dimension}")
+            start = self.rows
+            with open(self.path("vectors.f32"), "ab") as f:
+                f.write(values.tobytes())
+            with open(self.path("log.jsonl"), "a") as f:
+                for row, (id, _, metadata) in enumerate(records, start):
+                    f.write(json.dumps({"id": id, "row": row, "metadata": metadata}) + "\n")
+
+            self.alive[[self.positions[id] for id in set(ids) if id in self.positions]] = False
+            for row, id in enumerate(ids, start):
+                self.positions[id] = row
+            self.ids.extend(ids)
+            self.metadata.extend(metadata for _, _, metadata in records)
+            # The last record wins when an ID appears twice in one upsert
+            alive = np.array([self.positions[id] == row for row, id in enumerate(ids, start)], dtype=bool)
+            self.alive = np.concatenate([self.alive, alive])
+            norms = np.linalg.norm(values, axis=1).astype(np.float32)
+            self.norms = np.concatenate([self.norms, norms])
+            for field in COLUMNS:
+                self.columns[field] = np.concatenate([self.columns[field], column([metadata.get(field) for _, _, metadata in records])])
+            if self.centroids is not None:
+                self.lists = np.concatenate([self.lists, assign(values, self.centroids)])
+        return len(records)
+
+    def delete(self, ids):
+        with self.lock:
+            ids = [id for id in dict.fromkeys(ids) if id in self.positions]
+            if not ids:
+                return 0
+            with open(self.path("log.jsonl"), "a") as f:
+                f.write(json.dumps({"delete": ids}) + "\n")
+            self.alive[[self.positions.pop(id) for id in ids]] = False
+            if self.rows - self.live > max(self.live, 1000):
+                self.compact()
+            return len(ids)
+
+    def compact(self):
+        """Rewrite the files with the live rows only."""
+        with self.lock:
+            rows = np.flatnonzero(self.alive)
+            compacted, replaced = self.directory + COMPACT_SUFFIX, self.directory + REPLACED_SUFFIX
+            shutil.rmtree(compacted, ignore_errors=True)
+            os.makedirs(compacted)
+            with open(os.path.join(compacted, "vectors.f32"), "wb") as f:
+                for start in range(0, len(rows), 65536):
+                    f.write(np.asarray(self.vectors()[rows[start:start + 65536]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            with open(os.path.join(compacted, "log.jsonl"), "w") as f:
+                for new_row, row in enumerate(rows):
+                    f.write(json.dumps({"id": self.ids[row], "row": new_row, "metadata": self.metadata[row]}) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            if self.centroids is not None:
+                np.save(os.path.join(compacted, "centroids.npy"), self.centroids)
+            with open(os.path.join(compacted, "partition.json"), "w") as f:
+                json.dump({"dimension": self.dimension, "namespace": self.namespace}, f)
+            # The directory itself cannot be replaced while it holds files, so it is moved
+            # aside first; recover() completes the swap after a crash in between
+            os.replace(self.directory, replaced)
+            os.replace(compacted, self.directory)
+            shutil.rmtree(replaced)
+            self.reset()
+            self.load()
+
+    def mask(self, filter):
+        """Live rows matching a Pinecone metadata filter."""
+        alive = self.alive.copy()
+        if not filter:
+            return alive
+        return alive & evaluate(filter, self)
+
+    def query(self, vector, top_k, filter=None, nprobe=8):
+        vector = np.asarray(vector, dtype=np.float32)
+        with self.lock:
+            if self.live == 0:
+                return []
+            mask = self.mask(filter)
+            vectors = self.vectors()
+            norms = self.norms
+            candidates = np.flatnonzero(mask)
+            if self.centroids is not None and len(candidates) > EXACT_SEARCH_ROWS:
+                probes = np.argsort(-(self.centroids @ vector))[:nprobe]
+                candidates = np.flatnonzero(mask & np.isin(self.lists, probes))
+        if len(candidates) == 0:
+            return []
+        if len(candidates) == len(vectors):
+            scores = vectors @ vector
+        else:
+            scores = vectors[candidates] @ vector
+        scores = scores / (norms[candidates] * (np.linalg.norm(vector) or 1.0) + 1e-12)
+        top = np.argpartition(-scores, top_k)[:top_k] if len(scores) > top_k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+    def train(self, min_rows, sample=50000, seed=42):
+        """Partition the namespace into clusters once it has `min_rows` live rows, and again when it doubles."""
+        with self.lock:
+            if self.live < min_rows or (self.centroids is not None and self.live < 2 * self.trained_rows):
+                return False
+            rows = np.flatnonzero(self.alive)
+            rng = np.random.default_rng(seed)
+            if len(rows) > sample:
+                rows = np.sort(rng.choice(rows, sample, replace=False))
+            vectors = self.vectors()
+            points = np.asarray(vectors[rows]) / (self.norms[rows, None] + 1e-12)
+        from sklearn.cluster import MiniBatchKMeans
+
+        clusters = max(16, int(np.sqrt(self.live)))
+        kmeans = MiniBatchKMeans(n_clusters=clusters, init="random", n_init=1, batch_size=4096, random_state=seed).fit(points)
+        centroids = kmeans.cluster_centers_.astype(np.float32)
+        centroids /= np.linalg.norm(centroids, axis=1, keepdims=True) + 1e-12
+        with self.lock:
+            self.centroids = centroids
+            self.lists = assign(self.vectors(), centroids)
+            self.trained_rows = self.live
+            np.save(self.path("centroids.npy"), centroids)
+        return True
+
+
+def column(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def assign(vectors, centroids, batch=65536):
+    """Nearest centroid of each row."""
+    lists = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch):
+        rows = np.asarray(vectors[start:start + batch])
+        lists[start:start + batch] = np.argmax(rows @ centroids.T, axis=1)
+    return lists
+
+
+OPERATORS = {
+    "$eq": lambda values, operand: values == operand,
+    "$ne": lambda values, operand: values != operand,
+    "$gt": lambda values, operand: compare(values, operand, np.greater),
+    "$gte": lambda values, operand: compare(values, operand, np.greater_equal),
+    "$lt": lambda values, operand: compare(values, operand, np.less),
+    "$lte": lambda values, operand: compare(values, operand, np.less_equal),
+    "$in": lambda values, operand: contains(values, operand),
+    "$nin": lambda values, operand: ~contains(values, operand),
+}
+
+
+def contains(values, operand):
+    operand = set(operand)
+    return np.fromiter((value in operand for value in values), dtype=bool, count=len(values))
+
+
+def compare(values, operand, operator):
+    result = np.zeros(len(values), dtype=bool)
+    numeric = np.array([isinstance(value, (int, float)) and not isinstance(value, bool) for value in values], dtype=bool)
+    result[numeric] = operator(values[numeric].astype(np.float64), operand)
+    return result
+
+
+def evaluate(filter, partition):
+    """Rows of a partition matching a Pinecone metadata filter ($eq, $ne, $gt(e), $lt(e), $in, $nin, $and, $or)."""
+    mask = np.ones(partition.rows, dtype=bool)
+    for key, condition in filter.items():
+        if key == "$and":
+            for part in condition:
+                mask &= evaluate(part, partition)
+        elif key == "$or":
+            either = np.zeros(partition.rows, dtype=bool)
+            for part in condition:
+                either |= evaluate(part, partition)
+            mask &= either
+        else:
+            if key in partition.columns:
+                values = partition.columns[key]
+            else:
+                values = column([metadata.get(key) for metadata in partition.metadata])
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if operator not in OPERATORS:
+                    raise ValueError(f"Unsupported filter operator {operator}")
+                mask &= np.asarray(OPERATORS[operator](values, operand), dtype=bool)
+    return mask
+
+
+class LocalIndex:
+    """
+    Namespace-partitioned vector index on local disk with the Pinecone index methods used
+    by this service.
+    """
+
+    def __init__(self, directory, ivf_threshold=20000, nprobe=8):
+        self.directory = directory
+        self.ivf_threshold = ivf_threshold
+        self.nprobe = nprobe
+        self.partitions = {}
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            for suffix in (COMPACT_SUFFIX, REPLACED_SUFFIX):
+                if name.endswith(suffix):
+                    recover(os.path.join(directory, name.removesuffix(suffix)))
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if os.path.exists(os.path.join(path, "partition.json")):
+                with open(os.path.join(path, "partition.json")) as f:
+                    namespace = json.load(f)["namespace"]
+                self.partitions[namespace] = Partition(path, namespace)
+
+    def partition(self, namespace, create=False):
+        namespace = namespace or ""
+        with self.lock:
+            if namespace not in self.partitions:
+                if not create:
+                    return None
+                path = os.path.join(self.directory, quote(namespace, safe="") or "__default__")
+                self.partitions[namespace] = Partition(path, namespace)
+            return self.partitions[namespace]
+
+    def upsert(self, vectors, namespace=None, **kwargs):
+        records = []
+        for vector in vectors:
+            if isinstance(vector, dict):
+                records.append((vector["id"], vector["values"], dict(vector.get("metadata") or {})))
+            else:
+                id, values, *metadata = vector
+                records.append((id, values, dict(metadata[0] if metadata else {})))
+        if not records:
+            return {"upserted_count": 0}
+        partition = self.partition(namespace, create=True)
+        count = partition.upsert(records)
+        partition.train(self.ivf_threshold)
+        return {"upserted_count": count}
+
+    def query(self, vector, top_k=10, namespace=None, filter=None, include_metadata=False, include_values=False, **kwargs):
+        partition = self.partition(namespace)
+        matches = []
+        if partition is not None:
+            for row, score in partition.query(vector, top_k, filter, self.nprobe):
+                match = {"id": partition.ids[row], "score": score}
+                if include_metadata:
+                    match["metadata"] = dict(partition.metadata[row])
+                if include_values:
+                    match["values"] = partition.vectors()[row].tolist()
+                matches.append(match)
+        return {"matches": matches, "namespace": namespace or ""}
+
+    def fetch(self, ids, namespace=None, **kwargs):
+        partition = self.partition(namespace)
+        vectors = {}
+        if partition is not None:
+            with partition.lock:
+                for id in ids:
+                    row = partition.positions.get(id)
+                    if row is not None:
+                        vectors[id] = SimpleNamespace(
+                            id=id, values=partition.vectors()[row].tolist(), metadata=dict(partition.metadata[row]),
+                        )
+        return SimpleNamespace(vectors=vectors, namespace=namespace or "")
+
+    def list(self, namespace=None, prefix=None, limit=100, **kwargs):
+        """Yield pages of at most `limit` IDs, like Pinecone's list."""
+        partition = self.partition(namespace)
+        if partition is None:
+            return
+        with partition.lock:
+            ids = sorted(id for id in partition.positions if prefix is None or id.startswith(prefix))
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def delete(self, ids=None, delete_all=False, namespace=None, filter=None, **kwargs):
+        partition = self.partition(namespace)
+        if partition is None:
+            return {}
+        if delete_all:
+            with self.lock:
+                self.partitions.pop(namespace or "", None)
+            with partition.lock:
+                shutil.rmtree(partition.directory, ignore_errors=True)
+        elif ids is not None:
+            partition.delete(ids)
+        elif filter is not None:
+            with partition.lock:
+                rows = np.flatnonzero(partition.mask(filter))
+                partition.delete([partition.ids[row] for row in rows])
+        else:
+            raise ValueError("Either ids, delete_all, or filter must be provided.")
+        return {}
+
+    def describe_index_stats(self, **kwargs):
+        with self.lock:
+            partitions = dict(self.partitions)
+        namespaces = {namespace: {"vector_count": partition.live} for namespace, partition in partitions.items() if partition.live}
+        dimensions = [partition.dimension for partition in partitions.values() if partition.dimension]
+        return {
+            "dimension": dimensions[0] if dimensions else 0,
+            "namespaces": namespaces,
+            "total_vector_count": sum(stats["vector_count"] for stats in namespaces.values()),
+        }
+
+
+class LocalVectorStore(VectorStore):
+    """LangChain vector store over a LocalIndex, a drop-in for PineconeVectorStore here."""
+
+    def __init__(self, embedding, index, text_key="text"):
+        self._embedding = embedding
+        self._index = index
+        self._text_key = text_key
+
+    @property
+    def embeddings(self):
+        return self._embedding
+
+    @property
+    def index(self):
+        return self._index
+
+    def add_texts(self, texts, metadatas=None, ids=None, namespace=None, batch_size=1000, **kwargs):
+        texts = list(texts)
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        for i in range(0, len(texts), batch_size):
+            vectors = self._embedding.embed_documents(texts[i:i + batch_size])
+            self._index.upsert(
+                vectors=[
+                    (id, vector, {**metadata, self._text_key: text})
+                    for id, vector, metadata, text in zip(ids[i:i + batch_size], vectors, metadatas[i:i + batch_size], texts[i:i + batch_size])
+                ],
+                namespace=namespace,
+            )
+        return ids
+
+    def similarity_search_by_vector_with_score(self, embedding, *, k=4, filter=None, namespace=None):
+        results = self._index.query(vector=embedding, top_k=k, include_metadata=True, namespace=namespace, filter=filter)
+        docs = []
+        for match in results["matches"]:
+            metadata = match["metadata"]
+            if self._text_key in metadata:
+                text = metadata.pop(self._text_key)
+                docs.append((Document(id=match["id"], page_content=text, metadata=metadata), match["score"]))
+        return docs
+
+    async def asimilarity_search_by_vector_with_score(self, embedding, *, k=4, filter=None, namespace=None):
+        # In-process and CPU bound for well under a millisecond on small namespaces
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, namespace=namespace)
+
+    def similarity_search_with_score(self, query, k=4, filter=None, namespace=None):
+        return self.similarity_search_by_vector_with_score(self._embedding.embed_query(query), k=k, filter=filter, namespace=namespace)
+
+    async def asimilarity_search_with_score(self, query, k=4, filter=None, namespace=None):
+        embedding = await self._embedding.aembed_query(query)
+        return self.similarity_search_by_vector_with_score(embedding, k=k, filter=filter, namespace=namespace)
+
+    def similarity_search(self, query, k=4, filter=None, namespace=None, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter, namespace=namespace)]
+
+    async def asimilarity_search(self, query, k=4, filter=None, namespace=None, **kwargs):
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k=k, filter=filter, namespace=namespace)]
+
+    def delete(self, ids=None, delete_all=None, namespace=None, filter=None, **kwargs):
+        self._index.delete(ids=ids, delete_all=bool(delete_all), namespace=namespace, filter=filter)
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, ids=None, index=None, namespace=None, **kwargs):
+        store = cls(embedding, index)
+        store.add_texts(texts, metadatas=metadatas, ids=ids, namespace=namespace)
+        return store
@@ -1,25 +1,64 @@
-import shutil
-import uuid
-import os
+import startup
 import re
-from fastapi import FastAPI, File, HTTPException, UploadFile
+import json
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, File, HTTPException, UploadFile, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from faster_whisper import WhisperModel
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
-from config import llm
-from rag_graph import graph
-from setupProvinces import process_docs
-from utils import store_user_message_to_vector_store, find_popular_questions_from_vector_db
+from config import (
+    llm, embeddings, ingest_job_workers, ingest_job_history, ingest_job_db_path, ingest_job_stale_seconds, popular_questions_refresh, popular_questions_ttl,
+    question_queue_batch_size, question_queue_flush_seconds, question_queue_max_pending, question_queue_drain_seconds,
+    whisper_model_size, whisper_device, whisper_compute_type, whisper_cpu_threads, whisper_replicas, whisper_max_queue,
+    whisper_profile, whisper_stream_partial_seconds, whisper_stream_silence_ms, warm_up_on_startup,
+    intent_confidence_threshold,
+)
+from rag_graph import graph, memory
+from bm25_index import keyword_index
+from intent_classifier import intent_classifier, CANNED_REPLIES
+from semantic_cache import answer_cache
+from ingest_jobs import IngestJobManager
+from popular_questions import PopularQuestionsCache
+from utils import store_user_messages_to_vector_store, find_popular_questions_from_vector_db
+from question_queue import QuestionQueue
+from transcription import TranscriptionPool, TranscriptionBusy, TranscriptionStream, profile_options
 from processCompanyDocs import crawl_company_docs, index_company_documents, delete_document_from_vector_db, delete_company_documents_from_vector_db
 import traceback
 
-from langchain_core.messages import ToolMessage
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
 from langchain_core.documents import Document
 
+@asynccontextmanager
+async def lifespan(app):
+    startup.record("import", startup.started_at)
+    # Clients and models load in the background; /ready reports when the service can answer
+    if warm_up_on_startup:
+        startup.warm_up()
+    yield
+    # Store the user questions still queued before the process exits
+    await asyncio.to_thread(question_queue.close, question_queue_drain_seconds)
+
 # Initialize FastAPI application
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
-model = WhisperModel("small", device="cpu", compute_type="int8", download_root="/tmp/whisper")
+def load_whisper_model():
+    from faster_whisper import WhisperModel
+
+    return WhisperModel(whisper_model_size, device=whisper_device, compute_type=whisper_compute_type, cpu_threads=whisper_cpu_threads, download_root="/tmp/whisper")
+
+# Speech-to-text runs on its own worker threads, one Whisper model replica per thread.
+# Chat does not need it, so it does not hold back readiness
+transcriber = TranscriptionPool(load_whisper_model, replicas=whisper_replicas, max_queue=whisper_max_queue)
+startup.lazy("whisper", transcriber.load, required=False)
+
+# Questions are rewritten and stored for the popular questions analytics off the request path
+question_queue = QuestionQueue(
+    store_user_messages_to_vector_store,
+    batch_size=question_queue_batch_size,
+    flush_seconds=question_queue_flush_seconds,
+    max_pending=question_queue_max_pending,
+)
 
 
 # Will have to change this for production
@@ -35,6 +74,15 @@ app.add_middleware(
 def root():
     return {"message": "Welcome to the AI Service!"}
 
+@app.get("/ready")
+def ready():
+    """
+    Readiness probe: 200 once the chat model, embeddings and Pinecone clients are loaded, 503 before.
+    Also reports the state of each resource and how long startup took.
+    """
+    status = startup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
 # param class for user input in POST /responses
 
 class RAGInput(BaseModel):
@@ -50,98 +98,146 @@ def extract_and_clean(response_text):
     cleaned = re.sub(r"\s*\[Found:\s*(Yes|No)\]\s*", "", response_text).strip()
     return cleaned, found_bool
 
+def build_prompt(userMessage: RAGInput):
+    if userMessage.company == "":
+        return (
+            f"The user asked a question: \"{userMessage.question}\"\n\n"
+            f"If no province is specified in the question, assume the province is {userMessage.province}.\n"
+            f"Answer the question directly. Follow the instructions above, but do not mention or refer to them in your response."
+        )
+    return (
+        f"The user asked a question: \"{userMessage.question}\"\n\n"
+        f"If no province is specified in the question, assume the province is {userMessage.province}.\n"
+        f"The company name is {userMessage.company}. Use this information to filter documents.\n"
+        f"Answer the question directly. Do not mention or refer to these instructions in your response."
+    )
+
+def graph_input(userMessage: RAGInput):
+    return {
+        "messages": [{"role": "user", "content": build_prompt(userMessage)}],
+        "province": userMessage.province,
+        "company": userMessage.company,
+        "question": userMessage.question,
+    }
+
+def graph_config(userMessage: RAGInput):
+    return {"configurable": {"thread_id": userMessage.thread_id}}
+
+def split_sections(bothResponse):
+    """Split the model output into its public-doc and company-doc sections."""
+    match_non_company = re.search(r"\*\*public-doc\*\*:\s*(.*?)(?=\n\*\*company-doc\*\*:)", bothResponse, re.DOTALL)
+    match_company = re.search(r"\*\*company-doc\*\*:\s*(.*)", bothResponse, re.DOTALL)
+
+    publicResponse = match_non_company.group(1).strip() if match_non_company else None
+    privateResponse = match_company.group(1).strip() if match_company else None
+    return publicResponse, privateResponse
+
+def build_response(state, userMessage: RAGInput):
+    """
+    Build the /responses payload from the final graph state.
+    Returns the payload and whether the question should be stored for analytics.
+    """
+    messages = state["messages"]
+    last_tool_message = next(
+        (m for m in reversed(messages) if isinstance(m, ToolMessage)),
+        None
+    )
+
+    publicContext = []
+    privateContext = []
+
+    if last_tool_message and hasattr(last_tool_message, "artifact"):
+        for doc in last_tool_message.artifact:
+            if not isinstance(doc, Document):
+                continue
+            if hasattr(doc, "metadata") and hasattr(doc, "page_content"):
+                source = doc.metadata.get("source", "")
+                title = doc.metadata.get("title", "")
+                page = doc.metadata.get("page", "")
+                type = doc.metadata.get("type", "")
+                docMetadata = {"source": source, "type": type, "title": title, "page": page, "content": doc.page_content}
+                if doc.metadata.get("company") == userMessage.company:
+                    privateContext.append(docMetadata)
+                else:
+                    publicContext.append(docMetadata)
+
+    response = messages[-1]
+    bothResponse = response.content if hasattr(response, "content") else response
+    publicResponse, privateResponse = split_sections(bothResponse)
+
+    if not publicResponse or not privateResponse:
+        # this is a conversational question, no documents found
+        return {
+            "publicResponse": bothResponse,
+            "publicFound": False,
+            "publicMetadata": publicContext,
+            "privateResponse": bothResponse,
+            "privateFound": False,
+            "privateMetadata": privateContext
+        }, False
+
+    public_clean, public_found = extract_and_clean(publicResponse)
+    private_clean, private_found = extract_and_clean(privateResponse)
+
+    return {
+        "publicResponse": public_clean,
+        "publicFound": public_found,
+        "publicMetadata": publicContext,
+        "privateResponse": private_clean,
+        "privateFound": private_found,
+        "privateMetadata": privateContext
+    }, True
+
+async def lookup_cached_response(userMessage: RAGInput):
+    """
+    Look up the semantic cache for the first question of a thread.
+    Follow-up questions depend on the conversation, so they always go through the graph, and
+    questions the intent classifier answers with a canned reply are not worth an embedding.
+    Returns the cache entry (or None) and the question embedding (None when the cache was skipped).
+    """
+    if not answer_cache.enabled:
+        return None, None
+    label, confidence = intent_classifier.classify(userMessage.question)
+    if label in CANNED_REPLIES and confidence >= intent_confidence_threshold:
+        return None, None
+    snapshot = await graph.aget_state(graph_config(userMessage))
+    if snapshot.values.get("messages"):
+        return None, None
+
+    embedding = await embeddings.aembed_query(userMessage.question)
+    entry = answer_cache.lookup(userMessage.province, userMessage.company, embedding)
+    if entry:
+        # Record the exchange so that follow-up questions in this thread keep their context
+        await graph.aupdate_state(
+            graph_config(userMessage),
+            {"messages": [HumanMessage(build_prompt(userMessage)), AIMessage(entry["answer"])]},
+            as_node="generate",
+        )
+    return entry, embedding
+
 @app.post("/responses")
-def get_response(userMessage: RAGInput):
+async def get_response(userMessage: RAGInput):
     """
     Get a response from the AI model based on the query.
     """
     try:
-        if userMessage.company == "":
-            prompt = (
-                f"The user asked a question: \"{userMessage.question}\"\n\n"
-                f"If no province is specified in the question, assume the province is {userMessage.province}.\n"
-                f"Answer the question directly. Follow the instructions above, but do not mention or refer to them in your response."
-            )
-        else:
-            prompt = (
-                f"The user asked a question: \"{userMessage.question}\"\n\n"
-                f"If no province is specified in the question, assume the province is {userMessage.province}.\n"
-                f"The company name is {userMessage.company}. Use this information to filter documents.\n"
-                f"Answer the question directly. Do not mention or refer to these instructions in your response."
-            )
-        last_step = None
-        for step in graph.stream(
-            {"messages": [{"role": "user", "content": prompt}]},
-            stream_mode="values",
-            config={"configurable": {"thread_id": userMessage.thread_id}},
-        ):
-            last_step = step  # Get the last step's messages
-
-        if last_step:
-            messages = last_step["messages"]
-            last_tool_message = next(
-                (m for m in reversed(messages) if isinstance(m, ToolMessage)),
-                None
-            )
-
-            publicContext = []
-            privateContext = []
-
-            if last_tool_message and hasattr(last_tool_message, "artifact"):
-                for doc in last_tool_message.artifact:
-                    if not isinstance(doc, Document):
-                        continue
-                    if hasattr(doc, "metadata") and hasattr(doc, "page_content"):
-                        source = doc.metadata.get("source", "")
-                        title = doc.metadata.get("title", "")
-                        page = doc.metadata.get("page", "")
-                        type = doc.metadata.get("type", "")
-                        docMetadata = {"source": source, "type": type, "title": title, "page": page, "content": doc.page_content}
-                        if doc.metadata.get("company") == userMessage.company:
-                            privateContext.append(docMetadata)
-                        else:
-                            publicContext.append(docMetadata)
-
-            response = last_step["messages"][-1]
-            bothResponse = response.content if hasattr(response, "content") else response
-            # print("bothResponse:", bothResponse)
-            match_non_company = re.search(r"\*\*public-doc\*\*:\s*(.*?)(?=\n\*\*company-doc\*\*:)", bothResponse, re.DOTALL)
-            match_company = re.search(r"\*\*company-doc\*\*:\s*(.*)", bothResponse, re.DOTALL)
-
-            publicResponse = match_non_company.group(1).strip() if match_non_company else None
-            privateResponse = match_company.group(1).strip() if match_company else None
-
-            # print("publicResponse:", publicResponse)
-            # print("privateResponse:", privateResponse)
-
-            if not publicResponse or not privateResponse:
-                # this is a conversational question, no documents found
-                return {
-                    "publicResponse": bothResponse,
-                    "publicFound": False,
-                    "publicMetadata": publicContext,
-                    "privateResponse": bothResponse,
-                    "privateFound": False,
-                    "privateMetadata": privateContext
-                }
-
-            public_clean, public_found = extract_and_clean(publicResponse)
-            private_clean, private_found = extract_and_clean(privateResponse)
+        cached, embedding = await lookup_cached_response(userMessage)
+        if cached:
+            question_queue.submit(userMessage.question, userMessage.province, userMessage.company)
+            return cached["payload"]
+
+        state = await graph.ainvoke(graph_input(userMessage), config=graph_config(userMessage))
+        if not state:
+            print("No state returned from graph.ainvoke.")
+            return None
 
+        payload, is_question = build_response(state, userMessage)
+        if is_question and embedding is not None:
+            answer_cache.store(userMessage.province, userMessage.company, embedding, payload, state["messages"][-1].content)
+        if is_question:
             # Not a conversational question, store the user message to vector store
-            store_user_message_to_vector_store(userMessage.question, userMessage.province, userMessage.company)
-
-            return {
-                "publicResponse": public_clean,
-                "publicFound": public_found,
-                "publicMetadata": publicContext,
-                "privateResponse": private_clean,
-                "privateFound": private_found,
-                "privateMetadata": privateContext
-            }
-        else:
-            print("No step returned from graph.stream.")
-            return None
+            question_queue.submit(userMessage.question, userMessage.province, userMessage.company)
+        return payload
 
     except Exception as e:
         traceback_str = traceback.format_exc()
@@ -149,6 +245,78 @@ def get_response(userMessage: RAGInput):
         print(traceback_str)
         raise HTTPException(status_code=500, detail=str(e))
 
+def sse_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@app.post("/responses/stream")
+async def stream_response(userMessage: RAGInput):
+    """
+    Server-Sent Events version of POST /responses.
+    Emits `token` events while the answer is generated, a `public` event as soon as the
+    public-doc section is complete, a `company` event when the company-doc section is
+    complete, and a final `done` event carrying the same payload as POST /responses.
+    """
+    async def event_stream():
+        try:
+            cached, embedding = await lookup_cached_response(userMessage)
+            if cached:
+                payload = cached["payload"]
+                yield sse_event("public", {"publicResponse": payload["publicResponse"], "publicFound": payload["publicFound"]})
+                yield sse_event("company", {"privateResponse": payload["privateResponse"], "privateFound": payload["privateFound"]})
+                yield sse_event("done", payload)
+                question_queue.submit(userMessage.question, userMessage.province, userMessage.company)
+                return
+
+            answer = ""
+            public_sent = False
+            state = None
+            async for mode, chunk in graph.astream(
+                graph_input(userMessage),
+                config=graph_config(userMessage),
+                stream_mode=["messages", "values"],
+            ):
+                if mode == "values":
+                    state = chunk
+                    continue
+                message, metadata = chunk
+                if metadata.get("langgraph_node") != "generate" or not isinstance(message.content, str) or not message.content:
+                    continue
+                answer += message.content
+                yield sse_event("token", {"text": message.content})
+                if not public_sent and "\n**company-doc**:" in answer:
+                    publicResponse, _ = split_sections(answer)
+                    if publicResponse:
+                        public_clean, public_found = extract_and_clean(publicResponse)
+                        yield sse_event("public", {"publicResponse": public_clean, "publicFound": public_found})
+                        public_sent = True
+
+            if not state:
+                yield sse_event("error", {"detail": "No state returned from graph.astream."})
+                return
+
+            payload, is_question = build_response(state, userMessage)
+            if is_question and embedding is not None:
+                answer_cache.store(userMessage.province, userMessage.company, embedding, payload, state["messages"][-1].content)
+            if is_question:
+                if not public_sent:
+                    yield sse_event("public", {"publicResponse": payload["publicResponse"], "publicFound": payload["publicFound"]})
+                yield sse_event("company", {"privateResponse": payload["privateResponse"], "privateFound": payload["privateFound"]})
+            yield sse_event("done", payload)
+
+            if is_question:
+                question_queue.submit(userMessage.question, userMessage.province, userMessage.company)
+        except Exception as e:
+            traceback_str = traceback.format_exc()
+            print(f"An error occurred: {e}")
+            print(traceback_str)
+            yield sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 # Define the request model for the /generate-title endpoint
 class TitleInput(BaseModel):
     message: str  # The first message sent by the user
@@ -191,25 +359,70 @@ class DocInput(BaseModel):
     url: str  # URL of the document
     company: str = "General"  # Company name
 
-@app.post("/company-document")
+def run_company_ingestion(job):
+    """
+    Crawl, split, embed and upsert one company document, reporting each stage on the job.
+    Pages stream through the stages, so they all run at the same time.
+    """
+    counts = {"crawl": 0, "split": 0, "unchanged": 0}
+
+    def count(stage):
+        counts[stage] += 1
+        job.update(stage, counts[stage])
+
+    def chunks():
+        for chunk in crawl_company_docs(
+            job.url, job.company, namespace=job.company,
+            on_page=lambda page: count("crawl"), on_unchanged=lambda pages: counts.update(unchanged=pages),
+        ):
+            count("split")
+            yield chunk
+
+    for stage in ("crawl", "split", "embed", "upsert"):
+        job.start(stage)
+    stats = index_company_documents(chunks(), job.company, on_progress=job.update)
+    for stage in ("crawl", "split", "embed", "upsert"):
+        job.finish(stage)
+    if counts["crawl"] + counts["unchanged"] == 0:
+        print(f"No documents found for company {job.company} at {job.url}")
+    if stats["failed_documents"]:
+        raise RuntimeError(f"{stats['failed_documents']} of {counts['split']} chunks could not be indexed")
+    # Unchanged pages are already indexed, they still count as documents found
+    return {
+        "company_docs_len": counts["crawl"] + counts["unchanged"],
+        "unchanged_urls": counts["unchanged"],
+        "chunks": counts["split"],
+        "seconds": stats["seconds"],
+    }
+
+ingest_jobs = IngestJobManager(
+    run_company_ingestion,
+    workers=ingest_job_workers,
+    history=ingest_job_history,
+    path=ingest_job_db_path,
+    stale_seconds=ingest_job_stale_seconds,
+)
+
+@app.post("/company-document", status_code=202)
 def upload_document(input: DocInput):
     """
-    Upload a company document for storing and processing.
+    Queue a company document for crawling and indexing. Returns the ingestion job to poll.
     """
-    try:
-        if not input.url or not input.company:
-            raise HTTPException(status_code=400, detail="URL and company name are required")
-
-        company_docs = crawl_company_docs(input.url, input.company, namespace=input.company)
-        if not isinstance(company_docs, list) or company_docs == []:
-            print("company_docs == []: ", company_docs == [])
-            print(f"Skipping non-list entry for company {input.company}: {company_docs}")
-        splits = process_docs(company_docs)
-        index_company_documents(splits, input.company)
-        return {"url": input.url, "company": input.company, "company_docs_len": len(company_docs), "status": "success"}
-    except Exception as e:
-        print(f"Failed to process document {input.url} for company {input.company}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    if not input.url or not input.company:
+        raise HTTPException(status_code=400, detail="URL and company name are required")
+
+    job, created = ingest_jobs.submit(input.url, input.company)
+    return {"url": input.url, "company": input.company, "job_id": job["job_id"], "status": job["status"], "duplicate": not created}
+
+@app.get("/company-document/jobs/{job_id}")
+def get_ingestion_job(job_id: str):
+    """
+    Status and per-stage progress of a company document ingestion job.
+    """
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
     
 class CompanyName(BaseModel):
     """
@@ -244,39 +457,126 @@ def delete_document(input: DocInput):
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/transcribe")
-async def transcribe_audio(file: UploadFile = File(...)):
+async def transcribe_audio(file: UploadFile = File(...), profile: str = whisper_profile):
     """
     Transcribe an audio file of a user's spoken prompt.
+    `profile` trades accuracy for speed: fast (greedy decoding), balanced, accurate or auto.
     """
     if file.content_type not in ["audio/mpeg", "audio/wav", "audio/x-m4a", "audio/mp4"]:
         raise HTTPException(status_code=400, detail="Unsupported file type")
+    try:
+        profile_options(profile)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
-    filename = f"/tmp/{uuid.uuid4()}.{file.filename.split('.')[-1]}"
-    with open(filename, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-
+    audio = await file.read()
     try:
-        segments, info = model.transcribe(filename, beam_size=5)
-        transcript = "".join([segment.text for segment in segments]).strip()
+        info, transcript = await transcriber.transcribe(audio, profile=profile)
         return {
             "language": info.language,
             "confidence": info.language_probability,
             "transcript": transcript,
         }
+    except TranscriptionBusy:
+        raise HTTPException(status_code=503, detail="Too many transcriptions in progress, try again shortly", headers={"Retry-After": "2"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Transcription failed: {str(e)}")
+
+
+@app.websocket("/transcribe/stream")
+async def transcribe_stream(websocket: WebSocket, profile: str = "balanced", language: str | None = None):
+    """
+    Transcribe a spoken prompt while it is being recorded.
+    The client sends 16 kHz mono PCM16 audio as binary messages and the text message "end" when done;
+    the server answers with "partial" and "final" transcript events and a last "done" event.
+    """
+    await websocket.accept()
+    try:
+        stream = TranscriptionStream(
+            transcriber, profile=profile, language=language,
+            partial_seconds=whisper_stream_partial_seconds, silence_ms=whisper_stream_silence_ms,
+        )
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+
+    chunks = asyncio.Queue()
+    disconnected = asyncio.Event()
+
+    async def receive():
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    disconnected.set()
+                    break
+                if message.get("bytes"):
+                    await chunks.put(message["bytes"])
+                elif message.get("text", "").strip() == "end":
+                    break
+        finally:
+            await chunks.put(None)
+
+    # Audio keeps being received while a segment is transcribed; chunks that arrived in the
+    # meantime are processed together
+    receiver = asyncio.create_task(receive())
+    try:
+        ended = False
+        while not ended:
+            pcm = [await chunks.get()]
+            while not chunks.empty():
+                pcm.append(chunks.get_nowait())
+            ended = pcm[-1] is None
+            if disconnected.is_set():
+                # Nobody is left to read the transcript
+                return
+            events = await stream.feed(b"".join(chunk for chunk in pcm if chunk is not None))
+            if ended:
+                events += await stream.finish()
+            for event in events:
+                await websocket.send_json(event)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"Streaming transcription failed: {e}")
+        traceback.print_exc()
+        await websocket.send_json({"type": "error", "detail": f"Transcription failed: {str(e)}"})
+        await websocket.close(code=1011)
     finally:
-        os.remove(filename)  # clean up temp file
+        receiver.cancel()
+
 
+popular_questions = PopularQuestionsCache(find_popular_questions_from_vector_db, refresh_seconds=popular_questions_refresh, ttl_seconds=popular_questions_ttl)
+# The first computation starts with the warm-up, not with the first request
+startup.lazy("popular_questions", popular_questions.start, required=False)
 
 @app.get("/popular-questions")
 def get_popular_questions():
     """
-    Get a list of popular questions from the vector store.
+    Get a list of popular questions, precomputed from the questions in the vector store.
     """
     try:
-        questions = find_popular_questions_from_vector_db()
+        questions = popular_questions.get()
         return {"popular_questions": questions}
     except Exception as e:
         print(f"Failed to retrieve popular questions: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics")
+def get_metrics():
+    """
+    Runtime counters for the caches, the conversation checkpointer, the intent router, ingestion jobs, the popular questions cache,
+    the queue of user questions waiting to be stored, the transcription workers and the keyword index.
+    """
+    return {
+        "semantic_cache": answer_cache.stats(),
+        "checkpointer": memory.stats(),
+        "intent_routes": intent_classifier.stats(),
+        "embedding_cache": embeddings.stats(),
+        "ingest_jobs": ingest_jobs.stats(),
+        "popular_questions": popular_questions.stats(),
+        "question_queue": question_queue.stats(),
+        "transcription": transcriber.stats(),
+        "keyword_index": {"namespaces": keyword_index.stats()},
+    }
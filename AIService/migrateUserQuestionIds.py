@@ -0,0 +1,13 @@
+"""migrateUserQuestionIds.py
+Move the user questions stored under plain UUIDs, before question IDs started with the day
+they were asked, to day-prefixed IDs so popular questions can list them by prefix. Run it
+once after deploying that change; running it again moves nothing.
+
+    cd AIService && python migrateUserQuestionIds.py
+"""
+
+from config import index
+from utils import migrate_legacy_question_ids
+
+if __name__ == "__main__":
+    print(f"Moved {migrate_legacy_question_ids(index)} user questions to day-prefixed IDs")
@@ -0,0 +1,123 @@
+"""pdf_extract.py
+PDF text extraction with PyMuPDF.
+
+Small PDFs are parsed in the calling thread. Larger ones are split into page ranges that
+are parsed in parallel by a shared process pool, so long statutes neither hold the GIL
+nor take one core for seconds. Workers open the PDF from a file (the local copy, or a
+temporary file), so tasks only carry a path and a page range rather than the PDF bytes.
+Documents carry the same metadata as PyPDFLoader in "page" mode (`source`, zero-based
+`page`, `page_label`, `total_pages`, producer/creator fields), plus `type: "pdf"`.
+"""
+
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz # PyMuPDF for PDF handling
+from langchain_core.documents import Document
+
+# Read here rather than in config.py so pool workers don't import config and its dependencies
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", str(min(4, os.cpu_count() or 1))))
+PAGES_PER_TASK = int(os.environ.get("PDF_PAGES_PER_TASK", "32"))
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+pdf_pool = None
+
+
+def get_pool():
+    global pdf_pool
+    if pdf_pool is None:
+        # spawn, since forking a process that runs threads can deadlock the children
+        pdf_pool = ProcessPoolExecutor(PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return pdf_pool
+
+
+def open_pdf(file):
+    """Open a PDF given as a path or as bytes."""
+    if isinstance(file, str):
+        return fitz.open(file, filetype="pdf")
+    return fitz.open(stream=file, filetype="pdf")
+
+
+def extract_pages(file, start, stop):
+    """Text, label and link URIs of pages [start, stop) of a PDF given as a path or bytes."""
+    pages = []
+    with open_pdf(file) as pdf:
+        for page_number in range(start, min(stop, pdf.page_count)):
+            page = pdf[page_number]
+            links = [link["uri"] for link in page.get_links() if link.get("uri")]
+            pages.append((page_number, page.get_text().rstrip(), page.get_label() or str(page_number + 1), links))
+    return pages
+
+
+def extract_pdf(data, source, metadata=None, path=None):
+    """
+    Extract one Document per page from PDF bytes and return (documents, link URIs).
+    `metadata` is added to every document. `path` is a local file holding `data`, which the
+    pool workers read instead of a temporary copy.
+    """
+    with fitz.open(stream=data, filetype="pdf") as pdf:
+        page_count = pdf.page_count
+        document_metadata = pdf_metadata(pdf)
+
+    if PDF_WORKERS > 1 and page_count > PAGES_PER_TASK:
+        ranges = [(start, start + PAGES_PER_TASK) for start in range(0, page_count, PAGES_PER_TASK)]
+        temporary = None
+        if path is None:
+            with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+                f.write(data)
+            path = temporary = f.name
+        try:
+            pool = get_pool()
+            futures = [pool.submit(extract_pages, path, start, stop) for start, stop in ranges]
+            pages = [page for future in futures for page in future.result()]
+        finally:
+            if temporary:
+                os.remove(temporary)
+    else:
+        pages = extract_pages(data, 0, page_count)
+
+    docs = []
+    links = []
+    for page_number, text, label, page_links in pages:
+        links.extend(page_links)
+        docs.append(Document(
+            page_content=text,
+            metadata={
+                **document_metadata,
+                "source": source,
+                "total_pages": page_count,
+                "page": page_number,
+                "page_label": label,
+                "type": "pdf",
+                **(metadata or {}),
+            },
+        ))
+    return docs, links
+
+
+def load_pdf(path, metadata=None, timeout=30):
+    """Load a PDF from a local path or URL, like PyPDFLoader(path, mode="page").load()."""
+    if os.path.exists(path):
+        with open(path, "rb") as f:
+            return extract_pdf(f.read(), path, metadata, path=path)[0]
+    import requests
+
+    res = requests.get(path, headers={"User-Agent": USER_AGENT}, timeout=timeout)
+    res.raise_for_status()
+    return extract_pdf(res.content, path, metadata)[0]
+
+
+def pdf_metadata(pdf):
+    """Document-level metadata under the same keys PyPDFLoader uses."""
+    info = pdf.metadata or {}
+    fields = {
+        "producer": info.get("producer", ""),
+        "creator": info.get("creator", ""),
+        "creationdate": info.get("creationDate", ""),
+    }
+    for key, value in (("title", info.get("title")), ("author", info.get("author")), ("moddate", info.get("modDate"))):
+        if value:
+            fields[key] = value
+    return fields
@@ -10,7 +10,7 @@ from pinecone import Pinecone
 
 import bs4
 from langchain import hub
-from langchain_community.document_loaders import WebBaseLoader, PyPDFLoader
+from langchain_community.document_loaders import WebBaseLoader
 from langchain_core.documents import Document
 from langchain_core.tools import tool
 from langchain_core.messages import SystemMessage
@@ -20,6 +20,7 @@ from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langgraph.graph import START, StateGraph, MessagesState, END
 from typing_extensions import List, TypedDict
 from pydantic import BaseModel
+from pdf_extract import load_pdf
 import pprint
 
 load_dotenv()
@@ -51,8 +52,7 @@ vector_store = PineconeVectorStore(embedding=embeddings, index=index)
 results = vector_store.similarity_search("board's meaning", k=3, namespace="Isa")
 print("results: ", results)
 
-# pdfloader = PyPDFLoader("https://www.nslegislature.ca/sites/default/files/legc/statutes/labour%20standards%20code.pdf", mode="page")
-# pdf_docs = pdfloader.load()
+# pdf_docs = load_pdf("https://www.nslegislature.ca/sites/default/files/legc/statutes/labour%20standards%20code.pdf")
 # print(len(pdf_docs), "PDF documents loaded.")
 # # print("pdf_docs: ", pdf_docs)
 # # print("pdf_docs[0]: ", pdf_docs[0])
@@ -76,8 +76,7 @@ print("results: ", results)
 # vector_store.add_documents(pdf_splits, namespace="Nova Scotia")
 # print("PDF splits added to vector store's Nova Scotia namespace.")
 
-# pdfloader = PyPDFLoader("https://laws.yukon.ca/cms/images/LEGISLATION/PRINCIPAL/2002/2002-0072/2002-0072.pdf", mode="page")
-# pdf_docs = pdfloader.load()
+# pdf_docs = load_pdf("https://laws.yukon.ca/cms/images/LEGISLATION/PRINCIPAL/2002/2002-0072/2002-0072.pdf")
 # print(len(pdf_docs), "PDF documents loaded.")
 # pdf_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
 # pdf_splits = pdf_splitter.split_documents(pdf_docs)
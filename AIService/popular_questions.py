@@ -0,0 +1,159 @@
+import random
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+CLUSTERS_PER_GROUP = 3
+
+
+class QuestionClusterer:
+    """
+    Picks the most representative questions of each (province, company) group.
+
+    Each group is clustered with MiniBatchKMeans, warm-started from the centroids of the
+    previous run so that refreshes converge in a few steps and clusters stay stable as new
+    questions arrive. The question nearest to each centroid comes from one distance matrix
+    per group.
+    """
+
+    def __init__(self, clusters=CLUSTERS_PER_GROUP):
+        self.clusters = clusters
+        self.centroids = {}
+
+    def popular_questions(self, questions, sample_size=None):
+        """
+        `questions` is an iterable of (province, company, text, embedding) tuples. With a
+        `sample_size`, each group keeps a uniform random sample of at most that many
+        questions (reservoir sampling), so memory does not grow with the number of questions.
+        """
+        rng = random.Random(42)
+        groups = defaultdict(lambda: ([], []))
+        seen = defaultdict(int)
+        for province, company, text, embedding in questions:
+            key = (province, company)
+            texts, embeddings = groups[key]
+            seen[key] += 1
+            if sample_size is None or len(texts) < sample_size:
+                texts.append(text)
+                embeddings.append(embedding)
+            else:
+                slot = rng.randrange(seen[key])
+                if slot < sample_size:
+                    texts[slot] = text
+                    embeddings[slot] = embedding
+
+        popular = []
+        for (province, company), (texts, embeddings) in groups.items():
+            embeddings = np.asarray(embeddings, dtype=np.float32)
+            if len(texts) <= self.clusters:
+                # Too few questions to cluster, each one is its own centroid
+                nearest = range(len(texts))
+            else:
+                centroids = self.fit((province, company), embeddings)
+                nearest = nearest_rows(embeddings, centroids)
+            popular.extend({"province": province, "company": company, "text": texts[i]} for i in nearest)
+
+        # Forget groups that had no questions in this run
+        self.centroids = {key: value for key, value in self.centroids.items() if key in groups}
+        return popular
+
+    def fit(self, key, embeddings):
+        previous = self.centroids.get(key)
+        if previous is not None and previous.shape[1] == embeddings.shape[1]:
+            kmeans = MiniBatchKMeans(n_clusters=self.clusters, init=previous, n_init=1, random_state=42)
+        else:
+            kmeans = MiniBatchKMeans(n_clusters=self.clusters, n_init=3, random_state=42)
+        kmeans.fit(embeddings)
+        self.centroids[key] = kmeans.cluster_centers_.astype(np.float32)
+        return self.centroids[key]
+
+
+def nearest_rows(points, centroids):
+    """Index of the row of `points` closest to each centroid."""
+    distances = (
+        np.einsum("ij,ij->i", points, points)[:, None]
+        - 2 * points @ centroids.T
+        + np.einsum("ij,ij->i", centroids, centroids)[None, :]
+    )
+    return distances.argmin(axis=0).tolist()
+
+
+class PopularQuestionsCache:
+    """
+    Serves precomputed popular questions.
+
+    `start` launches a background thread that calls `compute` right away and then every
+    `refresh_seconds`; the service starts it in the warm-up after startup. Reads only return
+    the cached list, waiting for the first computation if it has not finished yet. A read that
+    finds the list older than `ttl_seconds` (refreshes failing or falling behind) wakes the
+    refresher to retry. With `refresh_seconds` 0 there is no thread and reads compute when
+    the list is stale.
+    """
+
+    def __init__(self, compute, refresh_seconds=900, ttl_seconds=3600):
+        self.compute = compute
+        self.refresh_seconds = refresh_seconds
+        self.ttl_seconds = ttl_seconds
+        self.questions = None
+        self.computed_at = 0.0
+        self.error = None
+        self.lock = threading.Lock()
+        self.refresher = None
+        self.computed = threading.Event()
+        self.wake = threading.Event()
+
+    def start(self):
+        with self.lock:
+            if self.refresher is None and self.refresh_seconds > 0:
+                self.refresher = threading.Thread(target=self.refresh_forever, name="popular-questions", daemon=True)
+                self.refresher.start()
+        return self
+
+    def get(self):
+        if self.refresh_seconds <= 0:
+            if self.stale():
+                self.refresh()
+            return self.questions
+        self.start()
+        self.computed.wait()
+        if self.stale():
+            self.wake.set()
+        if self.questions is None:
+            raise RuntimeError(f"Popular questions are not computed yet: {self.error}")
+        return self.questions
+
+    def stale(self):
+        return self.questions is None or time.time() - self.computed_at > self.ttl_seconds
+
+    def refresh(self):
+        with self.lock:
+            self.update()
+
+    def update(self):
+        questions = self.compute()
+        self.questions = questions
+        self.computed_at = time.time()
+
+    def refresh_forever(self):
+        while True:
+            try:
+                self.update()
+                self.error = None
+            except Exception as e:
+                self.error = str(e)
+                print(f"Failed to refresh popular questions: {e}")
+            self.computed.set()
+            self.wake.wait(self.refresh_seconds)
+            self.wake.clear()
+
+    def stats(self):
+        return {
+            "questions": len(self.questions) if self.questions is not None else 0,
+            "age_seconds": round(time.time() - self.computed_at, 1) if self.questions is not None else None,
+        }
+
+
+clusterer = QuestionClusterer()
@@ -0,0 +1,103 @@
+import queue
+import threading
+import time
+
+
+class QuestionQueue:
+    """
+    Background queue for user questions recorded for analytics.
+
+    `submit` returns immediately; a worker thread hands the questions to `store_batch`
+    (a function taking a list of (user_message, province, company) tuples) in batches of
+    up to `batch_size`, at the latest `flush_seconds` after the first question of a batch
+    arrived. When more than `max_pending` questions are waiting, new ones are dropped
+    rather than slowing down responses. `close` stores what is still pending at shutdown.
+    """
+
+    def __init__(self, store_batch, batch_size=20, flush_seconds=10.0, max_pending=1000):
+        self.store_batch = store_batch
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.pending = queue.Queue(maxsize=max_pending)
+        self.counters = {"submitted": 0, "dropped": 0, "batches": 0, "failed_batches": 0}
+        self.lock = threading.Lock()
+        self.closing = threading.Event()
+        self.worker = threading.Thread(target=self.run, name="question-queue", daemon=True)
+        self.worker.start()
+
+    def submit(self, user_message, province, company):
+        try:
+            self.pending.put_nowait((user_message, province, company))
+            self.count("submitted")
+        except queue.Full:
+            self.count("dropped")
+            print("Question queue is full, dropping question")
+
+    def run(self):
+        while True:
+            first = self.pending.get()
+            if first is None:
+                # Wake-up from close with nothing pending
+                self.pending.task_done()
+                continue
+            batch = [first]
+            deadline = time.monotonic() + self.flush_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    # While closing, store what is queued without waiting for more
+                    if self.closing.is_set():
+                        item = self.pending.get_nowait()
+                    elif remaining > 0:
+                        item = self.pending.get(timeout=remaining)
+                    else:
+                        break
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.pending.task_done()
+                    break
+                batch.append(item)
+            self.flush(batch)
+
+    def flush(self, batch):
+        try:
+            self.store_batch(batch)
+            self.count("batches")
+        except Exception as e:
+            self.count("failed_batches")
+            print(f"Failed to store {len(batch)} user questions: {e}")
+        finally:
+            for _ in batch:
+                self.pending.task_done()
+
+    def join(self):
+        """Block until every submitted question has been handled."""
+        self.pending.join()
+
+    def close(self, timeout=10.0):
+        """
+        Store the pending questions without waiting for batches to fill, for at most
+        `timeout` seconds. Returns whether everything was stored.
+        """
+        self.closing.set()
+        try:
+            # Wakes the worker if it is waiting for a batch to fill
+            self.pending.put_nowait(None)
+        except queue.Full:
+            pass
+        drained = threading.Thread(target=self.pending.join, name="question-queue-drain", daemon=True)
+        drained.start()
+        drained.join(timeout)
+        if drained.is_alive():
+            print(f"Shutting down with {self.pending.qsize()} user questions not stored")
+            return False
+        return True
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "pending": self.pending.qsize()}
@@ -1,17 +1,94 @@
-from config import llm, vector_store
+from config import (
+    llm, vector_store, embeddings, index, checkpoint_db_path, checkpoint_max_messages, checkpoint_idle_ttl, intent_confidence_threshold,
+    hybrid_retrieval, hybrid_candidates,
+)
+from checkpointer import SQLiteCheckpointSaver
+from intent_classifier import intent_classifier, find_province, CANNED_REPLIES
+from bm25_index import keyword_index, reciprocal_rank_fusion
+from context_builder import build_context
 
-from langchain import hub
-from langchain_core.tools import tool
-from langchain_core.messages import SystemMessage
+import asyncio
+import functools
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from langchain_core.documents import Document
+from langchain_core.tools import StructuredTool
+from langchain_core.messages import AIMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 from langgraph.prebuilt import ToolNode, tools_condition
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import START, StateGraph, MessagesState, END
 
-# Load prompt template from LangChain Hub
-prompt = hub.pull("rlm/rag-prompt", api_url="https://api.smith.langchain.com")
+# Shared pool for the per-namespace queries issued by `retrieve`
+retrieval_pool = ThreadPoolExecutor(max_workers=12, thread_name_prefix="retrieve")
+
+def fetch_documents(ids, namespace):
+    """Documents of chunk IDs, read from the vector index."""
+    response = index.fetch(ids=ids, namespace=namespace)
+    docs = {}
+    for id, vector in response.vectors.items():
+        metadata = dict(vector.metadata or {})
+        if "text" in metadata:
+            docs[id] = Document(id=id, page_content=metadata.pop("text"), metadata=metadata)
+    return docs
+
+def fuse_results(query, namespace, dense_docs, k, fetch=fetch_documents):
+    """
+    Fuse the dense results of a namespace with its keyword (BM25) results by reciprocal rank
+    fusion on chunk IDs and return the best `k`. Chunks only the keyword index found are
+    fetched from the vector index.
+    """
+    if not hybrid_retrieval or any(doc.id is None for doc in dense_docs):
+        return dense_docs[:k]
+    keyword_hits = keyword_index.search(namespace, query, k=hybrid_candidates)
+    if not keyword_hits:
+        return dense_docs[:k]
+    ranking = reciprocal_rank_fusion([[doc.id for doc in dense_docs], [id for id, _ in keyword_hits]], k=len(dense_docs) + len(keyword_hits))
+    docs = {doc.id: doc for doc in dense_docs}
+    missing = [id for id in ranking[:k] if id not in docs]
+    if missing:
+        docs.update(fetch(missing, namespace))
+    # A keyword hit missing from the vector index is skipped for the next best chunk
+    return [docs[id] for id in ranking if id in docs][:k]
+
+def candidates(k):
+    return max(k, hybrid_candidates) if hybrid_retrieval else k
+
+def search_namespace(query, embedding, namespace, k):
+    results = vector_store.similarity_search_by_vector_with_score(embedding, k=candidates(k), namespace=namespace)
+    return fuse_results(query, namespace, [doc for doc, _score in results], k)
+
+def search_namespaces(query, namespaces, k=4):
+    """
+    Embed the query once and search every namespace concurrently.
+    Returns one list of documents per namespace, in the same order as `namespaces`.
+    """
+    embedding = embeddings.embed_query(query)
+    futures = [
+        retrieval_pool.submit(search_namespace, query, embedding, namespace, k)
+        for namespace in namespaces
+    ]
+    return [future.result() for future in futures]
+
+async def asearch_namespace(query, embedding, namespace, k):
+    results = await vector_store.asimilarity_search_by_vector_with_score(embedding, k=candidates(k), namespace=namespace)
+    dense_docs = [doc for doc, _score in results]
+    # Keyword search and fetching missing chunks are short and blocking, keep them off the event loop
+    return await asyncio.get_running_loop().run_in_executor(retrieval_pool, fuse_results, query, namespace, dense_docs, k)
+
+async def asearch_namespaces(query, namespaces, k=4):
+    """Async version of search_namespaces using the async embedding and Pinecone clients."""
+    embedding = await embeddings.aembed_query(query)
+    return await asyncio.gather(*(
+        asearch_namespace(query, embedding, namespace, k)
+        for namespace in namespaces
+    ))
+
+# The tool message stays in the conversation and is sent again with follow-up questions,
+# so it holds the same deduplicated, budgeted passages as the answer prompt
+def serialize_docs(docs):
+    return "\n\n".join(section for section in build_context(docs) if section)
 
-@tool(response_format="content_and_artifact")
-def retrieve(query: str, province: str, company: str = ""):
+def retrieve_docs(query: str, province: str, company: str = ""):
     """
     Retrieve relevant employment-related information in response to the user's question.
     Always include general employment standards. If a province is specified, also include
@@ -33,30 +110,164 @@ def retrieve(query: str, province: str, company: str = ""):
     - company: (optional) company name to filter documents.
     """
     # print("province:", province)
-    province_docs = vector_store.similarity_search(query, k=4, namespace=province)
-    general_docs = vector_store.similarity_search(query, k=4, namespace="General")
-    company_docs = vector_store.similarity_search(query, k=4, namespace=company)
+    province_docs, general_docs, company_docs = search_namespaces(query, [province, "General", company], k=4)
     retrieved_docs = province_docs + general_docs + company_docs
-    serialized = "\n\n".join(
-        f"DocMetadata: {doc.metadata}\nDocContent: {doc.page_content}"
-        for doc in retrieved_docs
-    )
-    return serialized, retrieved_docs
+    return serialize_docs(retrieved_docs), retrieved_docs
+
+async def aretrieve_docs(query: str, province: str, company: str = ""):
+    province_docs, general_docs, company_docs = await asearch_namespaces(query, [province, "General", company], k=4)
+    retrieved_docs = province_docs + general_docs + company_docs
+    return serialize_docs(retrieved_docs), retrieved_docs
+
+# The tool description is taken from retrieve_docs' docstring
+retrieve = StructuredTool.from_function(
+    func=retrieve_docs,
+    coroutine=aretrieve_docs,
+    name="retrieve",
+    response_format="content_and_artifact",
+)
+
+class RAGState(MessagesState):
+    province: str
+    company: str
+    question: str
+
+# Step 0: Route obvious cases locally so they skip the tool-binding LLM call.
+def classify_intent(state: RAGState):
+    """
+    Answer greetings and closings with a canned reply and send clear employment questions straight
+    to `retrieve`. Uncertain questions and follow-ups, which need the conversation to be
+    understood, are left to query_or_respond.
+    """
+    question = state.get("question")
+    if not question:
+        intent_classifier.count("llm")
+        return {}
+    label, confidence = intent_classifier.classify(question)
+    if confidence < intent_confidence_threshold:
+        intent_classifier.count("llm")
+        return {}
+    if label in CANNED_REPLIES:
+        intent_classifier.count(label)
+        return {"messages": [AIMessage(CANNED_REPLIES[label])]}
+    is_follow_up = any(message.type == "ai" for message in state["messages"])
+    if label == "employment" and not is_follow_up:
+        intent_classifier.count("tools")
+        tool_call = {
+            "name": "retrieve",
+            "args": {
+                "query": question,
+                "province": find_province(question, state.get("province", "")),
+                "company": state.get("company", ""),
+            },
+            "id": f"call_{uuid.uuid4().hex}",
+            "type": "tool_call",
+        }
+        return {"messages": [AIMessage("", tool_calls=[tool_call])]}
+    intent_classifier.count("llm")
+    return {}
+
+def route_intent(state: RAGState):
+    last_message = state["messages"][-1]
+    if last_message.type != "ai":
+        return "query_or_respond"
+    return "tools" if last_message.tool_calls else END
+
+# The graph nodes reach the chat model through these functions rather than the `llm` global:
+# compiling the graph inspects the attributes of the globals a node uses, which would
+# create the lazily initialized client at import time.
+def chat_model():
+    return llm
+
+@functools.cache
+def chat_model_with_tools():
+    return llm.bind_tools([retrieve])
 
 # Step 1: Generate an AIMessage that may include a tool-call to be sent.
 def query_or_respond(state: MessagesState):
     """Generate tool call for retrieval or respond."""
-    llm_with_tools = llm.bind_tools([retrieve])
-    response = llm_with_tools.invoke(state["messages"])
+    response = chat_model_with_tools().invoke(state["messages"])
     # MessagesState appends messages to state instead of overwriting
     return {"messages": [response]}
 
+async def aquery_or_respond(state: MessagesState):
+    response = await chat_model_with_tools().ainvoke(state["messages"])
+    return {"messages": [response]}
+
 # Step 2: Execute the retrieval.
 tools = ToolNode([retrieve])
 
+# Instructions of the answer prompt. They are the same for every request, so they are built
+# once here and sent ahead of the retrieved documents.
+GENERATE_INSTRUCTIONS = SystemMessage(
+    "You are an assistant for question-answering tasks. Use the retrieved documents to answer the user's question. "
+    "Format your response in **two clearly separated sections** as described below. "
+    "This formatting is required to allow automatic parsing:\n\n"
+    "1. **public-doc**:\n"
+    "- Use only documents that do **not** have a company name in their metadata.\n"
+    "- Begin with a legal-sounding tone such as:\n"
+    "  \"Based on the applicable law, ...\" or \"According to relevant legal guidance, ...\"\n"
+    "- IMPORTANT: When answering questions about steps, processes, options, or comparisons, use the carousel format:\n"
+    "  :::carousel\n"
+    "  card: Step 1 Title\n"
+    "  content: Detailed description of this step\n"
+    "  icon: 📋\n"
+    "  ---\n"
+    "  card: Step 2 Title\n"
+    "  content: Detailed description of this step\n"
+    "  icon: ✍️\n"
+    "  :::\n"
+    "- Use carousel format SPECIFICALLY for:\n"
+    "  * Questions containing 'steps to', 'how to', 'process for', 'procedure to'\n"
+    "  * Multiple options or choices (e.g., 'what are my options')\n"
+    "  * Comparisons between different things\n"
+    "  * Lists of important rights or highlights\n"
+    "- Use regular text/lists for simple information that doesn't involve steps or choices\n"
+    "- If no relevant information is found, still write a sentence in the expected tone and end with [Found: No]\n"
+    "- If relevant information is found, write the answer and end with [Found: Yes]\n"
+    "- Start this section with exactly: **public-doc**:\n"
+    "2. **company-doc**:\n"
+    "- Use only documents that **do** have a company name in their metadata.\n"
+    "- Begin with a company policy tone such as:\n"
+    "  \"Based on the employee manual, ...\" or \"According to [Company]'s internal policy, ...\"\n"
+    "- Replace `[Company]` with the **actual company name** from the metadata.\n"
+    "- If the company name is not available, use 'the company' instead.\n"
+    "- **Do not output the placeholder `[Company]` in your response.**\n"
+    "- IMPORTANT: Use the same carousel format as in public-doc when presenting steps, processes, or options\n"
+    "- If no relevant information is found, still write a sentence in the expected tone and end with [Found: No]\n"
+    "- If relevant information is found, write the answer and end with [Found: Yes]\n"
+    "- Start this section with exactly: **company-doc**:\n"
+    
+    "Important:\n"
+    "- Do not include any extra sections or commentary outside the two headers.\n"
+    "- Each section must end with [Found: Yes] or [Found: No].\n"
+    "- Do not number the sections. Do not prefix with '1.' or '2.'\n"
+    "— just use the headers exactly as shown: **public-doc**: and **company-doc**:\n\n"
+    
+    "EXAMPLE for a question like 'What are the steps to apply for parental leave?':\n"
+    "**public-doc**:\n"
+    "Based on the applicable law, here are the steps to apply for parental leave:\n\n"
+    ":::carousel\n"
+    "card: Step 1: Determine Eligibility\n"
+    "content: Ensure you have been employed for at least 13 weeks before the expected birth date\n"
+    "icon: ✅\n"
+    "---\n"
+    "card: Step 2: Provide Written Notice\n"
+    "content: Give your employer at least 2 weeks' written notice before starting leave. Specify if you want 37 or 63 weeks\n"
+    "icon: 📝\n"
+    "---\n"
+    "card: Step 3: Submit Documentation\n"
+    "content: Provide any required medical certificates or proof of birth/adoption\n"
+    "icon: 📋\n"
+    ":::\n"
+    "[Found: Yes]\n\n"
+    
+    "---\n"
+)
+
 # Step 3: Generate a response using the retrieved content.
-def generate(state: MessagesState):
-    """Generate answer."""
+def build_generate_prompt(state: MessagesState):
+    """Build the system prompt and conversation for the final answer."""
     # Get generated ToolMessages
     recent_tool_messages = []
     for message in reversed(state["messages"]):
@@ -69,80 +280,10 @@ def generate(state: MessagesState):
     # print("tool_messages:", tool_messages)
     # print("length", len(tool_messages))
     docs = tool_messages[-1].artifact 
-    # Separate docs based on whether metadata has a "company" field
-    company_docs = [doc for doc in docs if "company" in doc.metadata]
-    non_company_docs = [doc for doc in docs if "company" not in doc.metadata]
-
-    # Format the doc content for each group
-    # print("company_docs:", company_docs)
-    company_docs_content = "\n\n".join(f"DocMetadata: {doc.metadata}\nDocContent: {doc.page_content}" for doc in company_docs)
-    non_company_docs_content = "\n\n".join(f"DocMetadata: {doc.metadata}\nDocContent: {doc.page_content}" for doc in non_company_docs)
-
-    # Construct system prompt
-    system_message_content = (
-        "You are an assistant for question-answering tasks. Use the retrieved documents to answer the user's question. "
-        "Format your response in **two clearly separated sections** as described below. "
-        "This formatting is required to allow automatic parsing:\n\n"
-        "1. **public-doc**:\n"
-        "- Use only documents that do **not** have a company name in their metadata.\n"
-        "- Begin with a legal-sounding tone such as:\n"
-        "  \"Based on the applicable law, ...\" or \"According to relevant legal guidance, ...\"\n"
-        "- IMPORTANT: When answering questions about steps, processes, options, or comparisons, use the carousel format:\n"
-        "  :::carousel\n"
-        "  card: Step 1 Title\n"
-        "  content: Detailed description of this step\n"
-        "  icon: 📋\n"
-        "  ---\n"
-        "  card: Step 2 Title\n"
-        "  content: Detailed description of this step\n"
-        "  icon: ✍️\n"
-        "  :::\n"
-        "- Use carousel format SPECIFICALLY for:\n"
-        "  * Questions containing 'steps to', 'how to', 'process for', 'procedure to'\n"
-        "  * Multiple options or choices (e.g., 'what are my options')\n"
-        "  * Comparisons between different things\n"
-        "  * Lists of important rights or highlights\n"
-        "- Use regular text/lists for simple information that doesn't involve steps or choices\n"
-        "- If no relevant information is found, still write a sentence in the expected tone and end with [Found: No]\n"
-        "- If relevant information is found, write the answer and end with [Found: Yes]\n"
-        "- Start this section with exactly: **public-doc**:\n"
-        "2. **company-doc**:\n"
-        "- Use only documents that **do** have a company name in their metadata.\n"
-        "- Begin with a company policy tone such as:\n"
-        "  \"Based on the employee manual, ...\" or \"According to [Company]'s internal policy, ...\"\n"
-        "- Replace `[Company]` with the **actual company name** from the metadata.\n"
-        "- If the company name is not available, use 'the company' instead.\n"
-        "- **Do not output the placeholder `[Company]` in your response.**\n"
-        "- IMPORTANT: Use the same carousel format as in public-doc when presenting steps, processes, or options\n"
-        "- If no relevant information is found, still write a sentence in the expected tone and end with [Found: No]\n"
-        "- If relevant information is found, write the answer and end with [Found: Yes]\n"
-        "- Start this section with exactly: **company-doc**:\n"
-        
-        "Important:\n"
-        "- Do not include any extra sections or commentary outside the two headers.\n"
-        "- Each section must end with [Found: Yes] or [Found: No].\n"
-        "- Do not number the sections. Do not prefix with '1.' or '2.'\n"
-        "— just use the headers exactly as shown: **public-doc**: and **company-doc**:\n\n"
-        
-        "EXAMPLE for a question like 'What are the steps to apply for parental leave?':\n"
-        "**public-doc**:\n"
-        "Based on the applicable law, here are the steps to apply for parental leave:\n\n"
-        ":::carousel\n"
-        "card: Step 1: Determine Eligibility\n"
-        "content: Ensure you have been employed for at least 13 weeks before the expected birth date\n"
-        "icon: ✅\n"
-        "---\n"
-        "card: Step 2: Provide Written Notice\n"
-        "content: Give your employer at least 2 weeks' written notice before starting leave. Specify if you want 37 or 63 weeks\n"
-        "icon: 📝\n"
-        "---\n"
-        "card: Step 3: Submit Documentation\n"
-        "content: Provide any required medical certificates or proof of birth/adoption\n"
-        "icon: 📋\n"
-        ":::\n"
-        "[Found: Yes]\n\n"
-        
-        "---\n"
+    # Deduplicated and merged passages, within the context token budget
+    non_company_docs_content, company_docs_content = build_context(docs)
+
+    documents_content = (
         "public-doc documents:\n"
         f"{non_company_docs_content}\n\n"
         "---\n"
@@ -156,19 +297,36 @@ def generate(state: MessagesState):
         if message.type in ("human", "system")
         or (message.type == "ai" and not message.tool_calls)
     ]
-    prompt = [SystemMessage(system_message_content)] + conversation_messages
+    # The instructions are always the first part of the system instruction and the documents
+    # follow in their own message. At about 760 tokens they are below Gemini's 1024-token
+    # context caching minimum and gemini-2.0-flash has no implicit caching, so this layout
+    # does not make them cached.
+    return [GENERATE_INSTRUCTIONS, SystemMessage(documents_content)] + conversation_messages
+
+def generate(state: MessagesState):
+    """Generate answer."""
+    response = chat_model().invoke(build_generate_prompt(state))
+    return {"messages": [response]}
 
-    # Run
-    response = llm.invoke(prompt)
+async def agenerate(state: MessagesState):
+    response = await chat_model().ainvoke(build_generate_prompt(state))
     return {"messages": [response]}
 
 
-graph_builder = StateGraph(MessagesState)
-graph_builder.add_node(query_or_respond)
+# Each node has a sync and an async implementation so the graph can be driven
+# with either graph.stream/invoke or graph.astream/ainvoke.
+graph_builder = StateGraph(RAGState)
+graph_builder.add_node(classify_intent)
+graph_builder.add_node("query_or_respond", RunnableLambda(query_or_respond, afunc=aquery_or_respond))
 graph_builder.add_node(tools)
-graph_builder.add_node(generate)
+graph_builder.add_node("generate", RunnableLambda(generate, afunc=agenerate))
 
-graph_builder.set_entry_point("query_or_respond")
+graph_builder.set_entry_point("classify_intent")
+graph_builder.add_conditional_edges(
+    "classify_intent",
+    route_intent,
+    {"query_or_respond": "query_or_respond", "tools": "tools", END: END},
+)
 graph_builder.add_conditional_edges(
     "query_or_respond",
     tools_condition,
@@ -177,5 +335,9 @@ graph_builder.add_conditional_edges(
 graph_builder.add_edge("tools", "generate")
 graph_builder.add_edge("generate", END)
 
-memory = MemorySaver()
+memory = SQLiteCheckpointSaver(
+    checkpoint_db_path,
+    max_messages=checkpoint_max_messages,
+    idle_ttl_seconds=checkpoint_idle_ttl,
+)
 graph = graph_builder.compile(checkpointer=memory)
\ No newline at end of file
@@ -1,27 +1,19 @@
 """webScraper.py
 This script crawls a set of URLs to extract relevant documents related to employment law.
-It identifies HTML and PDF documents, extracts text, and saves the results in a structured
-format in a pickle file."""
+It identifies HTML and PDF documents, extracts text, and writes the results to an on-disk
+corpus (see corpus.py) as it goes. An interrupted crawl resumes from its last commit."""
 
 import json
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urljoin, urlparse, urldefrag
-from langchain.schema import Document
-from langchain_community.document_loaders import WebBaseLoader, PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-import fitz # PyMuPDF for PDF handling
-import io
-import pickle
+from corpus import Corpus, CorpusWriter
+from crawler import Crawler, MAX_DEPTH, get_domain
+from visited_set import VisitedSet
 
 
 TARGET_KEYWORDS = [
     "employment", "labour", "wage", "overtime", "termination",
     "hours of work", "holiday", "statutory", "minimum wage", "layoff", "leave"
 ]
-MAX_DEPTH = 2
-
-VISITED = set()
 
 splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
 
@@ -29,162 +21,53 @@ def is_relevant(text):
     lower_text = text.lower()
     return any(keyword in lower_text for keyword in TARGET_KEYWORDS)
 
-def remove_fragment(url):
-    """
-    Remove URL fragment (the part after #) if it exists.
-    """
-    return urldefrag(url)[0]
-
-def get_domain(url):
-    return urlparse(url).netloc
-
-def clean_text(soup):
-    # Remove scripts/styles
-    for tag in soup(["script", "style", "nav", "footer", "aside"]):
-        tag.decompose()
-    return soup.get_text(separator=" ", strip=True)
-
-def extract_pdf_links(pdf_url):
-    links = []
-    try:
-        response = requests.get(pdf_url)
-        response.raise_for_status()
-        with open("temp.pdf", "wb") as f:
-            f.write(response.content)
-        doc = fitz.open("temp.pdf")
-        for page in doc:
-            for link in page.get_links():
-                uri = link.get("uri")
-                if uri:
-                    links.append(uri)
-        doc.close()
-    except Exception as e:
-        print(f"Failed to extract links from {pdf_url}: {e}")
-    return links
-
 # returns a list of LangChain Documents from the crawled URL
-def crawl(url, namespace="General", depth=0, max_depth=MAX_DEPTH, domain=None):
-    if url in VISITED or depth > max_depth:
-        return []
-
-    VISITED.add(url)
-    print(f"Crawling: {url}")
-
-    try:
-        headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-        }
-        res = requests.get(url, headers=headers, timeout=10)
-        res.raise_for_status()
-        content_type = res.headers.get("Content-Type", "")
-        if "application/pdf" not in content_type.lower():
-            urlType = "html"
-        else:
-            urlType = "pdf"
-
-        # add hyperlinks from the PDF
-        if urlType == "pdf":
-            # print("url is a PDF:", url)
-            links = []
-            # use fitz to extract links from the PDF
-            if url.startswith("http") or url.startswith("https"):
-                pdf_stream = io.BytesIO(res.content)
-                doc = fitz.open(stream=pdf_stream, filetype="pdf")
-            else:
-                doc = fitz.open(url)
-            for page in doc:
-                for link in page.get_links():
-                    uri = link.get("uri")
-                    if uri:
-                        links.append(uri)
-            doc.close()
-            # make a langchain Document from the PDF
-            pdfloader = PyPDFLoader(url, mode="page")
-            docs = pdfloader.load()
-            for page in docs:
-                page.metadata["type"] = "pdf"
-                page.metadata["namespace"] = namespace
-            for pdf_link in links:
-                full_pdf_link = remove_fragment(urljoin(url, pdf_link))
-                if domain == get_domain(full_pdf_link) and full_pdf_link not in VISITED:
-                    docs.extend(crawl(full_pdf_link, namespace, depth + 1, max_depth, domain=domain))
-            splitted_docs = splitter.split_documents(docs)
-            return splitted_docs
-        # add sublinks from HTML pages
-        else:
-            # print("url is a website:", url)
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
-            }
-            res = requests.get(url, headers=headers, timeout=10)
-            res.raise_for_status()
-            if url.endswith(".xml"):
-                return []
-            soup = BeautifulSoup(res.content, "html.parser")
-            page_text = clean_text(soup)
-            # print("Page text: ", page_text[:500])
-            page_title = soup.title.string.strip() if soup.title else ""
-
-            if not is_relevant(page_text):
-                return []
-
-            # Build LangChain Document
-            doc = Document(
-                page_content=page_text,
-                metadata={"type": "html", "source": url, "title": page_title, "namespace": namespace}
-            )
-            docs = [doc]
-            for link in soup.find_all("a", href=True):
-                full_url = remove_fragment(urljoin(url, link["href"]))
-                if domain == get_domain(full_url) and full_url not in VISITED and not "/fr/" in full_url:
-                    docs.extend(crawl(full_url, namespace, depth + 1, max_depth, domain=domain))
-
-            splitted_docs = splitter.split_documents(docs)
-            return splitted_docs
-
-    except Exception as e:
-        print(f"Failed on {url}: {e}")
-        return []
+def crawl(url, namespace="General", max_depth=MAX_DEPTH, domain=None):
+    crawler = Crawler(max_depth=max_depth, is_relevant=is_relevant)
+    docs = crawler.run([(url, domain, {"namespace": namespace})])
+    return splitter.split_documents(docs)
 
 # Load seed URLs from a JSON file
-def crawl_seed_urls(json_path):
+def crawl_seed_urls(json_path, corpus_directory="corpus", seeds_per_commit=16):
     with open(json_path, "r") as f:
         data = json.load(f)
 
+    seeds = []
     for item in data.get("General", []):
         url = item.get("url")
-        domain = get_domain(url)
-        docs = crawl(url, namespace="General", domain=domain)
-        extracted_docs.setdefault("General", []).extend(docs)
+        seeds.append((url, get_domain(url), {"namespace": "General"}))
 
     for province in data.get("provinces", []):
-        count = 0
         for doc in province.get("docs", []):
             url = doc.get("url")
-            domain = get_domain(url)
-            docs = crawl(url, namespace=province["name"], domain=domain)
-            count += len(docs)
-            print(f"Crawled {count} documents for {province['name']} from {url}")
-            extracted_docs.setdefault(province["name"], []).extend(docs)
-
-    print(f"Total count for {province['name']}: {count}")
-    print(f"Total documents extracted for {province['name']}: {len(extracted_docs.get(province['name'], []))}")
-
-    return
+            seeds.append((url, get_domain(url), {"namespace": province["name"]}))
+
+    writer = CorpusWriter(corpus_directory)
+    pending = [seed for seed in seeds if seed_key(seed) not in writer.done_seeds]
+    print(f"{len(seeds) - len(pending)} of {len(seeds)} seeds already crawled")
+
+    # Seeds in a group share one crawl so that different domains are fetched in parallel.
+    # Pages are stored unsplit; setupProvinces.py splits each of them once when indexing.
+    visited = VisitedSet()
+    for i in range(0, len(pending), seeds_per_commit):
+        group = pending[i:i + seeds_per_commit]
+        crawler = Crawler(visited=visited, is_relevant=is_relevant)
+        for doc in crawler.iter_pages(group):
+            writer.add(doc)
+        writer.commit(done_seeds=[seed_key(seed) for seed in group])
+        print(f"Committed {i + len(group)}/{len(pending)} seeds")
+    writer.close()
+
+    corpus = Corpus(corpus_directory)
+    for namespace in corpus.namespaces():
+        print(f"Total documents extracted for {namespace}: {corpus.count(namespace)}")
+
+def seed_key(seed):
+    url, _, metadata = seed
+    return f"{metadata['namespace']}|{url}"
 
 if __name__ == "__main__":
-    extracted_docs = {}
-
     # Load your JSON file
     crawl_seed_urls("providedDoc.json") # providedDoc: 236.32s user 12.97s system 8% cpu 46:15.07 total
 
     # with same domain restriction: 21687, without domain restriction: 27398
-    # print(f"Total documents extracted: {len(extracted_docs)}")
-    # for namespace, docs in extracted_docs.items():
-    #     print(f"number of documents in namespace '{namespace}': {len(docs)}")
-
-    # Save the extracted documents to a pickle file
-    with open("extracted_docs.pkl", "wb") as f:
-        pickle.dump(extracted_docs, f)
-
-    # print("Extracted documents:", extracted_docs)
\ No newline at end of file
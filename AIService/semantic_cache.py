@@ -0,0 +1,187 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+
+import numpy as np
+
+from config import semantic_cache_threshold, semantic_cache_ttl, semantic_cache_max_entries, semantic_cache_db_path
+
+
+class SemanticCache:
+    """
+    Cache of /responses payloads keyed by (province, company, index version).
+
+    A lookup embeds the new question and returns the stored payload of the most similar
+    cached question in the same bucket, if its cosine similarity is above the threshold.
+    Entries expire after `ttl_seconds` and the least recently used entries are evicted
+    once `max_entries` is reached. The index version of a bucket is made of a counter per
+    namespace it reads from (province, "General" and company), so invalidating a
+    namespace makes every bucket that depends on it unreachable.
+
+    Entries live in process memory. With a `path`, the namespace versions are kept in
+    SQLite instead, so an invalidation by any worker on the host reaches every worker's
+    cache on its next lookup.
+    """
+
+    def __init__(self, threshold=0.95, ttl_seconds=3600, max_entries=2000, path=None):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # entry id -> entry, least recently used first
+        self.buckets = defaultdict(list)  # bucket key -> entry ids
+        self.matrices = {}  # bucket key -> (entry ids, stacked embeddings), rebuilt lazily
+        self.versions = defaultdict(int)  # namespace -> version
+        self.next_id = 0
+        self.counters = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "expirations": 0, "invalidations": 0}
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+            if path != ":memory:":
+                self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS answer_cache_versions (namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)"
+            )
+            self.conn.commit()
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def bucket_key(self, province, company):
+        self.sync_versions((province, "General", company))
+        return (
+            province,
+            company,
+            self.versions[province],
+            self.versions["General"],
+            self.versions[company],
+        )
+
+    def lookup(self, province, company, embedding):
+        """Return the cached entry for a similar question, or None."""
+        query = normalize(embedding)
+        with self.lock:
+            key = self.bucket_key(province, company)
+            self.expire(key)
+            ids, matrix = self.bucket_matrix(key)
+            if not ids:
+                self.counters["misses"] += 1
+                return None
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.counters["misses"] += 1
+                return None
+            entry_id = ids[best]
+            self.entries.move_to_end(entry_id)
+            self.counters["hits"] += 1
+            return self.entries[entry_id]
+
+    def store(self, province, company, embedding, payload, answer):
+        """Store a payload and the raw model answer it was built from."""
+        with self.lock:
+            key = self.bucket_key(province, company)
+            entry_id = self.next_id
+            self.next_id += 1
+            self.entries[entry_id] = {
+                "key": key,
+                "embedding": normalize(embedding),
+                "payload": payload,
+                "answer": answer,
+                "created_at": time.time(),
+            }
+            self.buckets[key].append(entry_id)
+            self.matrices.pop(key, None)
+            self.counters["stores"] += 1
+            while len(self.entries) > self.max_entries:
+                oldest_id = next(iter(self.entries))
+                self.remove(oldest_id)
+                self.counters["evictions"] += 1
+
+    def invalidate(self, namespace):
+        """Drop every entry that was answered from `namespace`."""
+        with self.lock:
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT INTO answer_cache_versions VALUES (?, 1) "
+                    "ON CONFLICT (namespace) DO UPDATE SET version = version + 1",
+                    (namespace,),
+                )
+                self.conn.commit()
+                self.sync_versions((namespace,))
+            else:
+                self.versions[namespace] += 1
+                self.drop_namespace(namespace)
+            self.counters["invalidations"] += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.counters["hits"] + self.counters["misses"]
+            return {
+                **self.counters,
+                "entries": len(self.entries),
+                "hit_rate": self.counters["hits"] / lookups if lookups else 0.0,
+            }
+
+    # The helpers below expect self.lock to be held.
+
+    def sync_versions(self, namespaces):
+        """Pick up the versions other workers wrote and drop the entries they made stale."""
+        if self.conn is None:
+            return
+        namespaces = list(dict.fromkeys(namespaces))
+        rows = self.conn.execute(
+            f"SELECT namespace, version FROM answer_cache_versions WHERE namespace IN ({', '.join('?' * len(namespaces))})",
+            namespaces,
+        ).fetchall()
+        for namespace, version in rows:
+            if self.versions[namespace] != version:
+                self.versions[namespace] = version
+                self.drop_namespace(namespace)
+
+    def drop_namespace(self, namespace):
+        for key in list(self.buckets):
+            if namespace in ("General", key[0], key[1]):
+                for entry_id in list(self.buckets[key]):
+                    self.remove(entry_id)
+
+    def remove(self, entry_id):
+        entry = self.entries.pop(entry_id)
+        key = entry["key"]
+        self.buckets[key].remove(entry_id)
+        if not self.buckets[key]:
+            del self.buckets[key]
+        self.matrices.pop(key, None)
+
+    def expire(self, key):
+        cutoff = time.time() - self.ttl_seconds
+        for entry_id in list(self.buckets.get(key, [])):
+            if self.entries[entry_id]["created_at"] < cutoff:
+                self.remove(entry_id)
+                self.counters["expirations"] += 1
+
+    def bucket_matrix(self, key):
+        if key not in self.matrices:
+            ids = list(self.buckets.get(key, []))
+            if ids:
+                matrix = np.stack([self.entries[entry_id]["embedding"] for entry_id in ids])
+            else:
+                matrix = np.empty((0, 0), dtype=np.float32)
+            self.matrices[key] = (ids, matrix)
+        return self.matrices[key]
+
+
+def normalize(embedding):
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+answer_cache = SemanticCache(
+    threshold=semantic_cache_threshold,
+    ttl_seconds=semantic_cache_ttl,
+    max_entries=semantic_cache_max_entries,
+    path=semantic_cache_db_path,
+)
@@ -1,11 +1,17 @@
 from config import llm, vector_store, index
 
-import time
 import bs4
-from langchain_community.document_loaders import WebBaseLoader, PyPDFLoader
+from langchain_community.document_loaders import WebBaseLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-import pickle
+import argparse
+from corpus import Corpus
+from pdf_extract import load_pdf
+from index_manifest import IndexManifest, chunk_id
+from ingest_pipeline import IngestionPipeline
+from bm25_index import keyword_index
+
+manifest = IndexManifest()
 
 def load_and_split_html(url, title):
     try:
@@ -24,8 +30,7 @@ def load_and_split_html(url, title):
     
 def load_and_split_pdf(url):
     try:
-        pdfloader = PyPDFLoader(url, mode="page")
-        pdf_docs = pdfloader.load()
+        pdf_docs = load_pdf(url)
         pdf_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
         return pdf_splitter.split_documents(pdf_docs)
     except Exception as e:
@@ -42,69 +47,119 @@ def split_html(doc):
     
 def split_pdf(doc):
     try:
-        pdf_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
+        pdf_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
         return pdf_splitter.split_documents([doc])
     except Exception as e:
         print(f"[PDF] Failed to load {doc.metadata.get('title', '')}: {e}")
         return []
     
-def process_docs(docs):
-    splits = []
-    # print("Processing documents...")
-    # print(docs[0])  # Print first 100 characters of the first document
-    # print(f"Type of doc: {type(docs[0])}")
+# Yields the chunks of each document as it is split, so callers can stream them
+def iter_splits(docs):
     for doc in docs:
         doc_type = doc.metadata.get("type", "")
         if doc_type == "html":
-            splits.extend(split_html(doc))
+            yield from split_html(doc)
         elif doc_type == "pdf":
-            splits.extend(split_pdf(doc))
-    return splits
+            yield from split_pdf(doc)
+
+def process_docs(docs):
+    return list(iter_splits(docs))
 
 # Convert the Document objects to emmbeddings and upload to Pinecone vector store
-def batch_add_documents(vector_store, documents, namespace, batch_size=100, max_retries=5, base_delay=2):
-    for i in range(0, len(documents), batch_size):
-        batch = documents[i:i + batch_size]
-        attempt = 0
-        while attempt <= max_retries:
-            try:
-                vector_store.add_documents(batch, namespace=namespace)
-                break  # success
-            except Exception as e:
-                if "429" in str(e) or "Rate limit" in str(e):
-                    sleep_time = base_delay * (2 ** attempt)  # exponential backoff
-                    print(f"[Retry {attempt+1}] Rate limited on batch {i // batch_size + 1}, sleeping {sleep_time}s...")
-                    time.sleep(sleep_time)
-                    attempt += 1
-                else:
-                    print(f"Failed to upload batch {i // batch_size + 1}: {e}")
-                    break  # don't retry on non-rate errors
-        else:
-            print(f"[ERROR] Giving up on batch {i // batch_size + 1} after {max_retries} retries.")
+# Returns the IDs of the documents that were uploaded
+def batch_add_documents(vector_store, documents, namespace, ids=None, batch_size=100, max_retries=5, base_delay=2, on_upsert=None):
+    pipeline = IngestionPipeline(
+        vector_store.embeddings, index, namespace,
+        batch_size=batch_size, max_retries=max_retries, base_delay=base_delay, on_upsert=on_upsert,
+    )
+    return pipeline.run(documents, ids=ids)["uploaded_ids"]
 
-def index_documents():
+def list_namespace_ids(namespace):
+    """IDs stored in a namespace, or None if the index does not support listing."""
+    try:
+        return {id for page in index.list(namespace=namespace) for id in page}
+    except Exception as e:
+        print(f"Could not list IDs in namespace {namespace}: {e}")
+        return None
+
+def delete_ids(namespace, ids, batch_size=1000):
+    ids = sorted(ids)
+    for i in range(0, len(ids), batch_size):
+        index.delete(ids=ids[i:i + batch_size], namespace=namespace)
+
+def index_documents(corpus, namespaces):
+    """
+    Bring each of `namespaces` in line with its documents in the corpus. Chunks are identified
+    by a hash of their source, position and content, so only new or changed chunks are
+    embedded and upserted and chunks that disappeared are deleted. Unchanged chunks cost nothing.
+    New chunks are added to the namespace's keyword (BM25) index as their batches are upserted;
+    it is only rebuilt from the corpus when it does not hold the namespace's current chunks.
+    """
     stats = index.describe_index_stats()
     existing_namespaces = stats.get("namespaces", {})
-    for namespace, docs in allData.items():
-        # print("Processing namespace:", namespace)
-        # print("Number of documents in namespace:", len(docs))
-        if not isinstance(docs, list) or docs == []:
-            print("docs == []: ", docs == [])
-            print(f"Skipping non-list entry for namespace {namespace}: {docs}")
+    for namespace in namespaces:
+        if corpus.count(namespace) == 0:
+            print(f"Skipping empty namespace {namespace}")
             continue
-        splits = process_docs(docs)
-        if namespace in existing_namespaces:
-            index.delete(delete_all=True, namespace=namespace)
-        # print("length of splits:", len(splits))
-        batch_add_documents(vector_store, splits, namespace=namespace, batch_size=50)
+        docs = corpus.documents(namespace)
+        known_ids = manifest.load(namespace)
+        if known_ids is None and namespace in existing_namespaces:
+            # First incremental run for this namespace: adopt what is already in the index
+            known_ids = list_namespace_ids(namespace)
+            if known_ids is None:
+                index.delete(delete_all=True, namespace=namespace)
+        known_ids = known_ids or set()
+
+        # Split each document once and stream only new or changed chunks to the upload
+        current_ids = set()
+        def new_chunks():
+            for doc in iter_splits(docs):
+                id = chunk_id(doc)
+                if id in current_ids:
+                    continue
+                current_ids.add(id)
+                if id not in known_ids:
+                    yield doc
+
+        # Upsert before deleting so the namespace is never empty while it is rebuilt
+        uploaded_ids = batch_add_documents(
+            vector_store, new_chunks(), namespace=namespace, ids=chunk_id, batch_size=50, on_upsert=keyword_index.adder(namespace),
+        )
+        stale_ids = known_ids - current_ids
+        new_count = len(current_ids - known_ids)
+        print(f"{namespace}: {new_count} new or changed chunks, {len(stale_ids)} stale, {len(current_ids) - new_count} unchanged")
+        delete_ids(namespace, stale_ids)
+        indexed_ids = (known_ids - stale_ids) | set(uploaded_ids)
+        manifest.save(namespace, indexed_ids)
+        keyword_index.delete(namespace, ids=stale_ids)
+        if keyword_index.count(namespace) != len(indexed_ids):
+            # Unchanged chunks are missing from this host's keyword index, re-split the corpus
+            # (no embedding) and stream every current chunk into it
+            print(f"{namespace}: rebuilding the keyword index from the corpus")
+            keyword_index.replace(namespace, current_chunks(corpus.documents(namespace), indexed_ids))
+
+def current_chunks(docs, ids):
+    """(chunk id, text, source) of the chunks of `docs` whose ID is in `ids`, each once."""
+    seen = set()
+    for doc in iter_splits(docs):
+        id = chunk_id(doc)
+        if id in ids and id not in seen:
+            seen.add(id)
+            yield id, doc.page_content, doc.metadata.get("source")
 
 if __name__ == "__main__":
-    # Load your JSON file
-    # with open("providedDocSample.json") as f:
-    #     allData = json.load(f)
+    parser = argparse.ArgumentParser(description="Index the crawled corpus into the vector store.")
+    parser.add_argument("--corpus", default="corpus", help="corpus directory written by scrapeAllProvinceData.py")
+    parser.add_argument("--namespace", action="append", help="only index this namespace (repeatable)")
+    parser.add_argument("--worker", type=int, default=0, help="index of this indexer process")
+    parser.add_argument("--workers", type=int, default=1, help="number of indexer processes sharing the namespaces")
+    args = parser.parse_args()
 
-    with open("extracted_docs.pkl", "rb") as f:
-        allData = pickle.load(f)
+    corpus = Corpus(args.corpus)
+    namespaces = args.namespace or corpus.namespaces()
+    # Namespaces are dealt round-robin so each process indexes a disjoint set
+    namespaces = sorted(namespaces)[args.worker::args.workers]
+    print(f"Indexing namespaces: {', '.join(namespaces)}")
 
-    index_documents()
-    print("Indexing completed.")
\ No newline at end of file
+    index_documents(corpus, namespaces)
+    print("Indexing completed.")
@@ -0,0 +1,93 @@
+"""startup.py
+Lazily created clients and models, and how long the service took to start.
+
+Heavy dependencies (the chat model, the embedding client, Pinecone, Whisper) are declared
+with `lazy(...)`, which returns a stand-in that creates the real object on first use and
+forwards every attribute to it. `warm_up` creates them in a background thread right after
+startup, so a replica can accept requests before they are all loaded.
+"""
+
+import threading
+import time
+import traceback
+
+started_at = time.perf_counter()
+# Seconds spent in each startup phase and in creating each resource
+timings = {}
+resources = {}
+
+
+class LazyResource:
+    """
+    Creates an object with `factory` on first attribute access and forwards attributes to it.
+    Resources that are not `required` are loaded by `warm_up` but do not hold back readiness.
+    """
+
+    def __init__(self, name, factory, required=True):
+        self._name = name
+        self._factory = factory
+        self._required = required
+        self._value = None
+        self._state = "pending"
+        self._error = None
+        self._lock = threading.Lock()
+
+    def resolve(self):
+        """Create the object if needed and return it."""
+        if self._state != "ready":
+            with self._lock:
+                if self._state != "ready":
+                    self._state = "loading"
+                    started = time.perf_counter()
+                    try:
+                        self._value = self._factory()
+                    except Exception as e:
+                        self._state, self._error = "failed", str(e)
+                        raise
+                    timings[self._name] = round(time.perf_counter() - started, 3)
+                    self._state, self._error = "ready", None
+        return self._value
+
+    def __getattr__(self, attribute):
+        return getattr(self.resolve(), attribute)
+
+    def __repr__(self):
+        return f"<lazy {self._name}: {self._state}>"
+
+
+def lazy(name, factory, required=True):
+    resources[name] = LazyResource(name, factory, required)
+    return resources[name]
+
+
+def record(phase, started):
+    """Record the seconds spent in a startup phase that began at `started` (perf_counter)."""
+    timings[phase] = round(time.perf_counter() - started, 3)
+
+
+def warm_up():
+    """Create every resource in a background thread."""
+    def run():
+        started = time.perf_counter()
+        for name, resource in list(resources.items()):
+            try:
+                resource.resolve()
+            except Exception as e:
+                print(f"Failed to load {name}: {e}")
+                traceback.print_exc()
+        record("warm_up", started)
+        print("Startup times (s): " + ", ".join(f"{phase} {seconds}" for phase, seconds in timings.items()))
+
+    thread = threading.Thread(target=run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
+
+
+def status():
+    """Readiness, the state of each resource and the startup timings."""
+    states = {
+        name: resource._state if resource._error is None else f"failed: {resource._error}"
+        for name, resource in resources.items()
+    }
+    ready = all(resource._state == "ready" for resource in resources.values() if resource._required)
+    return {"ready": ready, "resources": states, "timings": dict(timings)}
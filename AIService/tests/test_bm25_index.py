@@ -0,0 +1,70 @@
+import bm25_index
+from bm25_index import BM25Index, rebuild_from_vector_index, reciprocal_rank_fusion, tokenize
+from local_vector_store import LocalIndex
+
+
+def filler(count):
+    topics = ["overtime pay", "vacation days", "notice of termination", "public holidays", "pay statements"]
+    return [(f"filler{i}", f"Employees are entitled to {topics[i % 5]} under this part.", "esa.html") for i in range(count)]
+
+
+def test_tokenize_keeps_section_numbers():
+    assert tokenize("What does s. 54 say about Averaging Agreements?") == ["s", "54", "say", "about", "averaging", "agreement"]
+    assert tokenize("See section 21.1 and 5 days") == ["see", "section", "21.1", "5", "day"]
+
+
+def test_exact_terms_rank_first(tmp_path):
+    index = BM25Index(str(tmp_path))
+    index.replace("Ontario", filler(200) + [
+        ("s54", "54 (1) An averaging agreement may be revoked on two weeks notice.", "esa.html"),
+        ("s55", "55 An employer shall keep records of averaging periods.", "esa.html"),
+    ])
+
+    assert index.search("Ontario", "averaging agreements", k=1)[0][0] == "s54"
+    assert index.search("Ontario", "s. 54", k=1)[0][0] == "s54"
+    assert index.search("Ontario", "nothing like this") == []
+    assert index.search("Quebec", "averaging") == []
+
+
+def test_updates_are_persisted(tmp_path, monkeypatch):
+    monkeypatch.setattr(bm25_index, "MAX_SEGMENTS", 3)
+    index = BM25Index(str(tmp_path))
+    index.add("Acme Corp", filler(50))
+    index.add("Acme Corp", [("policy", "Remote work stipend of 500 dollars", "https://acme.com/remote")])
+    index.add("Acme Corp", [("policy", "Remote work stipend of 750 dollars", "https://acme.com/remote-2")])
+
+    # A reader in another process sees the latest version of the re-added chunk only
+    reader = BM25Index(str(tmp_path))
+    assert [id for id, _ in reader.search("Acme Corp", "remote stipend")] == ["policy"]
+
+    index.delete("Acme Corp", source="https://acme.com/remote-2")
+    assert reader.search("Acme Corp", "remote stipend") == []
+    index.add("Acme Corp", [("other", "Parking policy", "https://acme.com/parking")])
+    index.add("Acme Corp", [("gym", "Gym stipend", "https://acme.com/gym")])
+    # Merged into one segment once there were more than MAX_SEGMENTS
+    assert len(reader.namespace("Acme Corp").segments) <= 3
+    assert [id for id, _ in reader.search("Acme Corp", "gym stipend")] == ["gym"]
+
+    index.drop("Acme Corp")
+    assert reader.search("Acme Corp", "gym") == []
+
+
+def test_reciprocal_rank_fusion():
+    dense = ["a", "b", "c", "d"]
+    keyword = ["e", "c", "a"]
+    assert reciprocal_rank_fusion([dense, keyword], k=3) == ["a", "c", "e"]
+
+
+def test_namespaces_are_rebuilt_from_the_vector_index(tmp_path, monkeypatch):
+    monkeypatch.setattr(bm25_index, "SEGMENT_DOCUMENTS", 8)
+    vectors = LocalIndex(str(tmp_path / "vectors"))
+    vectors.upsert([(f"c{i}", [1.0, float(i)], {"text": text, "source": source}) for i, (_, text, source) in enumerate(filler(20))], namespace="Acme")
+    vectors.upsert([("s54", [0.0, 1.0], {"text": "54 An averaging agreement may be revoked.", "source": "esa.html"})], namespace="Acme")
+    vectors.upsert([("no-text", [1.0, 1.0], {"source": "image.png"})], namespace="Acme")
+    index = BM25Index(str(tmp_path / "bm25"))
+    index.add("Acme", [("stale", "averaging agreement from an earlier upload", "old.html")])
+
+    assert rebuild_from_vector_index(index, vectors, "Acme", page_size=5) == 21
+    assert [id for id, _ in index.search("Acme", "averaging agreement")] == ["s54"]
+    # Written a segment at a time
+    assert index.stats() == {"Acme": {"chunks": 21, "segments": 3}}
@@ -0,0 +1,86 @@
+import threading
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import StateGraph, MessagesState, END
+
+from checkpointer import SQLiteCheckpointSaver, truncate_messages
+
+
+def reply(state: MessagesState):
+    return {"messages": [AIMessage(f"answer {len(state['messages'])}")]}
+
+
+def build_graph(saver):
+    builder = StateGraph(MessagesState)
+    builder.add_node(reply)
+    builder.set_entry_point("reply")
+    builder.add_edge("reply", END)
+    return builder.compile(checkpointer=saver)
+
+
+def test_conversation_survives_restart(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": "thread-1"}}
+
+    build_graph(SQLiteCheckpointSaver(path)).invoke({"messages": [{"role": "user", "content": "hi"}]}, config)
+    graph = build_graph(SQLiteCheckpointSaver(path))
+    state = graph.invoke({"messages": [{"role": "user", "content": "again"}]}, config)
+
+    assert [m.type for m in state["messages"]] == ["human", "ai", "human", "ai"]
+
+
+def test_messages_are_truncated_at_a_user_message():
+    saver = SQLiteCheckpointSaver(":memory:", max_messages=3)
+    graph = build_graph(saver)
+    config = {"configurable": {"thread_id": "thread-2"}}
+
+    for i in range(4):
+        graph.invoke({"messages": [{"role": "user", "content": f"question {i}"}]}, config)
+
+    messages = graph.get_state(config).values["messages"]
+    assert len(messages) <= 3
+    assert messages[0].type == "human"
+    assert saver.stats()["threads"] == 1
+
+
+def test_truncation_never_starts_with_a_tool_result():
+    call = AIMessage("", tool_calls=[{"name": "retrieve", "args": {}, "id": "call_1", "type": "tool_call"}])
+    messages = [HumanMessage("q"), call, ToolMessage("docs", tool_call_id="call_1"), ToolMessage("more", tool_call_id="call_1"), AIMessage("a")]
+
+    assert [m.type for m in truncate_messages(messages, 3)] == ["ai"]
+    assert [m.type for m in truncate_messages(messages, 4)] == ["ai", "tool", "tool", "ai"]
+
+
+def test_workers_can_write_the_same_thread_concurrently(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite")
+    config = {"configurable": {"thread_id": "shared"}}
+    build_graph(SQLiteCheckpointSaver(path)).invoke({"messages": [{"role": "user", "content": "hi"}]}, config)
+
+    # Two connections stand in for two worker processes
+    graphs = [build_graph(SQLiteCheckpointSaver(path)) for _ in range(2)]
+    errors = []
+
+    def ask(graph, n):
+        try:
+            graph.invoke({"messages": [{"role": "user", "content": f"question {n}"}]}, config)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=ask, args=(graph, n)) for n, graph in enumerate(graphs)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    state = build_graph(SQLiteCheckpointSaver(path)).get_state(config)
+    assert len(state.values["messages"]) >= 4
+
+
+def test_idle_threads_are_evicted():
+    saver = SQLiteCheckpointSaver(":memory:", idle_ttl_seconds=0)
+    graph = build_graph(saver)
+    graph.invoke({"messages": [{"role": "user", "content": "hi"}]}, {"configurable": {"thread_id": "idle"}})
+
+    assert saver.evict_idle() == 1
+    assert saver.stats()["threads"] == 0
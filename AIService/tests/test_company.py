@@ -1,3 +1,4 @@
+import time
 import pytest
 from fastapi.testclient import TestClient
 from main import app
@@ -20,8 +21,17 @@ def test_upload_document_real_dependencies(test_doc):
         "url": test_doc["url"],
         "company": test_doc["company"]
     })
-    assert response.status_code == 200
-    assert response.json()["status"] == "success"
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+
+    # Ingestion runs in the background, wait for the job to finish
+    for _ in range(120):
+        job = client.get(f"/company-document/jobs/{job_id}").json()
+        if job["status"] not in ("queued", "running"):
+            break
+        time.sleep(1)
+    assert job["status"] == "success"
+    assert all(stage["status"] == "done" for stage in job["stages"].values())
 
 
 def test_response_real_dependencies(test_doc):
@@ -0,0 +1,46 @@
+from langchain_core.documents import Document
+
+from context_builder import build_context, estimate_tokens
+
+TEXT = " ".join(f"Clause {i}: the employer shall pay wages for hours worked in week {i}." for i in range(30))
+
+
+def chunk(start, end, **metadata):
+    return Document(page_content=TEXT[start:end], metadata={"start_index": start, "type": "html", "province": "Ontario", **metadata})
+
+
+def test_overlapping_chunks_are_merged_and_duplicates_dropped():
+    docs = [
+        chunk(0, 1000, source="esa.html", title="ESA"),
+        chunk(800, 1800, source="esa.html", title="ESA"),
+        # The same text found in another namespace
+        chunk(0, 1000, source="copy.html", title="Copy"),
+        Document(page_content="Vacation pay is 4% of wages.", metadata={"source": "handbook.html", "company": "Acme", "start_index": 0}),
+    ]
+
+    public, company = build_context(docs, budget=10000)
+
+    assert public == f"DocMetadata: {{'title': 'ESA', 'source': 'esa.html'}}\nDocContent: {TEXT[:1800]}"
+    assert company == "DocMetadata: {'company': 'Acme', 'source': 'handbook.html'}\nDocContent: Vacation pay is 4% of wages."
+
+
+def test_chunks_without_start_index_are_merged_on_their_overlap():
+    docs = [
+        Document(page_content=TEXT[200:1000], metadata={"source": "esa.pdf", "page": 3}),
+        Document(page_content=TEXT[900:1500], metadata={"source": "esa.pdf", "page": 3}),
+    ]
+
+    public, _ = build_context(docs, budget=10000)
+
+    assert public.endswith(f"DocContent: {TEXT[200:1500]}")
+
+
+def test_budget_keeps_the_best_ranked_passages():
+    docs = [Document(page_content=f"Topic {i}. " + "word " * 400, metadata={"source": f"{i}.html"}) for i in range(5)]
+
+    public, company = build_context(docs, budget=1200)
+
+    assert estimate_tokens(public) <= 1200
+    assert "Topic 0." in public and "Topic 1." in public and "Topic 2." in public
+    assert "Topic 3." not in public
+    assert company == ""
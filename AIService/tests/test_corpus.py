@@ -0,0 +1,44 @@
+from langchain_core.documents import Document
+
+from corpus import Corpus, CorpusWriter
+
+
+def doc(namespace, i):
+    return Document(page_content=f"page {i} of {namespace}", metadata={"namespace": namespace, "source": f"https://example.com/{i}", "page": i})
+
+
+def test_documents_are_streamed_and_randomly_accessible(tmp_path):
+    writer = CorpusWriter(str(tmp_path), shard_size=3)
+    for i in range(7):
+        writer.add(doc("Ontario", i))
+    writer.add(doc("Yukon", 0))
+    writer.commit(done_seeds=["Ontario|https://example.com/0"])
+    writer.close()
+
+    corpus = Corpus(str(tmp_path))
+    assert corpus.namespaces() == ["Ontario", "Yukon"]
+    assert corpus.count("Ontario") == 7
+    assert [d.metadata["page"] for d in corpus.documents("Ontario")] == list(range(7))
+    assert corpus.document("Ontario", 5).page_content == "page 5 of Ontario"
+    assert corpus.document("Yukon", 0).metadata["source"] == "https://example.com/0"
+
+
+def test_uncommitted_writes_are_dropped_on_resume(tmp_path):
+    writer = CorpusWriter(str(tmp_path), shard_size=2)
+    writer.add(doc("Ontario", 0))
+    writer.commit(done_seeds=["seed-1"])
+    # Crash after writing more pages, including a new shard, without committing
+    for i in range(1, 4):
+        writer.add(doc("Ontario", i))
+    writer.close()
+
+    writer = CorpusWriter(str(tmp_path), shard_size=2)
+    assert writer.done_seeds == {"seed-1"}
+    for i in range(1, 4):
+        writer.add(doc("Ontario", i))
+    writer.commit(done_seeds=["seed-2"])
+    writer.close()
+
+    corpus = Corpus(str(tmp_path))
+    assert [d.metadata["page"] for d in corpus.documents("Ontario")] == [0, 1, 2, 3]
+    assert corpus.document("Ontario", 3).metadata["page"] == 3
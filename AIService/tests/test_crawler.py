@@ -0,0 +1,133 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from aiohttp import web
+
+from crawler import Crawler
+from http_cache import HTTPCache
+
+PAGES = {
+    "/": '<title>Home</title><a href="/a">A</a> <a href="/fr/a">French</a> <a href="http://other.example/x">Other</a> <a href="/private">Private</a>',
+    "/a": '<title>A</title><a href="/b#section">B</a> <a href="/">Home</a>',
+    "/b": '<title>B</title><a href="/c">C</a>',
+    "/c": "<title>C</title>too deep",
+    "/fr/a": "<title>French</title>",
+    "/private": "<title>Private</title>",
+}
+
+
+@asynccontextmanager
+async def site(requests, rate_limited=()):
+    """Serve PAGES on localhost, answering 429 once for each path in `rate_limited`."""
+    rate_limited = set(rate_limited)
+
+    async def handle(request):
+        requests.append((request.path, request.headers.get("If-None-Match")))
+        if request.path == "/robots.txt":
+            return web.Response(text="User-agent: *\nDisallow: /private\n")
+        if request.path in rate_limited:
+            rate_limited.discard(request.path)
+            return web.Response(status=429, headers={"Retry-After": "0"})
+        if request.path not in PAGES:
+            raise web.HTTPNotFound()
+        etag = f'"{request.path}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=PAGES[request.path], content_type="text/html", headers={"ETag": etag})
+
+    app = web.Application()
+    app.router.add_get("/{path:.*}", handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    server = web.TCPSite(runner, "127.0.0.1", 0)
+    await server.start()
+    port = runner.addresses[0][1]
+    try:
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        await runner.cleanup()
+
+
+def crawl(tmp_path, requests, crawls=1, **kwargs):
+    """Crawl the site `crawls` times with the same HTTP cache and return the last crawl."""
+    async def run():
+        async with site(requests, **kwargs) as root:
+            for _ in range(crawls):
+                requests.clear()
+                crawler = Crawler(max_depth=2, min_delay=0, http_cache=HTTPCache(str(tmp_path / "http_cache")))
+                docs = await crawler.crawl([(root + "/", root.removeprefix("http://"), {"namespace": "Acme"})])
+            return root, crawler, docs
+
+    return asyncio.run(run())
+
+
+def test_links_are_followed_within_the_domain_up_to_max_depth(tmp_path):
+    requests = []
+    root, _, docs = crawl(tmp_path, requests, rate_limited={"/a"})
+
+    assert [doc.metadata["title"] for doc in docs] == ["Home", "A", "B"]
+    assert docs[1].metadata == {"type": "html", "source": root + "/a", "title": "A", "namespace": "Acme"}
+    paths = [path for path, _ in requests]
+    # /a was retried after its 429, every other page fetched once; French pages, other
+    # domains and robots.txt exclusions are skipped
+    assert sorted(paths) == sorted(["/robots.txt", "/", "/a", "/a", "/b"])
+
+
+def test_unchanged_pages_are_revalidated_from_the_cache(tmp_path):
+    requests = []
+    _, crawler, docs = crawl(tmp_path, requests, crawls=2)
+
+    assert [doc.metadata["title"] for doc in docs] == ["Home", "A", "B"]
+    assert crawler.counters == {"downloaded": 0, "not_modified": 3}
+    assert ("/a", '"/a"') in requests
+
+
+def test_only_responses_with_validators_are_cached(tmp_path):
+    cache = HTTPCache(str(tmp_path))
+    cache.store("https://example.ca/a", {"Content-Type": "text/html"}, b"no validators")
+    cache.store("https://example.ca/b", {"ETag": '"v1"', "Last-Modified": "Wed, 01 Oct 2025 00:00:00 GMT", "Content-Type": "application/pdf"}, b"%PDF")
+
+    assert cache.load("https://example.ca/a") is None
+    entry = cache.load("https://example.ca/b")
+    assert entry["content_type"] == "application/pdf"
+    assert cache.conditional_headers(entry) == {"If-None-Match": '"v1"', "If-Modified-Since": "Wed, 01 Oct 2025 00:00:00 GMT"}
+    assert cache.body("https://example.ca/b") == b"%PDF"
+
+
+def test_unchanged_pages_can_be_skipped(tmp_path):
+    requests = []
+
+    async def run():
+        async with site(requests) as root:
+            cache = HTTPCache(str(tmp_path / "http_cache"))
+            seeds = [(root + "/", root.removeprefix("http://"), {"namespace": "Acme"})]
+            first = await Crawler(max_depth=2, min_delay=0, http_cache=cache, skip_unchanged=True).crawl(seeds)
+            crawler = Crawler(max_depth=2, min_delay=0, http_cache=cache, skip_unchanged=True)
+            second = await crawler.crawl(seeds)
+            return first, crawler, second
+
+    first, crawler, second = asyncio.run(run())
+    assert [doc.metadata["title"] for doc in first] == ["Home", "A", "B"]
+    # Nothing is yielded again, but links of unchanged pages are still followed
+    assert second == []
+    assert crawler.counters == {"downloaded": 0, "not_modified": 3}
+
+
+def test_cache_evicts_least_recently_used_entries_over_its_size(tmp_path):
+    cache = HTTPCache(str(tmp_path), max_bytes=250)
+    for i, url in enumerate(["https://example.ca/a", "https://example.ca/b"]):
+        cache.store(url, {"ETag": f'"{i}"'}, b"x" * 100)
+        os.utime(cache.paths(url)[0], (i, i))
+    # Reading "a" makes "b" the least recently used entry
+    cache.body("https://example.ca/a")
+    cache.store("https://example.ca/c", {"ETag": '"2"'}, b"x" * 100)
+
+    assert cache.load("https://example.ca/b") is None
+    assert cache.load("https://example.ca/a") is not None
+    assert cache.load("https://example.ca/c") is not None
+    assert cache.size == 200
+
+    cache.delete("https://example.ca/a")
+    assert cache.load("https://example.ca/a") is None
+    assert cache.size == 100
@@ -0,0 +1,59 @@
+import asyncio
+
+from langchain_core.embeddings import Embeddings
+
+from embedding_cache import CachedEmbeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self, model="models/embedding-001"):
+        self.model = model
+        self.documents = []
+        self.queries = []
+
+    def embed_documents(self, texts):
+        self.documents.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return [float(len(text)), -1.0]
+
+    async def aembed_documents(self, texts):
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text):
+        return self.embed_query(text)
+
+
+def test_each_distinct_text_is_embedded_once(tmp_path):
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, path=str(tmp_path / "cache.sqlite"))
+
+    vectors = cache.embed_documents(["Vacation pay", "Overtime", "Vacation   pay "])
+    assert vectors == [[12.0, 1.0], [8.0, 1.0], [12.0, 1.0]]
+    # Whitespace differences share an entry, duplicates in a batch are sent once
+    assert model.documents == ["Vacation pay", "Overtime"]
+
+    assert cache.embed_documents(["Overtime", "Sick leave"]) == [[8.0, 1.0], [10.0, 1.0]]
+    assert model.documents == ["Vacation pay", "Overtime", "Sick leave"]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["entries"] == 3
+
+
+def test_queries_documents_and_models_have_separate_entries(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    model = CountingEmbeddings()
+    cache = CachedEmbeddings(model, path=path)
+
+    cache.embed_documents(["Overtime"])
+    # The same text embedded as a query is a different vector
+    assert cache.embed_query("Overtime") == [8.0, -1.0]
+    assert asyncio.run(cache.aembed_query("Overtime")) == [8.0, -1.0]
+    assert model.queries == ["Overtime"]
+
+    # Entries persist, and are only shared with the same model
+    other = CountingEmbeddings(model="models/text-embedding-004")
+    assert CachedEmbeddings(model, path=path).embed_query("Overtime") == [8.0, -1.0]
+    CachedEmbeddings(other, path=path).embed_query("Overtime")
+    assert other.queries == ["Overtime"]
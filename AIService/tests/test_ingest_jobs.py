@@ -0,0 +1,87 @@
+import threading
+
+from ingest_jobs import IngestJobManager
+
+
+def test_duplicate_submissions_share_one_job():
+    release = threading.Event()
+    runs = []
+
+    def runner(job):
+        runs.append(job.id)
+        job.start("crawl")
+        release.wait(5)
+        job.finish("crawl", 3)
+        return {"company_docs_len": 3}
+
+    manager = IngestJobManager(runner, workers=2)
+    first, created = manager.submit("https://example.com/handbook.pdf", "AcmeCorp")
+    second, duplicate_created = manager.submit("https://example.com/handbook.pdf", "AcmeCorp")
+    other, other_created = manager.submit("https://example.com/handbook.pdf", "OtherCorp")
+
+    assert created and other_created and not duplicate_created
+    assert second["job_id"] == first["job_id"]
+    assert other["job_id"] != first["job_id"]
+
+    release.set()
+    manager.pool.shutdown(wait=True)
+    job = manager.get(first["job_id"])
+    assert job["status"] == "success"
+    assert job["stages"]["crawl"] == {"status": "done", "count": 3, "total": None}
+    assert len(runs) == 2
+
+    # Once the first job finished, the same pair can be ingested again
+    assert manager.active == {}
+
+
+def test_failed_job_reports_error():
+    def runner(job):
+        raise RuntimeError("crawl failed")
+
+    manager = IngestJobManager(runner)
+    job, _ = manager.submit("https://example.com/missing.pdf", "AcmeCorp")
+    manager.pool.shutdown(wait=True)
+
+    job = manager.get(job["job_id"])
+    assert job["status"] == "failed"
+    assert job["error"] == "crawl failed"
+    assert manager.stats()["failed"] == 1
+
+
+def test_jobs_are_shared_through_the_database(tmp_path):
+    release = threading.Event()
+
+    def runner(job):
+        job.start("crawl")
+        release.wait(5)
+        return {"company_docs_len": 1}
+
+    path = str(tmp_path / "jobs.sqlite")
+    first = IngestJobManager(runner, path=path)
+    second = IngestJobManager(runner, path=path)
+
+    job, created = first.submit("https://example.com/handbook.pdf", "AcmeCorp")
+    duplicate, duplicate_created = second.submit("https://example.com/handbook.pdf", "AcmeCorp")
+    assert created and not duplicate_created
+    assert duplicate["job_id"] == job["job_id"]
+
+    release.set()
+    first.pool.shutdown(wait=True)
+    assert second.get(job["job_id"])["status"] == "success"
+    assert second.stats()["success"] == 1
+
+
+def test_jobs_of_a_stopped_worker_are_marked_failed(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    release = threading.Event()
+    stopped = IngestJobManager(lambda job: release.wait(5), path=path)
+    job, _ = stopped.submit("https://example.com/handbook.pdf", "AcmeCorp")
+
+    # Nothing saved the job for longer than stale_seconds
+    other = IngestJobManager(lambda job: {}, path=path, stale_seconds=0)
+    retried, created = other.submit("https://example.com/handbook.pdf", "AcmeCorp")
+    other.pool.shutdown(wait=True)
+
+    assert created and retried["job_id"] != job["job_id"]
+    assert other.get(job["job_id"])["status"] == "failed"
+    release.set()
@@ -0,0 +1,93 @@
+import threading
+
+from langchain_core.documents import Document
+
+from ingest_pipeline import AdaptiveRateLimiter, IngestionPipeline, is_rate_limited
+
+
+class FlakyEmbeddings:
+    """Answers 429 to the first `rate_limited` requests."""
+
+    def __init__(self, rate_limited=0):
+        self.rate_limited = rate_limited
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            if self.rate_limited:
+                self.rate_limited -= 1
+                raise RuntimeError("429 Resource has been exhausted (e.g. check quota).")
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+class FlakyIndex:
+    """Fails every upsert of a batch holding one of the `failing` IDs."""
+
+    def __init__(self, failing=(), failures=1):
+        self.failing = set(failing)
+        self.failures = failures
+        self.vectors = {}
+        self.lock = threading.Lock()
+
+    def upsert(self, vectors, namespace=None):
+        with self.lock:
+            if self.failures and self.failing & {id for id, _, _ in vectors}:
+                self.failures -= 1
+                raise RuntimeError("503 Service Unavailable")
+            self.vectors.update({id: (values, metadata) for id, values, metadata in vectors})
+
+
+def documents(count):
+    return [Document(page_content=f"chunk {i}", metadata={"source": "handbook.html"}) for i in range(count)]
+
+
+def pipeline(embeddings, index, **kwargs):
+    limiter = AdaptiveRateLimiter(rate=1000, burst=1000)
+    return IngestionPipeline(embeddings, index, "Acme", batch_size=10, base_delay=0.01, limiter=limiter, **kwargs)
+
+
+def test_failed_batches_are_retried():
+    index = FlakyIndex(failing={"id-25"}, failures=2)
+    embeddings = FlakyEmbeddings(rate_limited=2)
+    progress = []
+
+    stats = pipeline(embeddings, index, on_progress=lambda stage, count: progress.append(stage)).run(
+        documents(45), ids=[f"id-{i}" for i in range(45)]
+    )
+
+    assert stats["upserted"] == stats["documents"] == 45
+    assert stats["batches"] == 5
+    assert stats["retries"] == 4
+    assert stats["failed_batches"] == 0
+    assert sorted(stats["uploaded_ids"]) == sorted(f"id-{i}" for i in range(45))
+    assert index.vectors["id-3"] == ([7.0, 1.0], {"source": "handbook.html", "text": "chunk 3"})
+    assert {"embed", "upsert"} == set(progress)
+
+
+def test_batches_failing_every_retry_are_reported():
+    index = FlakyIndex(failing={"id-0"}, failures=100)
+
+    stats = pipeline(FlakyEmbeddings(), index, max_retries=2).run(documents(25), ids=lambda doc: "id-" + doc.page_content.split()[1])
+
+    assert stats["failed_batches"] == 1
+    assert stats["failed_documents"] == 10
+    assert stats["retries"] == 2
+    # Only the batches that were upserted are reported as uploaded
+    assert sorted(stats["uploaded_ids"]) == sorted(f"id-{i}" for i in range(10, 25))
+    assert len(index.vectors) == 15
+
+
+def test_rate_limiter_backs_off_multiplicatively_and_recovers_additively():
+    limiter = AdaptiveRateLimiter(rate=8.0, min_rate=1.0, increase=0.5)
+
+    limiter.on_rate_limited(pause=0)
+    limiter.on_rate_limited(pause=0)
+    assert limiter.rate == 2.0
+    limiter.on_success()
+    assert limiter.rate == 2.5
+    for _ in range(5):
+        limiter.on_rate_limited(pause=0)
+    assert limiter.rate == 1.0
+
+    assert is_rate_limited(RuntimeError("429 Too Many Requests"))
+    assert not is_rate_limited(RuntimeError("503 Service Unavailable"))
@@ -0,0 +1,59 @@
+from langchain_core.messages import AIMessage, HumanMessage
+
+import rag_graph
+from intent_classifier import CLOSING_REPLY, GREETING_REPLY, IntentClassifier, find_province, intent_classifier
+
+
+def state(question, *history, province="Ontario", company="Acme"):
+    return {"messages": [*history, HumanMessage(question)], "question": question, "province": province, "company": company}
+
+
+def test_classifier_is_trained_on_first_use():
+    classifier = IntentClassifier()
+    assert classifier.stats()["trained"] is False
+
+    assert classifier.classify("hello there")[0] == "greeting"
+    assert classifier.classify("thanks so much, bye")[0] == "closing"
+    assert classifier.classify("How many vacation days do I get in Ontario?")[0] == "employment"
+    assert classifier.classify("Tell me a joke about cats")[0] == "other"
+    assert classifier.stats()["trained"] is True
+
+
+def test_find_province():
+    assert find_province("What is the minimum wage in B.C.?", "Ontario") == "British Columbia"
+    assert find_province("Overtime rules in nova scotia", "Ontario") == "Nova Scotia"
+    assert find_province("How much overtime?", "Ontario") == "Ontario"
+
+
+def test_routes(monkeypatch):
+    monkeypatch.setattr(rag_graph, "intent_confidence_threshold", 0.5)
+
+    greeting = rag_graph.classify_intent(state("hi there!"))
+    assert greeting["messages"][0].content == GREETING_REPLY
+    assert rag_graph.route_intent({"messages": greeting["messages"]}) == rag_graph.END
+
+    # Closings are not answered with the greeting, also in the middle of a conversation
+    closing = rag_graph.classify_intent(state("ok thanks!", HumanMessage("How long is a meal break?"), AIMessage("30 minutes.")))
+    assert closing["messages"][0].content == CLOSING_REPLY
+
+    # Clear employment questions call retrieve directly, with the province they name
+    retrieval = rag_graph.classify_intent(state("What is the minimum wage in Alberta?"))
+    tool_call = retrieval["messages"][0].tool_calls[0]
+    assert tool_call["name"] == "retrieve"
+    assert tool_call["args"] == {"query": "What is the minimum wage in Alberta?", "province": "Alberta", "company": "Acme"}
+    assert rag_graph.route_intent({"messages": retrieval["messages"]}) == "tools"
+
+    # Follow-ups and other questions are left to the routing LLM call
+    follow_up = state("How many sick days am I allowed?", HumanMessage("hello"), AIMessage("Hi!"))
+    assert rag_graph.classify_intent(follow_up) == {}
+    assert rag_graph.classify_intent(state("Tell me a joke")) == {}
+    assert rag_graph.route_intent(state("Tell me a joke")) == "query_or_respond"
+
+
+def test_uncertain_questions_fall_back_to_the_llm(monkeypatch):
+    monkeypatch.setattr(rag_graph, "intent_confidence_threshold", 1.01)
+    llm_routes = intent_classifier.stats()["llm"]
+
+    assert rag_graph.classify_intent(state("hi there!")) == {}
+    assert rag_graph.classify_intent(state("What is the minimum wage in Alberta?")) == {}
+    assert intent_classifier.stats()["llm"] == llm_routes + 2
@@ -0,0 +1,125 @@
+import asyncio
+import os
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+import local_vector_store
+from local_vector_store import LocalIndex, LocalVectorStore
+from vector_scan import scan_namespace
+
+
+class WordEmbeddings(Embeddings):
+    """Bag of words hashed into 64 dimensions."""
+
+    def embed(self, text):
+        vector = np.zeros(64, dtype=np.float32)
+        for word in text.lower().split():
+            vector[sum(map(ord, word)) % 64] += 1
+        return vector.tolist()
+
+    def embed_documents(self, texts):
+        return [self.embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed(text)
+
+
+def clustered_vectors(count, clusters=50, dimension=64, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dimension))
+    return (centers[rng.integers(0, clusters, count)] + 0.3 * rng.normal(size=(count, dimension))).astype(np.float32)
+
+
+def test_search_filters_and_deletes(tmp_path):
+    store = LocalVectorStore(WordEmbeddings(), LocalIndex(str(tmp_path)))
+    store.add_documents([
+        Document("vacation days for full time staff", metadata={"source": "a.pdf", "company": "Acme", "created_at": 1}),
+        Document("overtime pay after forty hours", metadata={"source": "b.pdf", "company": "Acme", "created_at": 2}),
+        Document("vacation policy for contractors", metadata={"source": "c.pdf", "company": "Other", "created_at": 3}),
+    ], namespace="Acme Corp")
+
+    docs = store.similarity_search("overtime pay", k=1, namespace="Acme Corp")
+    assert docs[0].page_content == "overtime pay after forty hours"
+    assert docs[0].metadata == {"source": "b.pdf", "company": "Acme", "created_at": 2}
+
+    results = asyncio.run(store.asimilarity_search_by_vector_with_score(
+        WordEmbeddings().embed_query("vacation"), k=3, namespace="Acme Corp",
+        filter={"company": {"$eq": "Acme"}, "created_at": {"$gte": 1}},
+    ))
+    assert [doc.metadata["source"] for doc, _ in results][0] == "a.pdf"
+    assert {doc.metadata["company"] for doc, _ in results} == {"Acme"}
+    assert store.similarity_search("vacation", namespace="Nowhere") == []
+
+    store.index.delete(filter={"source": {"$eq": "a.pdf"}}, namespace="Acme Corp")
+    assert store.index.describe_index_stats()["namespaces"] == {"Acme Corp": {"vector_count": 2}}
+    store.index.delete(delete_all=True, namespace="Acme Corp")
+    assert store.index.describe_index_stats()["namespaces"] == {}
+
+
+def test_persists_and_replaces_vectors(tmp_path):
+    vectors = clustered_vectors(300)
+    index = LocalIndex(str(tmp_path))
+    index.upsert(vectors=[(f"v{i}", vectors[i], {"text": str(i)}) for i in range(300)], namespace="Nova Scotia")
+    index.upsert(vectors=[("v0", vectors[1], {"text": "replaced"})], namespace="Nova Scotia")
+    index.delete(ids=["v2"], namespace="Nova Scotia")
+
+    reopened = LocalIndex(str(tmp_path))
+    assert reopened.describe_index_stats()["total_vector_count"] == 299
+    fetched = reopened.fetch(ids=["v0", "v2"], namespace="Nova Scotia").vectors
+    assert list(fetched) == ["v0"]
+    assert fetched["v0"].metadata == {"text": "replaced"}
+    assert np.allclose(fetched["v0"].values, vectors[1])
+    assert len([id for id, _, _ in scan_namespace(reopened, "Nova Scotia", page_size=64)]) == 299
+
+
+def test_compaction_survives_a_crash_between_the_renames(tmp_path, monkeypatch):
+    vectors = clustered_vectors(40)
+    index = LocalIndex(str(tmp_path))
+    index.upsert(vectors=[(f"v{i}", vectors[i], {"text": str(i)}) for i in range(40)], namespace="Yukon")
+    partition = index.partition("Yukon")
+    partition.delete([f"v{i}" for i in range(30)])
+    partition.compact()
+    assert partition.rows == 10
+    assert np.allclose(index.fetch(ids=["v35"], namespace="Yukon").vectors["v35"].values, vectors[35])
+
+    replace = os.replace
+
+    def crash(source, destination):
+        replace(source, destination)
+        if source == partition.directory:
+            raise OSError("killed")
+
+    monkeypatch.setattr(local_vector_store.os, "replace", crash)
+    partition.delete(["v30"])
+    try:
+        partition.compact()
+    except OSError:
+        pass
+    monkeypatch.setattr(local_vector_store.os, "replace", replace)
+    assert not os.path.exists(partition.directory)
+
+    reopened = LocalIndex(str(tmp_path))
+    assert sorted(os.listdir(tmp_path)) == ["Yukon"]
+    assert reopened.partition("Yukon").rows == 9
+    fetched = reopened.fetch(ids=["v30", "v39"], namespace="Yukon").vectors
+    assert list(fetched) == ["v39"]
+    assert np.allclose(fetched["v39"].values, vectors[39])
+
+
+def test_ivf_search_finds_the_exact_neighbours(tmp_path):
+    vectors = clustered_vectors(5000)
+    index = LocalIndex(str(tmp_path), ivf_threshold=2000)
+    for start in range(0, 5000, 1000):
+        index.upsert(vectors=[(str(i), vectors[i], {}) for i in range(start, start + 1000)], namespace="ns")
+    assert index.partitions["ns"].centroids is not None
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    rng = np.random.default_rng(1)
+    found = 0
+    for row in range(50):
+        query = vectors[row] + 0.1 * rng.normal(size=64).astype(np.float32)
+        exact = set(np.argsort(-(normalized @ query))[:4].astype(str))
+        found += len(exact & {match["id"] for match in index.query(vector=query, top_k=4, namespace="ns")["matches"]})
+    assert found / 200 >= 0.95
@@ -0,0 +1,53 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import fitz
+
+import pdf_extract
+
+
+def make_pdf(pages):
+    with fitz.open() as pdf:
+        for i in range(pages):
+            page = pdf.new_page()
+            page.insert_text((72, 72), f"Section {i}")
+        return pdf.tobytes()
+
+
+class RecordingPool(ThreadPoolExecutor):
+    def __init__(self):
+        super().__init__(2)
+        self.tasks = []
+
+    def submit(self, func, *args):
+        self.tasks.append(args)
+        return super().submit(func, *args)
+
+
+def test_pool_tasks_carry_a_path_and_a_page_range(monkeypatch):
+    pool = RecordingPool()
+    monkeypatch.setattr(pdf_extract, "PDF_WORKERS", 2)
+    monkeypatch.setattr(pdf_extract, "PAGES_PER_TASK", 4)
+    monkeypatch.setattr(pdf_extract, "get_pool", lambda: pool)
+
+    docs, _ = pdf_extract.extract_pdf(make_pdf(10), "https://example.ca/act.pdf", {"namespace": "Yukon"})
+
+    assert [doc.page_content for doc in docs] == [f"Section {i}" for i in range(10)]
+    assert docs[9].metadata["page"] == 9
+    assert docs[9].metadata["total_pages"] == 10
+    assert docs[9].metadata["namespace"] == "Yukon"
+    assert [(start, stop) for _, start, stop in pool.tasks] == [(0, 4), (4, 8), (8, 12)]
+    paths = {path for path, _, _ in pool.tasks}
+    assert len(paths) == 1 and isinstance(paths.pop(), str)
+
+
+def test_local_files_are_shared_with_the_workers(tmp_path, monkeypatch):
+    pool = RecordingPool()
+    monkeypatch.setattr(pdf_extract, "PDF_WORKERS", 2)
+    monkeypatch.setattr(pdf_extract, "PAGES_PER_TASK", 4)
+    monkeypatch.setattr(pdf_extract, "get_pool", lambda: pool)
+    path = tmp_path / "act.pdf"
+    path.write_bytes(make_pdf(6))
+
+    assert len(pdf_extract.load_pdf(str(path))) == 6
+    assert {task[0] for task in pool.tasks} == {str(path)}
+    assert path.exists()
@@ -0,0 +1,57 @@
+import threading
+
+import numpy as np
+
+from popular_questions import PopularQuestionsCache, QuestionClusterer, nearest_rows
+
+
+def test_nearest_rows_matches_brute_force():
+    rng = np.random.default_rng(0)
+    points = rng.normal(size=(200, 16)).astype(np.float32)
+    centroids = rng.normal(size=(3, 16)).astype(np.float32)
+    expected = [int(np.argmin(np.linalg.norm(points - c, axis=1))) for c in centroids]
+    assert nearest_rows(points, centroids) == expected
+
+
+def test_one_question_per_cluster_and_group():
+    rng = np.random.default_rng(1)
+    centers = np.eye(3, 8) * 10
+    questions = [
+        ("Ontario", "Acme", f"topic {i % 3} question {i}", (centers[i % 3] + rng.normal(scale=0.1, size=8)).tolist())
+        for i in range(30)
+    ]
+    questions.append(("Yukon", "", "only question", [0.0] * 8))
+
+    clusterer = QuestionClusterer()
+    popular = clusterer.popular_questions(questions)
+    ontario = sorted(q["text"].split(" question")[0] for q in popular if q["province"] == "Ontario")
+    assert ontario == ["topic 0", "topic 1", "topic 2"]
+    assert [q["text"] for q in popular if q["province"] == "Yukon"] == ["only question"]
+
+    # Later runs warm-start from the previous centroids
+    assert clusterer.popular_questions(questions) == popular
+
+
+def test_cache_serves_without_recomputing():
+    calls = []
+    cache = PopularQuestionsCache(lambda: calls.append(1) or [{"text": "q"}], refresh_seconds=0, ttl_seconds=60)
+    assert cache.get() == [{"text": "q"}]
+    assert cache.get() == [{"text": "q"}]
+    assert len(calls) == 1
+
+
+def test_refresh_starts_before_the_first_read():
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return [{"text": "q"}]
+
+    cache = PopularQuestionsCache(compute, refresh_seconds=60, ttl_seconds=120).start()
+    release.set()
+    # The read waits for the computation the start launched instead of running its own
+    assert cache.get() == [{"text": "q"}]
+    assert cache.get() == [{"text": "q"}]
+    assert len(calls) == 1
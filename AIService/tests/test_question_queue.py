@@ -0,0 +1,50 @@
+import time
+
+from question_queue import QuestionQueue
+
+
+def test_questions_are_stored_in_batches():
+    batches = []
+    questions = QuestionQueue(batches.append, batch_size=3, flush_seconds=0.2)
+    for i in range(7):
+        questions.submit(f"question {i}", "Ontario", "")
+    questions.join()
+
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert batches[0][0] == ("question 0", "Ontario", "")
+    assert questions.stats()["batches"] == 3
+
+
+def test_partial_batch_is_flushed_after_the_timeout():
+    batches = []
+    questions = QuestionQueue(batches.append, batch_size=10, flush_seconds=0.1)
+    questions.submit("question", "Yukon", "AcmeCorp")
+    time.sleep(0.3)
+    assert batches == [[("question", "Yukon", "AcmeCorp")]]
+
+
+def test_full_queue_drops_questions_and_failures_are_counted():
+    def store(batch):
+        raise RuntimeError("vector store unavailable")
+
+    questions = QuestionQueue(store, batch_size=1, flush_seconds=0.01, max_pending=1)
+    for i in range(50):
+        questions.submit(f"question {i}", "Ontario", "")
+    questions.join()
+
+    stats = questions.stats()
+    assert stats["submitted"] + stats["dropped"] == 50
+    assert stats["failed_batches"] == stats["submitted"]
+
+
+def test_close_stores_pending_questions_without_waiting_for_the_timeout():
+    batches = []
+    questions = QuestionQueue(batches.append, batch_size=10, flush_seconds=60)
+    questions.submit("question 1", "Yukon", "")
+    questions.submit("question 2", "Yukon", "")
+
+    started = time.monotonic()
+    assert questions.close(timeout=5)
+    assert time.monotonic() - started < 1
+    assert batches == [[("question 1", "Yukon", ""), ("question 2", "Yukon", "")]]
+    assert questions.close(timeout=1)
@@ -0,0 +1,68 @@
+import time
+
+from semantic_cache import SemanticCache
+
+
+def test_similar_questions_hit_above_the_threshold():
+    cache = SemanticCache(threshold=0.95)
+    cache.store("Ontario", "Acme", [1.0, 0.0, 0.0], {"publicResponse": "two weeks"}, "answer")
+
+    assert cache.lookup("Ontario", "Acme", [0.99, 0.05, 0.0])["payload"] == {"publicResponse": "two weeks"}
+    # Not similar enough, or another province or company
+    assert cache.lookup("Ontario", "Acme", [0.7, 0.7, 0.0]) is None
+    assert cache.lookup("Alberta", "Acme", [1.0, 0.0, 0.0]) is None
+    assert cache.lookup("Ontario", "", [1.0, 0.0, 0.0]) is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 3
+
+
+def test_invalidation_drops_entries_answered_from_the_namespace():
+    cache = SemanticCache()
+    cache.store("Ontario", "Acme", [1.0, 0.0], {"answer": 1}, "a")
+    cache.store("Ontario", "Globex", [1.0, 0.0], {"answer": 2}, "b")
+    cache.store("Alberta", "Acme", [1.0, 0.0], {"answer": 3}, "c")
+
+    cache.invalidate("Acme")
+    assert cache.lookup("Ontario", "Acme", [1.0, 0.0]) is None
+    assert cache.lookup("Alberta", "Acme", [1.0, 0.0]) is None
+    assert cache.lookup("Ontario", "Globex", [1.0, 0.0])["payload"] == {"answer": 2}
+
+    # Every bucket reads from "General"
+    cache.invalidate("General")
+    assert cache.lookup("Ontario", "Globex", [1.0, 0.0]) is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_entries_expire_and_are_evicted_least_recently_used_first(monkeypatch):
+    cache = SemanticCache(ttl_seconds=60, max_entries=2)
+    cache.store("Ontario", "", [1.0, 0.0], {"answer": "a"}, "a")
+    cache.store("Ontario", "", [0.0, 1.0], {"answer": "b"}, "b")
+    assert cache.lookup("Ontario", "", [1.0, 0.0]) is not None
+    cache.store("Ontario", "", [-1.0, 0.0], {"answer": "c"}, "c")
+
+    # "b" was the least recently used entry
+    assert cache.lookup("Ontario", "", [0.0, 1.0]) is None
+    assert cache.stats()["evictions"] == 1
+
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert cache.lookup("Ontario", "", [1.0, 0.0]) is None
+    assert cache.stats()["expirations"] == 2
+
+
+def test_invalidations_reach_the_caches_of_other_workers(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    first = SemanticCache(path=path)
+    second = SemanticCache(path=path)
+    first.store("Ontario", "Acme", [1.0, 0.0], {"answer": 1}, "a")
+    second.store("Ontario", "Acme", [1.0, 0.0], {"answer": 1}, "a")
+    second.store("Ontario", "Globex", [1.0, 0.0], {"answer": 2}, "b")
+
+    first.invalidate("Acme")
+    assert first.lookup("Ontario", "Acme", [1.0, 0.0]) is None
+    assert second.lookup("Ontario", "Acme", [1.0, 0.0]) is None
+    assert second.lookup("Ontario", "Globex", [1.0, 0.0])["payload"] == {"answer": 2}
+
+    # Answers stored after the invalidation are served again
+    second.store("Ontario", "Acme", [1.0, 0.0], {"answer": 3}, "c")
+    assert second.lookup("Ontario", "Acme", [1.0, 0.0])["payload"] == {"answer": 3}
@@ -0,0 +1,63 @@
+from types import SimpleNamespace
+
+from langchain_core.documents import Document
+
+import setupProvinces
+from bm25_index import BM25Index
+from corpus import Corpus, CorpusWriter
+from index_manifest import IndexManifest
+from local_vector_store import LocalIndex
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.texts = []
+
+    def embed_documents(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+def write_corpus(directory, pages):
+    writer = CorpusWriter(str(directory))
+    for source, text in pages.items():
+        writer.add(Document(page_content=text, metadata={"namespace": "Yukon", "type": "html", "source": source, "title": source}))
+    writer.commit()
+    writer.close()
+    return Corpus(str(directory))
+
+
+def test_only_new_and_changed_chunks_are_indexed(tmp_path, monkeypatch):
+    index = LocalIndex(str(tmp_path / "vectors"))
+    embeddings = CountingEmbeddings()
+    keyword_index = BM25Index(str(tmp_path / "bm25"))
+    monkeypatch.setattr(setupProvinces, "index", index)
+    monkeypatch.setattr(setupProvinces, "vector_store", SimpleNamespace(embeddings=embeddings))
+    monkeypatch.setattr(setupProvinces, "manifest", IndexManifest(str(tmp_path / "manifests")))
+    monkeypatch.setattr(setupProvinces, "keyword_index", keyword_index)
+
+    pages = {
+        "https://yukon.ca/vacation": "Employees earn two weeks of vacation after a year of employment.",
+        "https://yukon.ca/overtime": "Overtime is paid at one and a half times the regular wage.",
+        "https://yukon.ca/holidays": "Discovery Day is a general holiday in Yukon.",
+    }
+    setupProvinces.index_documents(write_corpus(tmp_path / "corpus-1", pages), ["Yukon"])
+    assert len(embeddings.texts) == 3
+    first_ids = set(index.partition("Yukon").positions)
+
+    # One page changed, one was removed
+    pages["https://yukon.ca/vacation"] = "Employees earn three weeks of vacation after five years of employment."
+    del pages["https://yukon.ca/holidays"]
+    setupProvinces.index_documents(write_corpus(tmp_path / "corpus-2", pages), ["Yukon"])
+
+    assert embeddings.texts[3:] == [pages["https://yukon.ca/vacation"]]
+    ids = set(index.partition("Yukon").positions)
+    assert len(ids) == 2
+    assert len(ids & first_ids) == 1
+    assert setupProvinces.manifest.load("Yukon") == ids
+    assert {id for id, _ in keyword_index.search("Yukon", "vacation overtime holiday")} == ids
+
+    # Nothing changed, nothing is embedded
+    setupProvinces.index_documents(write_corpus(tmp_path / "corpus-3", pages), ["Yukon"])
+    assert len(embeddings.texts) == 4
+    assert set(index.partition("Yukon").positions) == ids
@@ -0,0 +1,43 @@
+import startup
+
+
+def test_lazy_resource_is_created_on_first_use():
+    created = []
+
+    def factory():
+        created.append(1)
+        return "hello"
+
+    resource = startup.LazyResource("greeting", factory)
+    assert created == []
+    assert resource.upper() == "HELLO"
+    assert resource.startswith("he")
+    assert created == [1]
+    assert "greeting" in startup.timings
+
+
+def test_readiness_waits_for_required_resources(monkeypatch):
+    monkeypatch.setattr(startup, "resources", {})
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("no network")
+        return object()
+
+    startup.lazy("client", flaky)
+    startup.lazy("optional", lambda: 1 / 0, required=False)
+
+    startup.warm_up().join()
+    status = startup.status()
+    assert not status["ready"]
+    assert status["resources"]["client"] == "failed: no network"
+
+    # A failed resource is created again on the next use
+    startup.resources["client"].resolve()
+    status = startup.status()
+    assert status["ready"]
+    assert status["resources"]["client"] == "ready"
+    assert status["resources"]["optional"].startswith("failed")
+    assert "warm_up" in status["timings"]
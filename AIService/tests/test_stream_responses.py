@@ -0,0 +1,40 @@
+import json
+
+from fastapi.testclient import TestClient
+from main import app
+
+client = TestClient(app)
+
+def read_events(response):
+    events = []
+    event = None
+    for line in response.iter_lines():
+        if line.startswith("event: "):
+            event = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((event, json.loads(line[len("data: "):])))
+    return events
+
+def test_stream_response_real_dependencies():
+    payload = {
+        "province": "Ontario",
+        "question": "What are the vacation entitlements in Ontario?",
+        "thread_id": "test-thread-stream-001",
+        "company": ""
+    }
+
+    with client.stream("POST", "/responses/stream", json=payload) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = read_events(response)
+
+    names = [name for name, _ in events]
+    assert "error" not in names
+    assert names[-1] == "done"
+
+    data = events[-1][1]
+    for field in ["publicResponse", "privateResponse", "publicFound", "privateFound", "publicMetadata", "privateMetadata"]:
+        assert field in data
+
+    assert isinstance(data["publicResponse"], str)
+    assert isinstance(data["privateResponse"], str)
@@ -0,0 +1,114 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from faster_whisper.audio import decode_audio
+
+from transcription import TranscriptionBusy, TranscriptionPool, TranscriptionStream, profile_options
+
+
+class FakeWhisper:
+    def __init__(self, release):
+        self.release = release
+
+    def transcribe(self, audio, **options):
+        self.release.wait(5)
+        info = SimpleNamespace(language="en", language_probability=0.99, size=len(audio.read()))
+        return iter([SimpleNamespace(text=" hello"), SimpleNamespace(text=" world")]), info
+
+
+def test_transcribes_from_memory():
+    release = threading.Event()
+    release.set()
+    pool = TranscriptionPool(lambda: FakeWhisper(release))
+
+    info, transcript = asyncio.run(pool.transcribe(b"RIFF....", beam_size=5))
+    assert transcript == "hello world"
+    assert info.size == 8
+
+
+def test_requests_beyond_the_queue_limit_are_rejected():
+    release = threading.Event()
+    pool = TranscriptionPool(lambda: FakeWhisper(release), replicas=1, max_queue=1)
+
+    async def burst():
+        tasks = [asyncio.create_task(pool.transcribe(b"audio")) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(TranscriptionBusy):
+            await pool.transcribe(b"audio")
+        release.set()
+        return await asyncio.gather(*tasks)
+
+    results = asyncio.run(burst())
+    assert [transcript for _, transcript in results] == ["hello world", "hello world"]
+    assert pool.stats()["rejected"] == 1
+    assert pool.stats()["in_flight"] == 0
+
+
+def test_cancelled_callers_keep_their_slot_until_the_job_is_done():
+    release = threading.Event()
+    pool = TranscriptionPool(lambda: FakeWhisper(release), replicas=1, max_queue=1)
+
+    async def disconnect():
+        running = asyncio.create_task(pool.transcribe(b"audio"))
+        queued = asyncio.create_task(pool.transcribe(b"audio"))
+        await asyncio.sleep(0.05)
+        running.cancel()
+        queued.cancel()
+        await asyncio.sleep(0.05)
+        # The running job still holds its slot, the queued one was cancelled before it started
+        assert pool.stats()["in_flight"] == 1
+        assert pool.stats()["cancelled"] == 1
+        waiting = asyncio.create_task(pool.transcribe(b"audio"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(TranscriptionBusy):
+            await pool.transcribe(b"audio")
+        release.set()
+        return await waiting
+
+    info, transcript = asyncio.run(disconnect())
+    assert transcript == "hello world"
+    assert pool.stats()["in_flight"] == 0
+    assert pool.stats()["completed"] == 2
+
+
+def test_profiles():
+    assert profile_options("fast")["beam_size"] == 1
+    assert profile_options("auto", duration=3) == profile_options("fast")
+    assert profile_options("auto", duration=60) == profile_options("accurate")
+    with pytest.raises(ValueError):
+        profile_options("slow")
+
+
+class FakeStreamingWhisper:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio, **options):
+        self.calls.append((len(audio), options))
+        return iter([SimpleNamespace(text=" hello world")]), SimpleNamespace(language="en")
+
+
+def test_stream_transcribes_each_utterance():
+    model = FakeStreamingWhisper()
+    stream = TranscriptionStream(TranscriptionPool(lambda: model), profile="fast")
+    speech = decode_audio("tests/assets/hello_world.wav")
+    silence = np.zeros(16000, dtype=np.float32)
+    pcm = (np.concatenate([silence, speech, silence, speech]) * 32767).astype(np.int16).tobytes()
+
+    async def send():
+        events = []
+        for start in range(0, len(pcm), 3200):
+            events += await stream.feed(pcm[start:start + 3200])
+        return events + await stream.finish()
+
+    events = asyncio.run(send())
+    finals = [event for event in events if event["type"] == "final"]
+    assert len(finals) == 2
+    assert finals[0]["start"] < finals[0]["end"] < finals[1]["start"]
+    assert events[-1] == {"type": "done", "language": "en", "transcript": "hello world hello world"}
+    # Every utterance is sent to the model on its own, and the detected language is reused
+    assert all(length < len(speech) + 16000 for length, _ in model.calls)
+    assert model.calls[-1][1]["language"] == "en"
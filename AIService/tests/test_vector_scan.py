@@ -0,0 +1,115 @@
+import time
+from types import SimpleNamespace
+
+import utils
+from popular_questions import QuestionClusterer
+from utils import DAY_SECONDS, delete_expired_questions, migrate_legacy_question_ids, question_id, recent_questions
+from vector_scan import scan_namespace
+
+
+class FakeIndex:
+    """Local stand-in for a Pinecone index: paginated list and batched fetch."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+        self.fetched_batches = []
+
+    def list(self, namespace=None, prefix="", limit=100):
+        ids = sorted(id for id in self.vectors.get(namespace, {}) if id.startswith(prefix))
+        for i in range(0, len(ids), limit):
+            yield ids[i:i + limit]
+
+    def fetch(self, ids, namespace=None):
+        self.fetched_batches.append(len(ids))
+        return SimpleNamespace(vectors={
+            id: SimpleNamespace(id=id, values=self.vectors[namespace][id][0], metadata=self.vectors[namespace][id][1])
+            for id in ids
+        })
+
+    def upsert(self, vectors, namespace=None):
+        for id, values, metadata in vectors:
+            self.vectors[namespace][id] = (values, metadata)
+
+    def delete(self, ids, namespace=None):
+        for id in ids:
+            del self.vectors[namespace][id]
+
+
+def questions(count):
+    return {
+        f"q{i:05d}": ([float(i % 3), 1.0], {"province": "Ontario", "company": "", "text": f"question {i}", "created_at": i})
+        for i in range(count)
+    }
+
+
+def test_scan_covers_more_than_one_query_page():
+    index = FakeIndex({"UserQuestions": questions(12500)})
+    ids = [id for id, _, _ in scan_namespace(index, "UserQuestions", page_size=1000, fetch_batch=200)]
+
+    assert len(ids) == 12500
+    assert max(index.fetched_batches) == 200
+
+
+def test_groups_are_sampled_to_a_bounded_size():
+    index = FakeIndex({"UserQuestions": questions(5000)})
+    scanned = (
+        (metadata["province"], metadata["company"], metadata["text"], values)
+        for _, values, metadata in scan_namespace(index, "UserQuestions")
+    )
+    clusterer = QuestionClusterer()
+    fitted = []
+    fit = clusterer.fit
+    clusterer.fit = lambda key, embeddings: fitted.append(len(embeddings)) or fit(key, embeddings)
+    popular = clusterer.popular_questions(scanned, sample_size=300)
+
+    assert fitted == [300]
+    assert len(popular) == 3
+    assert {q["province"] for q in popular} == {"Ontario"}
+
+
+def test_only_recent_days_are_listed():
+    now = 1760000000.0
+    vectors = {}
+    for age_days in (0, 3, 6.9, 7.5, 9, 30):
+        created_at = now - age_days * DAY_SECONDS
+        vectors[question_id(created_at)] = ([1.0, 0.0], {"province": "Ontario", "company": "", "text": f"{age_days} days", "created_at": created_at})
+    index = FakeIndex({"UserQuestions": vectors})
+
+    assert sorted(text for _, _, text, _ in recent_questions(index, now=now)) == ["0 days", "3 days", "6.9 days"]
+    # Only the questions of the days listed were fetched
+    assert sum(index.fetched_batches) <= 4
+
+    # Questions of the week before the window are deleted, older ones are out of the sweep
+    assert delete_expired_questions(index, 7, now=now) == 2
+    assert sorted(metadata["text"] for _, metadata in index.vectors["UserQuestions"].values()) == ["0 days", "3 days", "30 days", "6.9 days"]
+
+
+def test_questions_under_plain_uuids_are_moved_to_day_prefixed_ids():
+    now = 1760000000.0
+    vectors = {
+        "0b7c6a1e-legacy-recent": ([1.0, 0.0], {"province": "Ontario", "company": "", "text": "recent", "created_at": now - DAY_SECONDS}),
+        "5f1d2c3b-legacy-old": ([0.0, 1.0], {"province": "Yukon", "company": "Acme", "text": "old", "created_at": now - 30 * DAY_SECONDS}),
+        question_id(now): ([1.0, 1.0], {"province": "Ontario", "company": "", "text": "new", "created_at": now}),
+    }
+    index = FakeIndex({"UserQuestions": vectors})
+    assert sorted(text for _, _, text, _ in recent_questions(index, now=now)) == ["new"]
+
+    assert migrate_legacy_question_ids(index) == 2
+    assert all("#" in id for id in index.vectors["UserQuestions"])
+    assert sorted(metadata["text"] for _, metadata in index.vectors["UserQuestions"].values()) == ["new", "old", "recent"]
+    assert sorted(text for _, _, text, _ in recent_questions(index, now=now)) == ["new", "recent"]
+    assert migrate_legacy_question_ids(index) == 0
+
+
+def test_refresh_keeps_old_questions_unless_retention_is_set(monkeypatch):
+    old = time.time() - 10 * DAY_SECONDS
+    index = FakeIndex({"UserQuestions": {
+        question_id(old): ([1.0, 0.0], {"province": "Ontario", "company": "", "text": "old", "created_at": old}),
+    }})
+    monkeypatch.setattr(utils, "index", index)
+
+    assert utils.find_popular_questions_from_vector_db() == []
+    assert len(index.vectors["UserQuestions"]) == 1
+    monkeypatch.setattr(utils, "user_question_retention_days", 7)
+    utils.find_popular_questions_from_vector_db()
+    assert index.vectors["UserQuestions"] == {}
@@ -0,0 +1,51 @@
+import threading
+
+from visited_set import VisitedSet, canonicalize_url
+
+
+def test_canonicalize_url():
+    assert canonicalize_url("HTTPS://Example.com:443/a/./b/../c?b=2&a=1&utm_source=x#top") == "https://example.com/a/c?a=1&b=2"
+    assert canonicalize_url("http://example.com") == "http://example.com/"
+    assert canonicalize_url("http://example.com:8080/x/") == "http://example.com:8080/x/"
+
+
+def test_equivalent_urls_are_visited_once():
+    visited = VisitedSet()
+    assert visited.add("https://example.com/handbook?page=1#intro")
+    assert not visited.add("https://EXAMPLE.com/handbook?page=1")
+    assert "https://example.com:443/handbook?page=1" in visited
+    assert len(visited) == 1
+
+
+def test_table_grows_without_losing_urls():
+    visited = VisitedSet()
+    urls = [f"https://example.com/page/{i}" for i in range(5000)]
+    assert all(visited.add(url) for url in urls)
+    assert len(visited) == 5000
+    assert len(visited.table) == 16384
+    assert all(url in visited for url in urls)
+    assert not any(visited.add(url) for url in urls)
+    assert "https://example.com/page/5000" not in visited
+
+
+def test_bloom_filter_has_no_false_negatives():
+    visited = VisitedSet(bloom_capacity=1000)
+    urls = [f"https://example.com/page/{i}" for i in range(1000)]
+    assert all(visited.add(url) for url in urls)
+    assert all(url in visited for url in urls)
+    assert not any(visited.add(url) for url in urls)
+
+
+def test_concurrent_adds_keep_one_winner_per_url():
+    visited = VisitedSet()
+    winners = []
+
+    def add_all():
+        winners.extend(url for url in (f"https://example.com/{i}" for i in range(500)) if visited.add(url))
+
+    threads = [threading.Thread(target=add_all) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(winners) == sorted(f"https://example.com/{i}" for i in range(500))
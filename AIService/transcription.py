@@ -0,0 +1,212 @@
+import asyncio
+import io
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from faster_whisper.audio import decode_audio
+from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+SAMPLE_RATE = 16000
+
+# Decoding options of each speed/accuracy profile
+PROFILES = {
+    # Greedy decoding without temperature fallback, for short prompts and partial results
+    "fast": {"beam_size": 1, "best_of": 1, "temperature": 0.0, "condition_on_previous_text": False, "without_timestamps": True},
+    "balanced": {"beam_size": 3, "best_of": 3, "condition_on_previous_text": False},
+    "accurate": {"beam_size": 5},
+}
+# With the "auto" profile, audio up to this long is decoded with "fast", longer audio with "accurate"
+SHORT_AUDIO_SECONDS = 10
+
+
+def profile_options(profile, duration=None):
+    """Decoding options of a profile; raises ValueError for unknown profiles."""
+    if profile == "auto":
+        profile = "fast" if duration is not None and duration <= SHORT_AUDIO_SECONDS else "accurate"
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown transcription profile {profile!r}, expected one of: auto, {', '.join(PROFILES)}")
+    return dict(PROFILES[profile])
+
+
+class TranscriptionBusy(Exception):
+    """Raised when the transcription queue is full."""
+
+
+class TranscriptionPool:
+    """
+    Runs faster-whisper transcriptions off the event loop.
+
+    Each of the `replicas` worker threads has its own model, so decodes never block other
+    requests or each other. Audio is decoded from the uploaded bytes in memory. At most
+    `max_queue` transcriptions wait for a free replica; beyond that `transcribe` raises
+    TranscriptionBusy straight away so voice prompts cannot pile up behind each other.
+    The models are loaded by `load`, or by the first transcription.
+    """
+
+    def __init__(self, load_model, replicas=1, max_queue=4):
+        self.load_model = load_model
+        self.replicas = replicas
+        self.models = queue.Queue()
+        self.loaded = False
+        self.load_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(replicas, thread_name_prefix="whisper")
+        self.slots = threading.BoundedSemaphore(replicas + max_queue)
+        self.lock = threading.Lock()
+        self.counters = {"completed": 0, "failed": 0, "cancelled": 0, "rejected": 0, "in_flight": 0}
+
+    async def transcribe(self, audio, profile=None, wait=False, **options):
+        """
+        Transcribe audio bytes, or 16 kHz float32 samples, and return (info, transcript).
+        `profile` adds the decoding options of a profile; with `wait`, the call waits for a
+        queue slot instead of raising TranscriptionBusy.
+        """
+        if profile is not None and profile != "auto":
+            options = {**profile_options(profile), **options}
+        while not self.slots.acquire(blocking=False):
+            if not wait:
+                self.count("rejected")
+                raise TranscriptionBusy()
+            await asyncio.sleep(0.05)
+        self.count("in_flight")
+        future = self.executor.submit(self.run, audio, profile, options)
+        # The slot is released when the job is done, not when the caller stops waiting: a
+        # cancelled caller (a client that disconnected) leaves a running job behind, which
+        # must keep holding its slot. Jobs that have not started are cancelled with it.
+        future.add_done_callback(self.finished)
+        return await asyncio.wrap_future(future)
+
+    def finished(self, future):
+        if future.cancelled():
+            self.count("cancelled")
+        else:
+            self.count("failed" if future.exception() is not None else "completed")
+        self.count("in_flight", -1)
+        self.slots.release()
+
+    def load(self):
+        """Load the model replicas if they are not loaded yet."""
+        with self.load_lock:
+            if not self.loaded:
+                for _ in range(self.replicas):
+                    self.models.put(self.load_model())
+                self.loaded = True
+        return self
+
+    def run(self, audio, profile, options):
+        self.load()
+        if isinstance(audio, (bytes, bytearray)):
+            # With "auto", decode up front to pick the profile from the duration
+            audio = decode_audio(io.BytesIO(audio), sampling_rate=SAMPLE_RATE) if profile == "auto" else io.BytesIO(audio)
+        if profile == "auto":
+            options = {**profile_options(profile, len(audio) / SAMPLE_RATE), **options}
+        model = self.models.get()
+        try:
+            segments, info = model.transcribe(audio, **options)
+            # Segments are generated lazily, consume them on this worker thread
+            transcript = "".join(segment.text for segment in segments).strip()
+            return info, transcript
+        finally:
+            self.models.put(model)
+
+    def count(self, counter, step=1):
+        with self.lock:
+            self.counters[counter] += step
+
+    def stats(self):
+        with self.lock:
+            return {**self.counters, "replicas": self.replicas, "loaded": self.loaded}
+
+
+class TranscriptionStream:
+    """
+    Incremental transcription of 16 kHz mono PCM16 audio.
+
+    Incoming audio is split into utterances with the Silero VAD bundled with faster-whisper.
+    An utterance is transcribed with `profile` as soon as `silence_ms` of silence follow it
+    (or it reaches `max_utterance_seconds`), producing a "final" event. While an utterance
+    is still open, a "partial" event with a greedy transcript of it is produced every
+    `partial_seconds` of new audio, unless every transcription replica is busy. The language
+    detected for the first utterance is reused for the rest of the stream.
+    """
+
+    def __init__(self, pool, profile="balanced", language=None, partial_seconds=1.0, silence_ms=500, max_utterance_seconds=30):
+        self.pool = pool
+        self.options = profile_options("accurate" if profile == "auto" else profile)
+        self.language = language
+        self.partial_samples = int(partial_seconds * SAMPLE_RATE)
+        self.silence_samples = silence_ms * SAMPLE_RATE // 1000
+        self.max_utterance_samples = int(max_utterance_seconds * SAMPLE_RATE)
+        self.vad_options = VadOptions(min_silence_duration_ms=silence_ms, speech_pad_ms=200, max_speech_duration_s=max_utterance_seconds)
+        self.buffer = np.zeros(0, dtype=np.float32)
+        # Samples already dropped from the front of the buffer
+        self.offset = 0
+        self.analyzed = 0
+        self.partial_at = 0
+        self.utterances = []
+
+    async def feed(self, pcm):
+        """Add PCM16 bytes and return the events they produced."""
+        samples = np.frombuffer(pcm[:len(pcm) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0
+        self.buffer = np.concatenate([self.buffer, samples])
+        # The VAD runs every few hundred milliseconds of audio rather than on every chunk
+        if len(self.buffer) - self.analyzed < SAMPLE_RATE // 4:
+            return []
+        return await self.process(final=False)
+
+    async def finish(self):
+        """Transcribe the audio that is left and return the last events, ending with "done"."""
+        events = await self.process(final=True)
+        events.append({
+            "type": "done",
+            "language": self.language,
+            "transcript": " ".join(text for text in self.utterances if text),
+        })
+        return events
+
+    async def process(self, final):
+        self.analyzed = len(self.buffer)
+        speech = await asyncio.to_thread(get_speech_timestamps, self.buffer, self.vad_options)
+        events = []
+        if final or (speech and len(self.buffer) - speech[0]["start"] >= self.max_utterance_samples):
+            closed, open_start = speech, None
+        else:
+            closed = [span for span in speech if span["end"] + self.silence_samples <= len(self.buffer)]
+            open_start = speech[len(closed)]["start"] if len(speech) > len(closed) else None
+
+        for span in closed:
+            text = await self.transcribe(self.buffer[span["start"]:span["end"]], wait=True)
+            self.utterances.append(text)
+            events.append({"type": "final", "text": text, "start": self.seconds(span["start"]), "end": self.seconds(span["end"])})
+
+        # Keep only the open utterance, or the last silence so that speech starting at the
+        # end of the buffer is not cut
+        keep = open_start if open_start is not None else max(closed[-1]["end"] if closed else 0, len(self.buffer) - self.silence_samples)
+        self.drop(keep)
+
+        if open_start is not None and len(self.buffer) - self.partial_at >= self.partial_samples:
+            self.partial_at = len(self.buffer)
+            try:
+                text = await self.transcribe(self.buffer, partial=True)
+                events.append({"type": "partial", "text": text, "start": self.seconds(0)})
+            except TranscriptionBusy:
+                pass
+        return events
+
+    async def transcribe(self, audio, partial=False, wait=False):
+        options = {**self.options, **PROFILES["fast"]} if partial else self.options
+        info, text = await self.pool.transcribe(audio, wait=wait, language=self.language, **options)
+        if self.language is None and not partial:
+            self.language = info.language
+        return text
+
+    def drop(self, samples):
+        samples = max(0, min(samples, len(self.buffer)))
+        self.buffer = self.buffer[samples:]
+        self.offset += samples
+        self.analyzed = max(0, self.analyzed - samples)
+        self.partial_at = max(0, self.partial_at - samples)
+
+    def seconds(self, sample):
+        return round((self.offset + sample) / SAMPLE_RATE, 2)
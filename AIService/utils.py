@@ -1,75 +1,75 @@
+import json
 import time
-from collections import defaultdict
-from sklearn.cluster import KMeans
-import numpy as np
+import uuid
 from langchain_core.documents import Document
-from config import index, vector_store_dimension, llm, vector_store
+from config import index, llm, vector_store, popular_questions_sample_size, user_question_retention_days
+from popular_questions import clusterer
+from vector_scan import scan_namespace
 
-def find_popular_questions_from_vector_db():
-    seven_days_ago = time.time() - 7 * 24 * 60 * 60
-    # Only fetch questions created in the last 7 days
-    filter = {
-        "created_at": {"$gte": seven_days_ago}
-    }
+# User questions are stored under IDs starting with the UTC day they were asked on
+# ("20250131#<uuid>"), so that the questions of recent days can be listed by ID prefix
+# instead of scanning every question ever asked. Questions stored earlier under plain UUIDs
+# are moved to such IDs by migrateUserQuestionIds.py.
+POPULAR_QUESTION_DAYS = 7
+DAY_SECONDS = 24 * 60 * 60
 
-    # Pull all matching vectors (set a high enough limit)
-    results = index.query(
-        vector=[0.0]*vector_store_dimension,
-        top_k=10000, # this is the limit
-        include_values=True,   # this includes embeddings
-        include_metadata=True,
-        namespace="UserQuestions",
-        filter=filter
-    )
+def question_day(timestamp):
+    return time.strftime("%Y%m%d", time.gmtime(timestamp))
 
-    # print(f"The questions in the last 7 days: {results}")
-    # each match in results has id, metadata, score and values (embedding)
-    # metadata contains company, created_at, namespace, province, text
+def question_id(created_at):
+    return f"{question_day(created_at)}#{uuid.uuid4().hex}"
 
-    # Group by (province, company)
-    groups = defaultdict(list)
+def recent_questions(index, now=None, days=POPULAR_QUESTION_DAYS):
+    """Yield (province, company, text, embedding) for the questions asked in the last `days` days."""
+    now = time.time() if now is None else now
+    since = now - days * DAY_SECONDS
+    # The oldest day is only partly inside the window, created_at decides there
+    for day in range(days + 1):
+        prefix = question_day(now - day * DAY_SECONDS) + "#"
+        for _, values, metadata in scan_namespace(index, "UserQuestions", prefix=prefix):
+            if metadata.get("created_at", 0) >= since:
+                yield metadata["province"], metadata["company"], metadata["text"], values
 
-    # A dict whose keys are tuples of (province, company) and values are lists of documents
-    for match in results["matches"]:
-        embedding = match["values"]
-        metadata = match["metadata"]
-        province = metadata["province"]
-        company = metadata["company"]
-        key = (province, company)
-        text = metadata["text"]
-        question = {}
-        question["text"] = text
-        question["embedding"] = embedding
-        groups[key].append(question)
+def migrate_legacy_question_ids(index, batch_size=100):
+    """
+    Store the questions saved under plain UUIDs again under day-prefixed IDs, with the same
+    values and metadata, and delete the old IDs. Returns how many questions were moved.
+    """
+    # List first, so the IDs written below are not listed again
+    legacy = [id for page in index.list(namespace="UserQuestions", limit=100) for id in page if "#" not in id]
+    for i in range(0, len(legacy), batch_size):
+        response = index.fetch(ids=legacy[i:i + batch_size], namespace="UserQuestions")
+        vectors = [
+            (question_id(vector.metadata.get("created_at", 0)), vector.values, vector.metadata)
+            for vector in response.vectors.values()
+        ]
+        if vectors:
+            index.upsert(vectors=vectors, namespace="UserQuestions")
+            index.delete(ids=list(response.vectors), namespace="UserQuestions")
+    return len(legacy)
 
-    # Extract embeddings and compute centroids
-    centroids_by_group = {}
-    for key, questions in groups.items():
-        embeddings = [q["embedding"] for q in questions]
-        if len(questions) <= 3:
-            # if there are fewer than 3 questions, use the embeddings directly
-            centroids_by_group[key] = embeddings
-            continue
-        kmeans = KMeans(n_clusters=3, random_state=42).fit(embeddings)
-        centroids_by_group[key] = kmeans.cluster_centers_
+def delete_expired_questions(index, days, now=None, sweep_days=POPULAR_QUESTION_DAYS):
+    """Delete the questions of the `sweep_days` days before the last `days` days."""
+    now = time.time() if now is None else now
+    deleted = 0
+    for day in range(days + 1, days + 1 + sweep_days):
+        prefix = question_day(now - day * DAY_SECONDS) + "#"
+        # List the whole day before deleting, so deletes do not shift the pages being listed
+        ids = [id for page in index.list(namespace="UserQuestions", prefix=prefix, limit=100) for id in page]
+        for i in range(0, len(ids), 1000):
+            index.delete(ids=ids[i:i + 1000], namespace="UserQuestions")
+        deleted += len(ids)
+    return deleted
 
-    # Now, for each group, find the closest question to each centroid
-    popular_questions = []
-    for key, centroids in centroids_by_group.items():
-        province, company = key
-        for centroid in centroids:
-            # Find the closest question to this centroid
-            # Since we already have groups in memory, min is more efficient than similarity search
-            closest_question = min(
-                groups[key],
-                key=lambda question: np.linalg.norm(np.array(question["embedding"]) - np.array(centroid))
-            )
-            popular_questions.append({
-                "province": province,
-                "company": company,
-                "text": closest_question["text"],
-            })
-    return popular_questions
+def find_popular_questions_from_vector_db():
+    # Only the ID prefixes of the last 7 days are listed, and at most
+    # popular_questions_sample_size questions are kept per (province, company)
+    if user_question_retention_days:
+        try:
+            delete_expired_questions(index, user_question_retention_days)
+        except Exception as e:
+            print(f"Failed to delete expired user questions: {e}")
+    return clusterer.popular_questions(recent_questions(index), sample_size=popular_questions_sample_size)
 
 def returnQuestion(user_message: str) -> bool:
     """
@@ -101,24 +101,60 @@ def returnQuestion(user_message: str) -> bool:
         print(f"Error checking question: {e}")
         return {"question": ""}
 
-def store_user_message_to_vector_store(user_message: str, province: str, company: str):
-    """Filter out those that are not questions. Then, store them in the vector store."""
+def rewriteQuestions(user_messages):
+    """
+    Batch version of returnQuestion: rewrite several user messages with a single LLM call.
+    Returns one question per message, falling back to returnQuestion for each message if
+    the model's answer cannot be parsed.
+    """
+    if len(user_messages) == 1:
+        return [returnQuestion(user_messages[0])["question"]]
+    numbered = "\n".join(f"{i + 1}. {json.dumps(message)}" for i, message in enumerate(user_messages))
+    prompt = f"""
+    You are given {len(user_messages)} numbered user messages. For each message:
+    1. Determine if it is a question.
+    2. If it is a question, return it with corrected grammar and remove any personal information.
+    3. If it is not a question, rewrite it as a single concise question.
+    Return only a JSON array of {len(user_messages)} strings, the final question for each message in order, nothing else.
+
+    User messages:
+    {numbered}
+    """
     try:
-        validQuestion = returnQuestion(user_message)["question"]
-        if not validQuestion:
-            # Not a question, not storing.
-            return
-        # print("Storing user question to vector store:", user_message)
-        doc = Document(
-            page_content=validQuestion,
+        response = llm.invoke([{"role": "user", "content": prompt}])
+        content = response.content if hasattr(response, "content") else str(response)
+        # Models sometimes wrap JSON in a markdown code fence
+        content = content.strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+        questions = json.loads(content)
+        if isinstance(questions, list) and len(questions) == len(user_messages):
+            return [str(question).strip() for question in questions]
+        print(f"Expected {len(user_messages)} rewritten questions, got: {content[:200]}")
+    except Exception as e:
+        print(f"Error rewriting questions in batch: {e}")
+    return [returnQuestion(message)["question"] for message in user_messages]
+
+def store_user_messages_to_vector_store(messages):
+    """
+    Filter out the messages that are not questions and store the others in the vector store,
+    for a list of (user_message, province, company) tuples: one rewrite call, one embedding
+    call and one upsert.
+    """
+    questions = rewriteQuestions([user_message for user_message, _, _ in messages])
+    created_at = time.time()
+    docs = [
+        Document(
+            page_content=question,
             metadata={
-                "created_at": time.time(),
+                "created_at": created_at,
                 "province": province,
                 "company": company,
                 "namespace": "UserQuestions",
             }
         )
-        print("The document that is being stored:", doc)
-        vector_store.add_documents([doc], namespace="UserQuestions")
-    except Exception as e:
-        print(f"Error storing user message to vector store: {e}")
+        for question, (_, province, company) in zip(questions, messages)
+        # Not a question, not storing.
+        if question
+    ]
+    if docs:
+        vector_store.add_documents(docs, ids=[question_id(created_at) for _ in docs], namespace="UserQuestions")
+        print(f"Stored {len(docs)} user questions")
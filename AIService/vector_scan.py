@@ -0,0 +1,15 @@
+def scan_namespace(index, namespace, prefix=None, page_size=100, fetch_batch=100):
+    """
+    Yield (id, values, metadata) for every vector in a namespace, or only for the vectors
+    whose ID starts with `prefix`.
+
+    IDs are listed a page at a time and their vectors fetched in batches, so memory stays
+    bounded by one page however many vectors the namespace holds. Works with any index
+    exposing Pinecone's list(namespace=, prefix=, limit=) and fetch(ids=, namespace=).
+    """
+    pages = index.list(namespace=namespace, limit=page_size) if prefix is None else index.list(namespace=namespace, prefix=prefix, limit=page_size)
+    for ids in pages:
+        for i in range(0, len(ids), fetch_batch):
+            response = index.fetch(ids=ids[i:i + fetch_batch], namespace=namespace)
+            for id, vector in response.vectors.items():
+                yield id, vector.values, vector.metadata or {}
@@ -0,0 +1,116 @@
+import hashlib
+import math
+import posixpath
+import threading
+from array import array
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+TRACKING_PARAMS = ("utm_", "fbclid", "gclid", "mc_cid", "mc_eid")
+
+
+def canonicalize_url(url):
+    """
+    Normalize a URL so trivially different spellings of the same page compare equal:
+    lowercase scheme and host, no default port, no fragment, resolved dot segments,
+    sorted query parameters and no tracking parameters.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    if "/." in path:
+        path = posixpath.normpath(path) + ("/" if path.endswith("/") and path != "/" else "")
+        path = "/" + path.lstrip("/")
+    query = urlencode(sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith(TRACKING_PARAMS)
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+class VisitedSet:
+    """
+    Set of crawled URLs for one crawl, keyed by canonical URL.
+
+    Only an 8-byte hash of each canonical URL is kept, in an open-addressing table backed by
+    an array of 64-bit integers that is kept between a quarter and half full: 16 to 32 bytes
+    per URL, where a Python set of the hashes would take about 75 bytes per entry and a set
+    of the URL strings over 100. For very large crawls, pass `bloom_capacity` to use a
+    fixed-size Bloom filter instead; a false positive then skips a URL with probability
+    `false_positive_rate`.
+    Safe to share between threads.
+    """
+
+    def __init__(self, bloom_capacity=None, false_positive_rate=0.001):
+        self.lock = threading.Lock()
+        self.count = 0
+        if bloom_capacity:
+            self.bits = math.ceil(-bloom_capacity * math.log(false_positive_rate) / math.log(2) ** 2)
+            self.hashes = max(1, round(self.bits / bloom_capacity * math.log(2)))
+            self.bloom = bytearray((self.bits + 7) // 8)
+            self.table = None
+        else:
+            self.bloom = None
+            self.table = array("Q", bytes(8 * 1024))
+
+    def digest(self, url):
+        return hashlib.blake2b(canonicalize_url(url).encode("utf-8"), digest_size=16).digest()
+
+    def key(self, digest):
+        # 0 marks an empty slot of the table
+        return int.from_bytes(digest[:8], "little") or 1
+
+    def slot(self, key):
+        """Slot holding `key`, or the empty slot where it belongs (linear probing)."""
+        mask = len(self.table) - 1
+        slot = key & mask
+        while self.table[slot] not in (0, key):
+            slot = (slot + 1) & mask
+        return slot
+
+    def grow(self):
+        old = self.table
+        self.table = array("Q", bytes(16 * len(old)))
+        for key in old:
+            if key:
+                self.table[self.slot(key)] = key
+
+    def positions(self, digest):
+        # Double hashing: the i-th bit is h1 + i * h2
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, url):
+        """Add `url` and return True if it was not visited before."""
+        digest = self.digest(url)
+        with self.lock:
+            if self.bloom is None:
+                key = self.key(digest)
+                slot = self.slot(key)
+                if self.table[slot]:
+                    return False
+                self.table[slot] = key
+                if 2 * (self.count + 1) > len(self.table):
+                    self.grow()
+            else:
+                positions = self.positions(digest)
+                if all(self.bloom[p >> 3] & (1 << (p & 7)) for p in positions):
+                    return False
+                for p in positions:
+                    self.bloom[p >> 3] |= 1 << (p & 7)
+            self.count += 1
+            return True
+
+    def __contains__(self, url):
+        digest = self.digest(url)
+        with self.lock:
+            if self.bloom is None:
+                return bool(self.table[self.slot(self.key(digest))])
+            return all(self.bloom[p >> 3] & (1 << (p & 7)) for p in self.positions(digest))
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,20 @@
+import { NextResponse } from "next/server"
+import { getVectorDBUploadJob } from "@/integrations/aiService"
+
+// status of a company document upload job
+export async function GET(
+  request: Request,
+  { params }: { params: Promise<{ jobId: string }> }
+) {
+  const { jobId } = await params
+  try {
+    const job = await getVectorDBUploadJob(jobId)
+    return NextResponse.json(job, { status: 200 })
+  } catch (error) {
+    console.error(`Error fetching upload job ${jobId}:`, error)
+    return NextResponse.json(
+      { error: "Failed to fetch upload job" },
+      { status: 500 }
+    )
+  }
+}
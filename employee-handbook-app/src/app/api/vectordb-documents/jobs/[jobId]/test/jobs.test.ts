@@ -0,0 +1,40 @@
+jest.mock("@/integrations/aiService", () => ({
+  getVectorDBUploadJob: jest.fn(),
+}))
+
+import { GET } from "@/app/api/vectordb-documents/jobs/[jobId]/route"
+import { getVectorDBUploadJob } from "@/integrations/aiService"
+
+describe("GET /api/vectordb-documents/jobs/[jobId]", () => {
+  const jobId = "4f0c6b1e9d2a4c47a3c1f0e8b7d6a5c2"
+  const params = { params: Promise.resolve({ jobId }) }
+
+  it("returns the job from the AI service", async () => {
+    const mockJob = {
+      job_id: jobId,
+      url: "https://file.com/doc.pdf",
+      company: "testCompany",
+      status: "success",
+      error: null,
+      result: { company_docs_len: 0, chunks: 0, seconds: 0.4 },
+    }
+    ;(getVectorDBUploadJob as jest.Mock).mockResolvedValue(mockJob)
+
+    const response = await GET(new Request("http://localhost"), params)
+    const result = await response.json()
+
+    expect(getVectorDBUploadJob).toHaveBeenCalledWith(jobId)
+    expect(response.status).toBe(200)
+    expect(result).toEqual(mockJob)
+  })
+
+  it("returns 500 on error", async () => {
+    ;(getVectorDBUploadJob as jest.Mock).mockRejectedValue(new Error("Job not found"))
+
+    const response = await GET(new Request("http://localhost"), params)
+    const result = await response.json()
+
+    expect(response.status).toBe(500)
+    expect(result).toEqual({ error: "Failed to fetch upload job" })
+  })
+})
@@ -27,12 +27,12 @@ describe("API route /api/vectordb-documents/source", () => {
     it("calls uploadFileToVectorDB and returns 200", async () => {
       const fileurl = "https://file.com/doc.pdf"
       const company = "testCompany"
-      const company_docs_len = 1
       const mockResponse = {
         url: fileurl,
         company: company,
-        company_docs_len: company_docs_len,
-        status: "success",
+        job_id: "4f0c6b1e9d2a4c47a3c1f0e8b7d6a5c2",
+        status: "queued",
+        duplicate: false,
       }
       ;(uploadFileToVectorDB as jest.Mock).mockResolvedValue(mockResponse)
 
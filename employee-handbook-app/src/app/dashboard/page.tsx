@@ -10,6 +10,7 @@ import { Header } from "../global_components"
 import { CircularProgress } from "@mui/material"
 import { TrashIcon } from "lucide-react"
 import FreeTrialModal from "@/components/free-trial-popup"
+import type { IngestJob } from "@/models/ai"
 
 type pdfFile = {
   name: string
@@ -22,6 +23,29 @@ type CustProps = {
   setFiles: React.Dispatch<React.SetStateAction<pdfFile[]>>
 }
 
+const UPLOAD_JOB_POLL_MS = 2000
+// Stop waiting after this long, the job keeps running in the background
+const UPLOAD_JOB_TIMEOUT_MS = 10 * 60 * 1000
+
+// Documents are indexed in the background by the AI service, wait for the job to finish
+async function waitForUploadJob(jobId: string): Promise<IngestJob> {
+  const deadline = Date.now() + UPLOAD_JOB_TIMEOUT_MS
+  while (true) {
+    const res = await axiosInstance.get(`/api/vectordb-documents/jobs/${jobId}`)
+    const job: IngestJob = res.data
+    if (job.status === "success") {
+      return job
+    }
+    if (job.status === "failed") {
+      throw new Error(`Indexing failed: ${job.error}`)
+    }
+    if (Date.now() >= deadline) {
+      throw new Error(`Indexing job ${jobId} did not finish within ${UPLOAD_JOB_TIMEOUT_MS / 60000} minutes`)
+    }
+    await new Promise((resolve) => setTimeout(resolve, UPLOAD_JOB_POLL_MS))
+  }
+}
+
 const FilePreview: React.FC<CustProps> = ({ files, setFiles }) => {
   const handleOpen = (file: pdfFile) => {
     window.open(file.url, "_blank", "noopener,noreferrer")
@@ -235,7 +259,8 @@ export default function Dashboard() {
           namespace: companyName,
         })
 
-        if (vdbres.data.company_docs_len == 0) {
+        const job = await waitForUploadJob(vdbres.data.job_id)
+        if (job.result?.company_docs_len == 0) {
           alert(
             "No extractable text found. This PDF may be scanned or image-based. Please delete it and upload a version with selectable text."
           )
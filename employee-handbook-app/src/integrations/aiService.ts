@@ -1,5 +1,5 @@
 import { PopularQuestion } from "@/models/schema"
-import type { AIResponse } from "@/models/ai"
+import type { AIResponse, IngestJob, IngestJobSubmission } from "@/models/ai"
 
 const AI_SERVICE_URL = process.env.AI_SERVICE_URL
 
@@ -58,11 +58,12 @@ export async function getPopularQuestions(): Promise<PopularQuestion[]> {
 
 /**
  * Calls the upstream FastAPI service at POST /company-document
+ * The document is indexed in the background; poll the returned job with getVectorDBUploadJob
  */
 export async function uploadFileToVectorDB(
   fileurl: string,
   namespace: string
-): Promise<{ url: string; company: string; status: string }> {
+): Promise<IngestJobSubmission> {
   const res = await fetch(`${AI_SERVICE_URL}/company-document`, {
     method: "POST",
     headers: {
@@ -83,6 +84,25 @@ export async function uploadFileToVectorDB(
   return await res.json()
 }
 
+/**
+ * Calls the upstream FastAPI service at GET /company-document/jobs/{job_id}
+ */
+export async function getVectorDBUploadJob(jobId: string): Promise<IngestJob> {
+  const res = await fetch(`${AI_SERVICE_URL}/company-document/jobs/${encodeURIComponent(jobId)}`, {
+    method: "GET",
+    headers: { "Content-Type": "application/json" },
+  })
+
+  if (!res.ok) {
+    const errorData = await res.json()
+    throw new Error(
+      `Failed to get upload job: ${errorData.detail || "Unknown error in getVectorDBUploadJob"}`
+    )
+  }
+
+  return (await res.json()) as IngestJob
+}
+
 export async function deleteCompanyFromVectorDB(
   company: string
 ): Promise<{ company: string; status: string }> {
@@ -55,3 +55,23 @@ export interface CarouselCard {
     url: string
   }
 }
+
+// Company document ingestion job from FastAPI (POST /company-document, GET /company-document/jobs/{job_id})
+export interface IngestJobSubmission {
+  url: string
+  company: string
+  job_id: string
+  status: IngestJobStatus
+  duplicate: boolean
+}
+
+export type IngestJobStatus = "queued" | "running" | "success" | "failed"
+
+export interface IngestJob {
+  job_id: string
+  url: string
+  company: string
+  status: IngestJobStatus
+  error: string | null
+  result: { company_docs_len: number; unchanged_urls: number; chunks: number; seconds: number } | null
+}